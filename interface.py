@@ -1,47 +1,121 @@
 import optimization.agentUtils
+import optimization.aggregationUtils
+import optimization.backendUtils
+import optimization.budgetUtils
+import optimization.cacheUtils
 import optimization.const
-import optimization.modelUtils
+import optimization.districtUtils
+import optimization.fileUtils
+import optimization.matrixUtils
 import optimization.positionUtils
+import optimization.reductionUtils
+import optimization.scenarioUtils
+import optimization.settingsUtils
 
 import simulation.const
 import simulation.Engine
+import simulation.LocalSearch
 import simulation.utils
 
+from concurrent.futures import ProcessPoolExecutor
 import logging
+from multiprocessing import freeze_support, Pool
+import os
+import time
 
-#main method for creating a model for the base scenario from the data
-def optimize(position_file,driver_file,trip_file,result_file):
-    #logger settings
-    logging.basicConfig(
-        format="%(asctime)s %(levelname)s [%(name)s] %(message)s",
-        datefmt="%Y-%m-%d %H:%M:%S",
-    )
-    _LOGGER = logging.getLogger(__name__)
-    LOG_LEVEL = logging.DEBUG
-    _LOGGER.setLevel(LOG_LEVEL)
-    
-    #get agents and endpoints
+_LOGGER = logging.getLogger(__name__)
+LOG_LEVEL = logging.DEBUG
+_LOGGER.setLevel(LOG_LEVEL)
+
+#create agents, candidate cells and charging patterns from the data
+#the instance is reduced if reduce is set (default: REDUCE_INSTANCE)
+#return agents, candidate cells, candidate cells per breakpoint, relevant breakpoints and configurations per cell (None if not reduced)
+def createInstance(position_file,driver_file,trip_file,reduce=None):
+    #get agents
     _LOGGER.info("creating agents")
     size=[0,0]
     e_agents_relevant = optimization.agentUtils.createEAgents(optimization.const.SEED,optimization.const.E_QUOTA,trip_file,driver_file,size=size)
+    return createInstanceFromAgents(position_file,e_agents_relevant,reduce)
+
+#create the agents of several sampled days (seeds) and the candidate cells and charging patterns for all of them
+#agentData are the drivers if they were already read (see agentUtils.readAgentData)
+#return instance as createInstance and agent keys per seed
+def createMultiInstance(position_file,driver_file,trip_file,seeds,reduce=None,agentData=None):
+    _LOGGER.info(f"creating agents for {len(seeds)} seeds")
+    if agentData is None:
+        agentData = optimization.agentUtils.readAgentData(trip_file,driver_file)
+    e_agents_relevant, agentKeysPerSeed = optimization.agentUtils.multiAgentCreator(seeds,optimization.const.E_QUOTA,agentData)
+    instance = createInstanceFromAgents(position_file,e_agents_relevant,reduce,groups=[agentKeysPerSeed[seed] for seed in seeds])
+    agentKeysPerSeed = {seed:[key for key in agentKeys if key in instance[0]] for seed,agentKeys in agentKeysPerSeed.items()}
+    return instance, agentKeysPerSeed
+
+#create candidate cells and charging patterns for the given agents, unsatisfiable agents are removed from them
+#the instance contains reduced copies of the agents if it is reduced (see reductionUtils.reduceInstance)
+#groups are the sets of agents sharing the charging stations (see reductionUtils.reduceInstance), innerCells are the cells of the position file if it was already read (see breakpointCells)
+def createInstanceFromAgents(position_file,e_agents_relevant,reduce=None,groups=[None],innerCells=None):
+    reducedCells, relevantCellsPerBreakpoint, relevantBreakpoints = candidateCells(position_file,e_agents_relevant,innerCells)
+
+    #get patterns
+    _LOGGER.info("calculating possible charging patterns")
+    calculatePatterns(e_agents_relevant,relevantBreakpoints)
+
+    #remove everything that cannot be part of an optimal solution
+    reducedConfigs = None
+    if optimization.const.REDUCE_INSTANCE if reduce is None else reduce:
+        _LOGGER.info("reducing instance")
+        e_agents_relevant, reducedCells, relevantCellsPerBreakpoint, relevantBreakpoints, reducedConfigs, _ = optimization.reductionUtils.reduceInstance(
+            e_agents_relevant,
+            reducedCells,
+            relevantCellsPerBreakpoint,
+            relevantBreakpoints,
+            groups=groups,
+            bucket=optimization.const.CAPACITY_BUCKET
+            )
+
+    return e_agents_relevant, reducedCells, relevantCellsPerBreakpoint, relevantBreakpoints, reducedConfigs
+
+#find the candidate cells within walking distance of the breakpoints of the agents
+#return candidate cells, candidate cells per breakpoint and relevant breakpoints
+def candidateCells(position_file,e_agents_relevant,innerCells=None):
+    #get endpoints
     breakpoints = set()
     for agent in e_agents_relevant.values():
         for stop in agent.schedule:
             breakpoints.add((float(stop["sx"]),float(stop["sy"])))
 
+    return breakpointCells(position_file,breakpoints,innerCells)
+
+#find the candidate cells within walking distance of the breakpoints
+#the cells of the position file are read unless they are given as innerCells (see positionUtils.findAllCells)
+#return candidate cells, candidate cells per breakpoint and relevant breakpoints
+def breakpointCells(position_file,breakpoints,innerCells=None):
     #get potential locations
     _LOGGER.info("calculating possible locations")
-    innerCells = optimization.positionUtils.findAllCells(position_file)
+    if innerCells is None:
+        innerCells = optimization.positionUtils.findAllCells(position_file)
     reducedCells = optimization.positionUtils.filterCells(innerCells,breakpoints,radius=optimization.const.WALKING_RADIUS)
     relevantCellsPerBreakpoint = optimization.positionUtils.findRelevantCellsForBreakpoints(breakpoints,reducedCells)
     relevantBreakpoints = {key:"f" for key,val in relevantCellsPerBreakpoint.items() if len(val)>0}
+    return reducedCells, relevantCellsPerBreakpoint, relevantBreakpoints
 
-    #get patterns
-    _LOGGER.info("calculating possible charging patterns")
+#calculate the charging patterns of the agents for the relevant breakpoints and remove the agents that cannot be satisfied
+def calculatePatterns(e_agents_relevant,relevantBreakpoints):
+    enumeratePatterns(e_agents_relevant,relevantBreakpoints)
+    removeUnsatisfiableAgents(e_agents_relevant,relevantBreakpoints)
+
+#calculate the charging patterns of the agents for the relevant breakpoints, within PREPROCESSING_BUDGET if it is set (see budgetUtils.enumeratePatterns)
+def enumeratePatterns(e_agents_relevant,relevantBreakpoints):
+    if optimization.const.PREPROCESSING_BUDGET:
+        optimization.budgetUtils.enumeratePatterns(e_agents_relevant,relevantBreakpoints,optimization.const.PREPROCESSING_BUDGET)
+        return
+    for agent in e_agents_relevant.values():
+        agent.calculatePatterns(relevantBreakpoints)
+
+#remove the agents without valid pattern that have less than 4 charging opportunities at relevant breakpoints
+def removeUnsatisfiableAgents(e_agents_relevant,relevantBreakpoints):
     unsat_agents = []
     for key,agent in e_agents_relevant.items():
-        agent.calculatePatterns(relevantBreakpoints)
-        if not agent.valid_patterns:
+        if not len(agent.valid_patterns):
             c = 0
             for opp in agent.charging_opps:
                 if opp["loc"] in relevantBreakpoints:
@@ -53,24 +127,819 @@ def optimize(position_file,driver_file,trip_file,result_file):
         for key in unsat_agents:
             del e_agents_relevant[key]
 
+#main method for creating a model for the base scenario from the data
+#the results of the stages are cached if CACHE_DIR is set (see optimizeCached)
+def optimize(position_file,driver_file,trip_file,result_file):
+    #logger settings
+    logging.basicConfig(
+        format="%(asctime)s %(levelname)s [%(name)s] %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
+
+    if optimization.const.CACHE_DIR:
+        optimizeCached(position_file,driver_file,trip_file,result_file)
+        return
+
+    instance = createInstance(position_file,driver_file,trip_file)
+    solveInstance(instance,result_file)
+    return
+
+#create the model of an instance (see createInstance), solve it and save its charging stations to the result file (if given)
+#with AGGREGATE_AGENTS the charging processes of the individual agents are saved next to it (see fileUtils.assignmentFile)
+#if a checkpoint (see checkpointUtils.csCheckpoint) is given, the model is saved to it before it is solved
+#return charging stations as numbers of ports per cell (see fileUtils.chargingStations)
+def solveInstance(instance,result_file,checkpoint=None):
+    e_agents_relevant, reducedCells, relevantCellsPerBreakpoint, relevantBreakpoints, reducedConfigs = instance
+
+    #aggregate equivalent agents
+    multiplicities = None
+    if optimization.const.AGGREGATE_AGENTS:
+        e_agents_relevant, multiplicities, members, _ = optimization.aggregationUtils.aggregateAgents(e_agents_relevant,relevantBreakpoints,optimization.const.AGGREGATION_TOLERANCE)
+
     #create model
     _LOGGER.info("creating model")
-    m = optimization.modelUtils.csBaseModel(
+    m = optimization.backendUtils.createModel(
         e_agents_relevant,
         reducedCells,
         relevantCellsPerBreakpoint,
-        relevantBreakpoints
+        relevantBreakpoints,
+        reducedConfigs,
+        multiplicities
         )
     m.addStandardConstraints()
     m.addCSObjective()
+    if checkpoint is not None:
+        if m._b_lazyCapacity or m._lazyRequirements is not None:
+            _LOGGER.warning("model with lazy constraints is not cached")
+        else:
+            checkpoint.saveModel(m,*m.portMap())
+
+    m.optimize()
+
+    m.logSolutionStatistics()
+    if multiplicities:
+        satisfied, processes = m.disaggregateSolution(members)
+        if result_file:
+            optimization.fileUtils.saveAssignment(optimization.fileUtils.assignmentFile(result_file),satisfied,processes)
+
+    if result_file:
+        m.saveSolutionToFile(result_file)
+    return optimization.fileUtils.chargingStations(m._fastChargingPorts,m._slowChargingPorts)
+
+#optimize with a cache of the results of the stages agent creation, cell filtering, pattern computation, reduction and model construction (see cacheUtils.csStageCache)
+#a stage is loaded from the cache if the input files and the constants it depends on did not change, a cached model is solved with the current solver settings (e.g. MIPGAP and TIMELIMIT)
+#models are only cached with the gurobi backend
+def optimizeCached(position_file,driver_file,trip_file,result_file,cache_dir=None):
+    logging.basicConfig(
+        format="%(asctime)s %(levelname)s [%(name)s] %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
+
+    settings = optimization.settingsUtils.modelSettings()
+    cache = optimization.cacheUtils.csStageCache(cache_dir or optimization.const.CACHE_DIR)
+    keys = optimization.cacheUtils.stageKeys(position_file,driver_file,trip_file,settings)
+
+    checkpoint = None
+    if settings["s_backend"] == "gurobi":
+        optimization.backendUtils.requireGurobi("optimizeCached")
+        checkpoint = optimization.checkpointUtils.csCheckpoint(cache.path("model",keys["model"]))
+    if checkpoint is not None and checkpoint.hasModel():
+        _LOGGER.info("loading model from cache")
+        m = checkpoint.loadModel(params=False)
+        optimization.modelUtils.setSolverParameters(m,settings)
+        m.optimize()
+        if m.SolCount:
+            optimization.fileUtils.saveChargingStations(result_file,*checkpoint.portValues(m.getAttr("X",m.getVars())))
+        m.dispose()
+        return
+
+    _LOGGER.info("creating agents")
+    e_agents_relevant = cache.cached("agents",keys["agents"],lambda:optimization.agentUtils.createEAgents(optimization.const.SEED,optimization.const.E_QUOTA,trip_file,driver_file))
+    reducedCells, relevantCellsPerBreakpoint, relevantBreakpoints = cache.cached("cells",keys["cells"],lambda:candidateCells(position_file,e_agents_relevant))
+    if not cache.loadPatterns(keys["patterns"],e_agents_relevant):
+        _LOGGER.info("calculating possible charging patterns")
+        enumeratePatterns(e_agents_relevant,relevantBreakpoints)
+        cache.savePatterns(keys["patterns"],e_agents_relevant)
+    removeUnsatisfiableAgents(e_agents_relevant,relevantBreakpoints)
+
+    reducedConfigs = None
+    if optimization.const.REDUCE_INSTANCE:
+        _LOGGER.info("reducing instance")
+        record = cache.cached("reduction",keys["reduction"],lambda:optimization.cacheUtils.reductionRecord(
+            *optimization.reductionUtils.reduceInstance(
+                e_agents_relevant,
+                reducedCells,
+                relevantCellsPerBreakpoint,
+                relevantBreakpoints,
+                bucket=optimization.const.CAPACITY_BUCKET
+                )[:5]
+            ))
+        e_agents_relevant, reducedCells, relevantCellsPerBreakpoint, relevantBreakpoints, reducedConfigs = optimization.cacheUtils.applyReduction(e_agents_relevant,record)
+
+    solveInstance((e_agents_relevant,reducedCells,relevantCellsPerBreakpoint,relevantBreakpoints,reducedConfigs),result_file,checkpoint)
+    return
+
+#main method for creating a model for the base scenario with overlapping stages: capacity sets, patterns and outer descriptions are computed concurrently while the model is assembled (see pipelineUtils.pipelinedModel)
+#the instance is neither reduced nor aggregated, as both need the patterns of all agents before the model is created
+#kwargs are passed to the model
+def optimizePipelined(position_file,driver_file,trip_file,result_file,processes=4,**kwargs):
+    logging.basicConfig(
+        format="%(asctime)s %(levelname)s [%(name)s] %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
+    optimization.backendUtils.requireGurobi("optimizePipelined")
+
+    _LOGGER.info("creating agents")
+    e_agents_relevant = optimization.agentUtils.createEAgents(optimization.const.SEED,optimization.const.E_QUOTA,trip_file,driver_file)
+    reducedCells, relevantCellsPerBreakpoint, relevantBreakpoints = candidateCells(position_file,e_agents_relevant)
+
+    _LOGGER.info("creating model")
+    m = optimization.pipelineUtils.pipelinedModel(e_agents_relevant,reducedCells,relevantCellsPerBreakpoint,relevantBreakpoints,processes=processes,**kwargs)
+    m.addCSObjective()
 
     m.optimize()
 
     m.logSolutionStatistics()
+    m.saveSolutionToFile(result_file)
+    m.dispose()
+    return
+
+#main method for creating a model for the base scenario whose agents do not fit into memory at once (e.g. E_QUOTA close to 1)
+#the sampled agents are processed in shards of shardSize agents (default: SHARD_SIZE) in worker processes, each shard is screened for relevant agents, its patterns and outer descriptions are calculated and its constraint blocks are spilled to shard_dir (see shardUtils)
+#the model is assembled from the spilled blocks, the instance is neither reduced nor aggregated, as both need the patterns of all agents
+#kwargs are passed to the model
+def optimizeSharded(position_file,driver_file,trip_file,result_file,shard_dir,shardSize=None,processes=4,**kwargs):
+    logging.basicConfig(
+        format="%(asctime)s %(levelname)s [%(name)s] %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
+    optimization.backendUtils.requireGurobi("optimizeSharded")
+
+    store = optimization.shardUtils.csShardStore(shard_dir)
+    _LOGGER.info("sampling agents")
+    numShards = optimization.shardUtils.sampleShards(store,optimization.const.SEED,optimization.const.E_QUOTA,trip_file,driver_file,shardSize or optimization.const.SHARD_SIZE)
+
+    _LOGGER.info("screening agents")
+    breakpoints = set()
+    numRelevant = 0
+    for shardBreakpoints,numAgents in optimization.shardUtils.mapShards(optimization.shardUtils.screenShard,store,numShards,processes):
+        breakpoints.update(shardBreakpoints)
+        numRelevant += numAgents
+    _LOGGER.info(f"{numRelevant} relevant agents")
+    reducedCells, relevantCellsPerBreakpoint, relevantBreakpoints = breakpointCells(position_file,breakpoints)
+    del breakpoints
+
+    _LOGGER.info("calculating possible charging patterns and constraint blocks")
+    settings = optimization.settingsUtils.modelSettings(**kwargs)
+    data = {"rc":reducedCells,"rcpb":relevantCellsPerBreakpoint,"rb":relevantBreakpoints,"settings":settings}
+    stats = optimization.shardUtils.mapShards(optimization.shardUtils.emitShard,store,numShards,processes,data)
+    _LOGGER.info(f"{sum(numRows for _,numRows in stats)} constraint rows of {sum(numAgents for numAgents,_ in stats)} agents spilled")
+
+    _LOGGER.info("creating model")
+    m = optimization.shardUtils.shardedModel(store,numShards,reducedCells,relevantCellsPerBreakpoint,relevantBreakpoints,**kwargs)
+    m.optimize()
+
+    if m.SolCount:
+        solution = m._mvars.X
+        optimization.fileUtils.saveChargingStations(result_file,m._builder.portValues(solution,"f"),m._builder.portValues(solution,"s"))
+    m.dispose()
+    return
+
+#continue an interrupted optimization from the checkpoint directory of a previous run (see CHECKPOINT_DIR) and save its charging stations to the result file
+def resume(checkpoint_dir,result_file):
+    logging.basicConfig(
+        format="%(asctime)s %(levelname)s [%(name)s] %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
+    optimization.backendUtils.requireGurobi("resume")
+
+    m = optimization.checkpointUtils.resumeOptimization(checkpoint_dir,result_file)
+    m.dispose()
+    return
+
+#main method for creating a robust model over several sampled days (seeds) from the data
+#the model is solved as a whole (csMultiModel) or by benders decomposition with subproblems in the given number of worker processes (see bendersUtils.csBendersModel)
+#kwargs are passed to the model
+def optimizeMulti(position_file,driver_file,trip_file,result_file,seeds,benders=False,workers=4,**kwargs):
+    logging.basicConfig(
+        format="%(asctime)s %(levelname)s [%(name)s] %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
 
+    (e_agents_relevant, reducedCells, relevantCellsPerBreakpoint, relevantBreakpoints, reducedConfigs), agentKeysPerSeed = createMultiInstance(position_file,driver_file,trip_file,seeds)
+
+    _LOGGER.info("creating model")
+    if benders:
+        optimization.backendUtils.requireGurobi("csBendersModel")
+        m = optimization.bendersUtils.csBendersModel(e_agents_relevant,reducedCells,relevantCellsPerBreakpoint,relevantBreakpoints,seeds,agentKeysPerSeed,rcc=reducedConfigs,workers=workers,**kwargs)
+    else:
+        m = optimization.backendUtils.createMultiModel(e_agents_relevant,reducedCells,relevantCellsPerBreakpoint,relevantBreakpoints,seeds,agentKeysPerSeed,rcc=reducedConfigs,**kwargs)
+    m.addStandardConstraints()
+    m.addCSObjective()
+
+    m.optimize()
+
+    m.logSolutionStatistics()
     m.saveSolutionToFile(result_file)
+    m.dispose()
     return
 
+#create the agents of further seeds from the drivers (see agentUtils.readAgentData) for the relevant breakpoints of an existing instance
+#return agents and agent keys per seed as createMultiInstance
+def createSeedAgents(agentData,seeds,relevantBreakpoints):
+    _LOGGER.info(f"creating agents for {len(seeds)} additional seeds")
+    e_agents_relevant, agentKeysPerSeed = optimization.agentUtils.multiAgentCreator(seeds,optimization.const.E_QUOTA,agentData)
+    calculatePatterns(e_agents_relevant,relevantBreakpoints)
+    agentKeysPerSeed = {seed:[key for key in agentKeys if key in e_agents_relevant] for seed,agentKeys in agentKeysPerSeed.items()}
+    return e_agents_relevant, agentKeysPerSeed
+
+#solve a robust model over the seeds and grow it by further batches of seeds (list of seed lists) without rebuilding it (see csMultiModel.addSeeds)
+#every re-solve starts from the previous solution, the final layout is saved to the result file
+#kwargs are passed to csMultiModel
+#return objective value after every solve
+def optimizeIncrementalMulti(position_file,driver_file,trip_file,result_file,seeds,additionalSeeds,**kwargs):
+    logging.basicConfig(
+        format="%(asctime)s %(levelname)s [%(name)s] %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
+    optimization.backendUtils.requireGurobi("optimizeIncrementalMulti")
+
+    #the drivers are read once, so that every batch only costs its new seeds
+    agentData = optimization.agentUtils.readAgentData(trip_file,driver_file)
+    (e_agents_relevant, reducedCells, relevantCellsPerBreakpoint, relevantBreakpoints, reducedConfigs), agentKeysPerSeed = createMultiInstance(position_file,driver_file,trip_file,seeds,agentData=agentData)
+
+    _LOGGER.info("creating model")
+    m = optimization.modelUtils.csMultiModel(e_agents_relevant,reducedCells,relevantCellsPerBreakpoint,relevantBreakpoints,seeds,agentKeysPerSeed,rcc=reducedConfigs,**kwargs)
+    m.addStandardConstraints()
+    m.addCSObjective()
+    m.optimize()
+    objectives = [m.ObjVal if m.SolCount else None]
+
+    for batch in additionalSeeds:
+        t_start = time.time()
+        e_agents_batch, agentKeysPerBatchSeed = createSeedAgents(agentData,batch,relevantBreakpoints)
+        m.addSeeds(e_agents_batch,batch,agentKeysPerBatchSeed)
+        _LOGGER.info(f"seeds {batch} added in {time.time()-t_start:.2f}s")
+        m.optimize()
+        objectives.append(m.ObjVal if m.SolCount else None)
+        _LOGGER.info(f"objective with {len(m._seeds)} seeds: {objectives[-1]}")
+
+    m.logSolutionStatistics()
+    m.saveSolutionToFile(result_file)
+    m.dispose()
+    return objectives
+
+#create a robust model over representatives of the seeds only (see scenarioUtils.reduceScenarios) and check the layout for all seeds with the simulation
+#if weighted is set, the number of satisfied agents is weighted by the number of represented seeds instead of maximizing the worst representative
+#kwargs are passed to csMultiModel
+#return representative seeds, their weights and the simulation results per seed
+def optimizeReducedMulti(position_file,driver_file,trip_file,result_file,seeds,numRepresentatives,weighted=False,**kwargs):
+    logging.basicConfig(
+        format="%(asctime)s %(levelname)s [%(name)s] %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
+    optimization.backendUtils.requireGurobi("optimizeReducedMulti")
+
+    (e_agents_relevant, reducedCells, relevantCellsPerBreakpoint, relevantBreakpoints, reducedConfigs), agentKeysPerSeed = createMultiInstance(position_file,driver_file,trip_file,seeds)
+    representatives, weights, _ = optimization.scenarioUtils.reduceScenarios(e_agents_relevant,agentKeysPerSeed,relevantCellsPerBreakpoint,relevantBreakpoints,numRepresentatives)
+
+    _LOGGER.info("creating model")
+    representativeKeys = {seed:agentKeysPerSeed[seed] for seed in representatives}
+    representativeAgents = {key:e_agents_relevant[key] for agentKeys in representativeKeys.values() for key in agentKeys}
+    m = optimization.modelUtils.csMultiModel(
+        representativeAgents,
+        reducedCells,
+        relevantCellsPerBreakpoint,
+        relevantBreakpoints,
+        representatives,
+        representativeKeys,
+        weights=weights if weighted else None,
+        rcc=reducedConfigs,
+        **kwargs
+        )
+    m.addStandardConstraints()
+    m.addCSObjective()
+
+    m.optimize()
+
+    m.logSolutionStatistics()
+    m.saveSolutionToFile(result_file)
+    m.dispose()
+
+    results = simulateSeeds(result_file,driver_file,trip_file,position_file,seeds)
+    return representatives, weights, results
+
+#simulate the charging stations of a result file for the sampled days of several seeds
+#return dict with (successful agents, relevant agents) per seed
+def simulateSeeds(result_file,driver_file,trip_file,position_file,seeds):
+    charging_stations = simulation.utils.read_charging_stations(result_file)
+    inner_cells = simulation.utils.read_cells(position_file)
+    agent_data = simulation.utils.read_agent_data(driver_file,trip_file)
+    results = {}
+    for seed in seeds:
+        day = simulation.utils.sample_agents(agent_data,seed,optimization.const.E_QUOTA,copy_schedules=True)
+        engine = simulation.Engine.SimulationEngine(day,charging_stations,inner_cells,simulation.const.RADIUS_HAPPY,simulation.const.RADIUS_MAX)
+        engine.simulate(warm_start=simulation.const.WARM_START)
+        results[seed] = (engine.num_successful_agents,engine.num_relevant_agents)
+        _LOGGER.info(f"seed {seed}: {engine.num_successful_agents} of {engine.num_relevant_agents} relevant agents successful")
+    quotas = [successful/relevant for successful,relevant in results.values() if relevant]
+    if quotas:
+        _LOGGER.info(f"simulated quota of successful agents: worst {min(quotas):.3f}, mean {sum(quotas)/len(quotas):.3f}")
+    return results
+
+#solve the same instance with different model settings and compare model size and runtime
+#formulations maps a name to the keyword arguments of csBaseModel
+#return dict with statistics per formulation
+def benchmarkFormulations(position_file,driver_file,trip_file,formulations={"configurations":{"b_portCount":False},"port counts":{"b_portCount":True}}):
+    logging.basicConfig(
+        format="%(asctime)s %(levelname)s [%(name)s] %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
+    optimization.backendUtils.requireGurobi("benchmarkFormulations")
+
+    instance = createInstance(position_file,driver_file,trip_file)
+
+    statistics = {}
+    for name,kwargs in formulations.items():
+        _LOGGER.info(f"benchmarking formulation {name}")
+        t_start = time.time()
+        m = optimization.modelUtils.csBaseModel(*instance,**kwargs)
+        m.addStandardConstraints()
+        m.addCSObjective()
+        t_build = time.time()-t_start
+        memory = sum(m.memoryReport().values())
+        m.optimize()
+        statistics[name] = {
+            "build time":t_build,
+            "python memory":memory,
+            "solve time":m.Runtime,
+            "variables":m.NumVars,
+            "binaries":m.NumBinVars,
+            "integers":m.NumIntVars,
+            "constraints":m.NumConstrs,
+            "nodes":m.NodeCount,
+            "objective":m.ObjVal if m.SolCount else None,
+            "gap":m.MIPGap if m.SolCount else None
+        }
+        m.dispose()
+
+    for name,stats in statistics.items():
+        _LOGGER.info(f"{name}: "+", ".join(f"{key} {value}" for key,value in stats.items()))
+    return statistics
+
+#solve the same instance without and with mip starts and compare the time to the first incumbent and to the mip gap
+#starts maps a name to the source of the mip start (see csBaseModel.addMIPStart), e.g. the result file of a previous run before small data changes
+#kwargs are passed to csBaseModel
+#return dict with statistics per start
+def benchmarkStarts(position_file,driver_file,trip_file,starts={"none":"","lp":"lp","greedy":"greedy"},**kwargs):
+    logging.basicConfig(
+        format="%(asctime)s %(levelname)s [%(name)s] %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
+    optimization.backendUtils.requireGurobi("benchmarkStarts")
+
+    instance = createInstance(position_file,driver_file,trip_file)
+
+    statistics = {}
+    for name,source in starts.items():
+        _LOGGER.info(f"benchmarking start {name}")
+        m = optimization.modelUtils.csBaseModel(*instance,**kwargs)
+        m.addStandardConstraints()
+        m.addCSObjective()
+        if source:
+            m.addMIPStart(source)
+        m.trackProgress()
+        m.optimize()
+        statistics[name] = dict(m._progress,**{
+            "solve time":m.Runtime,
+            "objective":m.ObjVal if m.SolCount else None
+        })
+        m.dispose()
+
+    for name,stats in statistics.items():
+        _LOGGER.info(f"{name}: "+", ".join(f"{key} {value}" for key,value in stats.items()))
+        reference = statistics.get("none")
+        if reference and name!="none":
+            for key in ["first incumbent","gap reached"]:
+                if reference[key] is not None and stats[key] is not None:
+                    _LOGGER.info(f"{name}: {key} {reference[key]-stats[key]:.2f}s earlier than without start")
+    return statistics
+
+#trace the frontier of a parameter ("budget", "limit" or "proportion") with a single model that is re-solved for every value
+#values are solved in an order in which the previous solution mostly stays feasible (increasing budgets and total limits, decreasing proportions) and a solve is warm-started from the previous solution if it satisfies the new value (limits can tighten one speed while the total grows)
+#the solution of every value is written to result_dir/<parameter>_<value>.csv and the frontier to result_dir/<parameter>_frontier.csv
+#kwargs are passed to csBaseModel
+#return list with statistics per value
+def sweep(position_file,driver_file,trip_file,parameter,values,result_dir=".",**kwargs):
+    logging.basicConfig(
+        format="%(asctime)s %(levelname)s [%(name)s] %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
+    optimization.backendUtils.requireGurobi("sweep")
+    if parameter not in ["budget","limit","proportion"]:
+        raise ValueError(f"unknown parameter {parameter}, possible values: ['budget', 'limit', 'proportion']")
+
+    instance = createInstance(position_file,driver_file,trip_file)
+
+    #the model is built once with the constraint of the parameter
+    _LOGGER.info(f"creating model for {parameter} sweep")
+    settings = dict(kwargs,b_budget=parameter=="budget",b_limit=parameter=="limit",b_proportion=parameter=="proportion")
+    m = optimization.modelUtils.csBaseModel(*instance,**settings)
+    m.addStandardConstraints()
+    m.addCSObjective()
+
+    points = []
+    for value in sorted(values,key=lambda value:sum(value) if parameter=="limit" else value,reverse=parameter=="proportion"):
+        _LOGGER.info(f"solving for {parameter} {value}")
+        start = m.SolCount and m.solutionSatisfiesParameter(parameter,value)
+        if m.SolCount and not start:
+            _LOGGER.info(f"previous solution violates {parameter} {value}, solving without start")
+        m.setConstraintParameter(parameter,value)
+        if start:
+            m.keepSolutionAsStart()
+        else:
+            m.clearStart()
+        m.optimize()
+        point = {
+            parameter:value,
+            "status":m.Status,
+            "objective":m.ObjVal if m.SolCount else None,
+            "cost":None,
+            "satisfied":None,
+            "solve time":m.Runtime,
+            "gap":m.MIPGap if m.SolCount else None,
+            "result file":None
+        }
+        if m.SolCount:
+            m.logSolutionStatistics()
+            point["cost"] = sum(ports*m._csCosts[speed] for speed,stations in [("f",m._fastChargingPorts),("s",m._slowChargingPorts)] for ports in stations.values())
+            point["satisfied"] = m.numSatisfied()
+            point["result file"] = os.path.join(result_dir,f"{parameter}_{'_'.join(map(str,value)) if parameter=='limit' else value}.csv")
+            m.saveSolutionToFile(point["result file"])
+        points.append(point)
+
+    optimization.fileUtils.saveFrontier(os.path.join(result_dir,f"{parameter}_frontier.csv"),points)
+    m.dispose()
+    return points
+
+#solve the base scenario for several proportions of drivers with ev (values of E_QUOTA) with nested samples, i.e. the agents of a quota are the agents of every smaller quota and further agents (see agentUtils.sampleAgents)
+#patterns, outer descriptions and requirement rows of the agents are kept for the larger quotas, so that they are only computed for the new agents of each quota
+#the model of every quota is assembled by the matrix builder and solved by its backend (see backendUtils.csBackendModel), the instance is reduced if REDUCE_INSTANCE is set, but not aggregated
+#kwargs are passed to the models, the solution of every quota is written to result_dir/quota_<quota>.csv and the statistics of all quotas to result_dir/quota_frontier.csv
+#return list of statistics per quota
+def sweepQuota(position_file,driver_file,trip_file,quotas,result_dir=".",**kwargs):
+    logging.basicConfig(
+        format="%(asctime)s %(levelname)s [%(name)s] %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
+
+    settings = optimization.settingsUtils.modelSettings(**kwargs)
+    scheduleDict = optimization.agentUtils.read_schedules(trip_file)
+    attributeDict, o_agents, wb_agents, nwb_agents = optimization.agentUtils.read_attributes(driver_file)
+
+    #results of the agents of the smaller quotas
+    patterns = {}
+    facets = {}
+    requirementRows = {}
+
+    points = []
+    for e_quota in sorted(quotas):
+        _LOGGER.info(f"creating agents for quota {e_quota}")
+        t_start = time.time()
+        e_agents_relevant = optimization.agentUtils.agentCreator(optimization.const.SEED,e_quota,scheduleDict,attributeDict,o_agents,wb_agents,nwb_agents,nested=True)
+        reducedCells, relevantCellsPerBreakpoint, relevantBreakpoints = candidateCells(position_file,e_agents_relevant)
+
+        #the patterns of an agent only depend on which of its stops are relevant breakpoints, which does not change with further agents
+        newAgents = {key:agent for key,agent in e_agents_relevant.items() if key not in patterns}
+        _LOGGER.info(f"calculating possible charging patterns of {len(newAgents)} new agents")
+        enumeratePatterns(newAgents,relevantBreakpoints)
+        patterns.update((key,agent.valid_patterns) for key,agent in newAgents.items())
+        for key,agent in e_agents_relevant.items():
+            agent.valid_patterns = patterns[key]
+        removeUnsatisfiableAgents(e_agents_relevant,relevantBreakpoints)
+
+        reducedConfigs = None
+        if optimization.const.REDUCE_INSTANCE:
+            _LOGGER.info("reducing instance")
+            e_agents_relevant, reducedCells, relevantCellsPerBreakpoint, relevantBreakpoints, reducedConfigs, _ = optimization.reductionUtils.reduceInstance(
+                e_agents_relevant,
+                reducedCells,
+                relevantCellsPerBreakpoint,
+                relevantBreakpoints,
+                bucket=optimization.const.CAPACITY_BUCKET,
+                strengthened=settings["b_cap"],
+                maxCard=settings["i_capMaxCard"]
+                )
+
+        if settings["b_outer"]:
+            newAgents = {key:agent for key,agent in e_agents_relevant.items() if key not in facets and len(agent.valid_patterns)}
+            facets.update(optimization.matrixUtils.calculateFacets(newAgents,settings["i_polytopeThreads"],settings["i_polytopeTimeout"],settings["f_preprocessingBudget"]))
+
+        _LOGGER.info(f"creating model for quota {e_quota}")
+        m = optimization.backendUtils.csBackendModel(
+            e_agents_relevant,
+            reducedCells,
+            relevantCellsPerBreakpoint,
+            relevantBreakpoints,
+            reducedConfigs,
+            facets={key:facets[key] for key in e_agents_relevant if key in facets},
+            requirementRows=requirementRows,
+            **kwargs
+            )
+        m.addStandardConstraints()
+        m.addCSObjective()
+        t_build = time.time()-t_start
+        result = m.optimize()
+        point = {
+            "quota":e_quota,
+            "agents":len(e_agents_relevant),
+            "status":result["status"],
+            "objective":result["objective"],
+            "build time":t_build,
+            "solve time":result["runtime"],
+            "gap":result["gap"],
+            "result file":None
+        }
+        if result["solution"] is not None:
+            m.logSolutionStatistics()
+            point["result file"] = os.path.join(result_dir,f"quota_{e_quota}.csv")
+            m.saveSolutionToFile(point["result file"])
+        points.append(point)
+
+    optimization.fileUtils.saveFrontier(os.path.join(result_dir,"quota_frontier.csv"),points)
+    return points
+
+#instance shared by the worker processes of solveScenarios
+_scenarioInstance = None
+
+def initScenarioWorker(instance):
+    global _scenarioInstance
+    _scenarioInstance = instance
+
+#build and solve one scenario of solveScenarios through its backend
+#return name and statistics of the scenario
+def solveScenario(args):
+    name, kwargs, result_file = args
+    t_start = time.time()
+    m = optimization.backendUtils.csBackendModel(*_scenarioInstance,**kwargs)
+    m.addStandardConstraints()
+    m.addCSObjective()
+    t_build = time.time()-t_start
+    result = m.optimize()
+    if result["solution"] is not None:
+        m.logSolutionStatistics()
+        m.saveSolutionToFile(result_file)
+    return name, {
+        "backend":m._s_backend,
+        "build time":t_build,
+        "solve time":result["runtime"],
+        "status":result["status"],
+        "objective":result["objective"],
+        "gap":result["gap"],
+        "result file":result_file if result["solution"] is not None else None
+    }
+
+#solve independent scenarios of the same instance in parallel processes
+#scenarios maps a name to the model settings of the scenario (e.g. {"i_budget":200,"s_backend":"highs"}), the solution is written to result_dir/<name>.csv
+#return dict with statistics per scenario
+def solveScenarios(position_file,driver_file,trip_file,scenarios,result_dir=".",processes=4):
+    logging.basicConfig(
+        format="%(asctime)s %(levelname)s [%(name)s] %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
+
+    e_agents_relevant, reducedCells, relevantCellsPerBreakpoint, relevantBreakpoints, reducedConfigs = createInstance(position_file,driver_file,trip_file)
+
+    #the outer description is shared by all scenarios
+    facets = None
+    if optimization.const.OUTER_DESCRIPTION:
+        facets = optimization.matrixUtils.calculateFacets(e_agents_relevant,optimization.const.POLYTOPE_THREADS,optimization.const.POLYTOPE_TIMEOUT,optimization.const.PREPROCESSING_BUDGET)
+    instance = (e_agents_relevant,reducedCells,relevantCellsPerBreakpoint,relevantBreakpoints,reducedConfigs,None,facets)
+
+    if os.name == 'nt':
+        freeze_support()
+    tasks = [(name,kwargs,os.path.join(result_dir,f"{name}.csv")) for name,kwargs in scenarios.items()]
+    with Pool(processes,initializer=initScenarioWorker,initargs=(instance,)) as pool:
+        statistics = dict(pool.map(solveScenario,tasks))
+
+    for name,stats in statistics.items():
+        _LOGGER.info(f"{name}: "+", ".join(f"{key} {value}" for key,value in stats.items()))
+    return statistics
+
+#instance and partition shared by the worker processes of optimizeDistricts and the district instances prepared by each worker
+_districtData = None
+_districtModels = {}
+
+def initDistrictWorker(data):
+    global _districtData
+    _districtData = data
+
+#return the model of a district and the number of its agents that cannot be satisfied within it (see districtUtils.districtInstance)
+#the model is created once per worker process and reused in every rebalancing round, in which only its budget changes (the model is None if the district has no agents)
+def districtModel(district,kwargs):
+    if district not in _districtModels:
+        *instance, numLost = optimization.districtUtils.districtInstance(*_districtData,district,optimization.const.REDUCE_INSTANCE,optimization.const.CAPACITY_BUCKET)
+        m = None
+        if instance[0]:
+            m = optimization.modelUtils.csBaseModel(*instance,**kwargs)
+            m.addStandardConstraints()
+            m.addCSObjective()
+        _districtModels[district] = (m,numLost)
+    return _districtModels[district]
+
+#solve a district for several budgets (or once for budget None), every solve is warm-started from the previous solution if it is feasible for the budget
+#in the coordination round, stations are the settled charging stations (ports per (cell,speed)) of the shared cells: the shared cells of other districts are fixed and paid by them, their costs (or ports) are added to the budget (or the limits) of the district
+#the shared cells of the district may only grow, so that the other districts can rely on their settled charging stations
+#return district, number of agents that cannot be satisfied within the district and dict with (objective, satisfied agents of the district, fast ports, slow ports, runtime) per budget
+def solveDistrict(args):
+    optimization.backendUtils.requireGurobi("solveDistrict")
+    district, budgets, kwargs, stations = args
+    m, numLost = districtModel(district,kwargs)
+    if m is None:
+        return district, numLost, {budget:(0,0,{},{},0) for budget in budgets}
+    cellDistrict, agentDistrict = _districtData[4:]
+
+    foreign = {}
+    if stations is not None:
+        shared = {cell for cell,_ in stations}
+        m.fixStations([cell for cell in m._rc if cell in shared and cellDistrict[cell]==district],stations,lower=True)
+        foreign = m.fixStations([cell for cell in m._rc if cell in shared and cellDistrict[cell]!=district],stations)
+        if m._b_limit:
+            m.setConstraintParameter("limit",(m._t_limit[0]+sum(ports for (_,speed),ports in foreign.items() if speed=="s"),m._t_limit[1]+sum(ports for (_,speed),ports in foreign.items() if speed=="f")))
+    foreignCost = sum(ports*m._csCosts[speed] for (_,speed),ports in foreign.items())
+
+    results = {}
+    for budget in budgets:
+        start = m.SolCount and stations is None and (budget is None or m.solutionSatisfiesParameter("budget",budget))
+        if budget is not None:
+            m.setConstraintParameter("budget",budget+foreignCost)
+        if start:
+            m.keepSolutionAsStart()
+        else:
+            m.clearStart()
+        m.optimize()
+        if m.SolCount:
+            results[budget] = (m.ObjVal,m.numSatisfied([key for key in m._ear if agentDistrict[key]==district]),m.portValues("f"),m.portValues("s"),m.Runtime)
+        else:
+            _LOGGER.warning(f"district {district} has no solution for budget {budget}")
+            results[budget] = (None,0,{},{},m.Runtime)
+    return district, numLost, results
+
+#solve the districts of the tasks (district, budgets, settings, stations) in parallel (see solveDistrict)
+#every district is always solved by the same worker process, which keeps its model
+def solveDistricts(pools,tasks):
+    futures = [pools[task[0]%len(pools)].submit(solveDistrict,task) for task in tasks]
+    return [future.result() for future in futures]
+
+#solve the instance as districts in parallel processes and stitch their charging stations into one result file
+#cells are partitioned along the breakpoint-cell incidence graph (see districtUtils.partitionCells), the districts overlap: agents keep their charging opportunities at the border cells of other districts and border agents are part of every district whose cells they reach (see districtUtils.districtMembers)
+#the budget (or the limits) is split proportionally to the number of agents, in up to rounds rounds the budget is moved by step (default: a tenth of the budget per district) between districts according to their marginal values
+#in a final coordination round, every shared cell gets the charging station of the district that owns it and the districts are solved again with these stations fixed in the other districts (see solveDistrict)
+#satisfied agents are counted in their own district only, if bound is set, the lp relaxation of the monolithic model is solved to bound the loss of optimality
+#kwargs are passed to the district models (csBaseModel)
+#return dict with statistics of the decomposition
+def optimizeDistricts(position_file,driver_file,trip_file,result_file,numDistricts=4,processes=4,rounds=10,step=0,bound=False,**kwargs):
+    logging.basicConfig(
+        format="%(asctime)s %(levelname)s [%(name)s] %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
+    optimization.backendUtils.requireGurobi("optimizeDistricts")
+
+    #districts are reduced separately, as reductions of the whole instance do not hold for the districts
+    e_agents_relevant, reducedCells, relevantCellsPerBreakpoint, relevantBreakpoints, _ = createInstance(position_file,driver_file,trip_file,reduce=False)
+    cellDistrict = optimization.districtUtils.partitionCells(reducedCells,relevantCellsPerBreakpoint,numDistricts)
+    agentDistrict = optimization.districtUtils.assignAgents(e_agents_relevant,relevantCellsPerBreakpoint,cellDistrict)
+    members = [optimization.districtUtils.districtMembers(e_agents_relevant,relevantCellsPerBreakpoint,cellDistrict,agentDistrict,d) for d in range(numDistricts)]
+    shared = optimization.districtUtils.sharedCells([cells for cells,_ in members])
+    borderBreakpoints, borderAgents = optimization.districtUtils.borderStatistics(relevantCellsPerBreakpoint,cellDistrict,[agentKeys for _,agentKeys in members])
+    _LOGGER.info(f"{len(reducedCells)} cells partitioned into {numDistricts} districts, {borderBreakpoints} breakpoints reach several districts, {len(shared)} cells and {borderAgents} agents are shared by several districts")
+
+    settings = optimization.settingsUtils.modelSettings(**kwargs)
+    budgets = [None]*numDistricts
+    districtSettings = [dict(settings,s_logFile="") for d in range(numDistricts)]
+    if settings["b_budget"]:
+        budgets = optimization.districtUtils.splitProportionally(settings["i_budget"],agentDistrict,numDistricts)
+        step = step or max(1,settings["i_budget"]//(10*numDistricts))
+    elif settings["b_limit"]:
+        limits = [optimization.districtUtils.splitProportionally(limit,agentDistrict,numDistricts) for limit in settings["t_limit"]]
+        for d in range(numDistricts):
+            districtSettings[d]["t_limit"] = (limits[0][d],limits[1][d])
+
+    t_start = time.time()
+    objectives = {}
+    layouts = {}
+    satisfied = {}
+    lost = {}
+    solveTime = 0
+    data = (e_agents_relevant,reducedCells,relevantCellsPerBreakpoint,relevantBreakpoints,cellDistrict,agentDistrict)
+    #the workers of a ProcessPoolExecutor are not daemonic and may start the processes that calculate outer descriptions
+    pools = [ProcessPoolExecutor(1,initializer=initDistrictWorker,initargs=(data,)) for _ in range(min(processes,numDistricts))]
+    try:
+        for iteration in range(rounds+1):
+            rebalance = settings["b_budget"] and iteration<rounds
+            tasks = []
+            for d in range(numDistricts):
+                candidates = [budgets[d]]+([budgets[d]-step,budgets[d]+step] if rebalance else [])
+                missing = [budget for budget in candidates if (budget is None or budget>=0) and (d,budget) not in objectives]
+                if missing:
+                    tasks.append((d,missing,districtSettings[d],None))
+            for d,numLost,results in solveDistricts(pools,tasks):
+                lost[d] = numLost
+                for budget,(objective,numSatisfied,fast,slow,runtime) in results.items():
+                    #the objectives include border agents, as the marginal value of a district contains the agents of other districts it serves
+                    objectives[d,budget] = objective if objective is not None else 0
+                    satisfied[d,budget] = numSatisfied
+                    layouts[d,budget] = (fast,slow)
+                    solveTime += runtime
+            if not rebalance:
+                break
+            budgets, transfers = optimization.districtUtils.rebalanceBudgets(budgets,objectives,step)
+            _LOGGER.info(f"rebalancing round {iteration}: {transfers} budget transfers of {step}, budgets {budgets}")
+            if not transfers:
+                break
+
+        #coordination round: the shared cells are settled by their districts and fixed in every district that contains them
+        stations = optimization.districtUtils.settleSharedCells(shared,cellDistrict,{d:layouts[d,budgets[d]] for d in range(numDistricts)})
+        tasks = [(d,[budgets[d]],districtSettings[d],stations) for d in range(numDistricts) if shared & members[d][0]]
+        for d,_,results in solveDistricts(pools,tasks):
+            objective, numSatisfied, fast, slow, runtime = results[budgets[d]]
+            solveTime += runtime
+            if objective is None:
+                _LOGGER.warning(f"district {d} keeps its layout before the coordination round")
+                continue
+            satisfied[d,budgets[d]] = numSatisfied
+            layouts[d,budgets[d]] = (fast,slow)
+    finally:
+        for pool in pools:
+            pool.shutdown()
+    wallTime = time.time()-t_start
+
+    #stitch the charging stations of the cells every district owns
+    fastChargingPorts, slowChargingPorts = {}, {}
+    for d in range(numDistricts):
+        fast, slow = layouts[d,budgets[d]]
+        fastChargingPorts.update({cell:ports for cell,ports in fast.items() if cellDistrict[cell]==d})
+        slowChargingPorts.update({cell:ports for cell,ports in slow.items() if cellDistrict[cell]==d})
+    optimization.fileUtils.saveChargingStations(result_file,fastChargingPorts,slowChargingPorts)
+
+    cost = sum(fastChargingPorts.values())*optimization.const.COST_FAST+sum(slowChargingPorts.values())*optimization.const.COST_SLOW
+    statistics = {
+        "objective":sum(satisfied[d,budgets[d]] for d in range(numDistricts)) if settings["b_budget"] or settings["b_limit"] else cost,
+        "cost":cost,
+        "budgets":budgets,
+        "unsatisfiable agents":sum(lost.values()),
+        "border breakpoints":borderBreakpoints,
+        "shared cells":len(shared),
+        "border agents":borderAgents,
+        "district solve time":solveTime,
+        "wall time":wallTime,
+        "lp bound":None
+    }
+    if bound:
+        m = optimization.modelUtils.csBaseModel(e_agents_relevant,reducedCells,relevantCellsPerBreakpoint,relevantBreakpoints,**settings)
+        m.addStandardConstraints()
+        m.addCSObjective()
+        m.update()
+        relaxed = m.relax()
+        relaxed.optimize()
+        statistics["lp bound"] = relaxed.ObjVal if relaxed.SolCount else None
+        relaxed.dispose()
+        m.dispose()
+
+    _LOGGER.info(", ".join(f"{key} {value}" for key,value in statistics.items()))
+    if statistics["lp bound"]:
+        _LOGGER.info(f"loss of optimality at most {abs(statistics['lp bound']-statistics['objective'])/max(abs(statistics['lp bound']),abs(statistics['objective'])):.2%}")
+    return statistics
+
+#improve a layout by local search scored with the simulation without solving a model (see simulation.LocalSearch)
+#the search starts from the charging stations of start_file or from the greedy layout of the local search and respects BUDGET, COST_FAST/COST_SLOW and CONF_FAST/CONF_SLOW
+#return number of successful agents of the layout saved to the result file
+def localSearch(position_file,driver_file,trip_file,result_file,start_file=None,time_limit=60,processes=4):
+    logging.basicConfig(
+        format="%(asctime)s %(levelname)s [%(name)s] %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
+
+    day = simulation.utils.generate_day(driver_file,trip_file,simulation.const.SEED,simulation.const.E_QUOTA)
+    inner_cells = simulation.utils.read_cells(position_file)
+    search = simulation.LocalSearch.LocalSearch(
+        day,
+        inner_cells,
+        {"f":optimization.const.COST_FAST,"s":optimization.const.COST_SLOW},
+        {"f":optimization.const.CONF_FAST,"s":optimization.const.CONF_SLOW},
+        optimization.const.BUDGET,
+        simulation.const.RADIUS_HAPPY,
+        simulation.const.RADIUS_MAX,
+        warm_start=simulation.const.WARM_START,
+        processes=processes
+        )
+    layout = None
+    if start_file:
+        layout = simulation.LocalSearch.from_charging_stations(simulation.utils.read_charging_stations(start_file),search.configs)
+    layout, successful = search.run(layout,time_limit)
+    simulation.utils.write_charging_stations(result_file,simulation.LocalSearch.to_charging_stations(layout))
+    return successful
+
 def simulate(result_file,driver_file,trip_file,position_file):
 
     LOG_LEVEL = logging.WARNING
@@ -98,4 +967,42 @@ def simulate(result_file,driver_file,trip_file,position_file):
     print(result.num_relevant_agents)
     print(len(result.totally_failed_agents))
 
-    return
\ No newline at end of file
+    return
+
+#main method for design-and-evaluate loops without files: create and solve the model of the base scenario as optimize and keep everything the simulation needs in memory
+#the driver, trip and position files are read once and shared by optimization and simulation (see simulateInMemory)
+#return dict with the charging stations as numbers of ports per cell (see fileUtils.chargingStations), the agents, candidate cells, candidate cells per breakpoint and relevant breakpoints of the model, the cells of the position file and the drivers with their schedules (see simulation.utils.read_agent_data)
+def optimizeInMemory(position_file,driver_file,trip_file):
+    logging.basicConfig(
+        format="%(asctime)s %(levelname)s [%(name)s] %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
+
+    _LOGGER.info("reading drivers, trips and cells")
+    agentData = simulation.utils.read_agent_data(driver_file,trip_file)
+    attributeDict, o_agents, wb_agents, nwb_agents, scheduleDict = agentData
+    innerCells = optimization.positionUtils.findAllCells(position_file)
+
+    _LOGGER.info("creating agents")
+    e_agents_relevant = optimization.agentUtils.agentCreator(optimization.const.SEED,optimization.const.E_QUOTA,scheduleDict,attributeDict,o_agents,wb_agents,nwb_agents)
+    instance = createInstanceFromAgents(position_file,e_agents_relevant,innerCells=innerCells)
+    stations = solveInstance(instance,None)
+    e_agents_relevant, reducedCells, relevantCellsPerBreakpoint, relevantBreakpoints, _ = instance
+    return {
+        "stations":stations,
+        "agents":e_agents_relevant,
+        "cells":reducedCells,
+        "cells per breakpoint":relevantCellsPerBreakpoint,
+        "breakpoints":relevantBreakpoints,
+        "inner cells":set(innerCells),
+        "agent data":agentData
+    }
+
+#simulate the charging stations of a design (see optimizeInMemory) for the sampled day of a seed (default: simulation SEED and E_QUOTA) without reading any file
+#stations replaces the charging stations of the design, e.g. to evaluate modified layouts
+#return simulation engine after the simulation
+def simulateInMemory(design,seed=None,e_quota=None,stations=None):
+    day = simulation.utils.sample_agents(design["agent data"],simulation.const.SEED if seed is None else seed,simulation.const.E_QUOTA if e_quota is None else e_quota,copy_schedules=True)
+    engine = simulation.Engine.SimulationEngine(day,design["stations"] if stations is None else stations,design["inner cells"],simulation.const.RADIUS_HAPPY,simulation.const.RADIUS_MAX)
+    engine.simulate(warm_start=simulation.const.WARM_START)
+    return engine
@@ -9,6 +9,7 @@ from .const import (
     EFFCSPEED_SLOW,
     MIN_CHARGE_EOD,
     MIN_CHARGE,
+    NESTED_SAMPLING,
     O_QUOTA,
     TOT_AGENTS,
     TOT_CAP,
@@ -115,10 +116,21 @@ def read_attributes(filename):
 
     return attributeDict, o_agents, wb_agents, nwb_agents
 
-#return list of relevant agents
-def createMultiEAgents(seeds, e_quota, schedule_file, attribute_file):
+#read the schedules and attributes of all drivers
+#return schedules per driver, attributes per driver, outer drivers and drivers with and without wallbox in the order of the arguments of agentCreator
+def readAgentData(schedule_file, attribute_file):
     scheduleDict = read_schedules(schedule_file)
     attributeDict, o_agents, wb_agents, nwb_agents = read_attributes(attribute_file)
+    return scheduleDict, attributeDict, o_agents, wb_agents, nwb_agents
+
+#return list of relevant agents
+def createMultiEAgents(seeds, e_quota, schedule_file, attribute_file):
+    return multiAgentCreator(seeds, e_quota, readAgentData(schedule_file, attribute_file))
+
+#create the relevant agents of several seeds from the data of readAgentData
+#return relevant agents and agent keys per seed
+def multiAgentCreator(seeds, e_quota, agentData):
+    scheduleDict, attributeDict, o_agents, wb_agents, nwb_agents = agentData
     e_agents_relevant = {}
     agentKeysPerSeed = {}
     for seed in seeds:
@@ -133,22 +145,10 @@ def createEAgents(seed, e_quota, schedule_file, attribute_file, size=[0,0]):
     attributeDict, o_agents, wb_agents, nwb_agents = read_attributes(attribute_file)
     return agentCreator(seed, e_quota, scheduleDict, attributeDict, o_agents, wb_agents, nwb_agents, size=size)
 
-def agentCreator(seed, e_quota, scheduleDict, attributeDict, o_agents, wb_agents, nwb_agents, multi=False, size=[0,0]):
-    #init
-    rng = np.random.default_rng(seed)
-
-    num_agents = round(TOT_AGENTS*e_quota)
-    num_outerAgents = round(O_QUOTA*num_agents)
-    num_innerAgents = num_agents-num_outerAgents
-
-    e_agent_keys = rng.choice(o_agents,num_outerAgents,replace=False)
-    e_agent_keys = np.concatenate([e_agent_keys,rng.choice(wb_agents+nwb_agents,num_innerAgents,replace=False)])
-
-    size[:]=[TOT_AGENTS,num_agents]
-
+def agentCreator(seed, e_quota, scheduleDict, attributeDict, o_agents, wb_agents, nwb_agents, multi=False, size=[0,0], nested=None):
     #assign agent properties
     e_agents = dict()
-    for agent in e_agent_keys:
+    for agent, soc_start in sampleAgents(seed, e_quota, attributeDict, o_agents, wb_agents, nwb_agents, size, nested):
         if multi:
             agent_name = f"{seed}_{str(agent)}"
         else:
@@ -158,7 +158,7 @@ def agentCreator(seed, e_quota, scheduleDict, attributeDict, o_agents, wb_agents
         e_agents[agent_name] = Agent(agent_name,
                                     scheduleDict[agent],
                                     agentAttributes["wallbox"]=="True",
-                                    rng.uniform(float(agentAttributes["lowerBound"]),1),
+                                    soc_start,
                                     float(agentAttributes["lowerBound"]),
                                     agentAttributes["home"]=="o")
         if multi:
@@ -168,6 +168,49 @@ def agentCreator(seed, e_quota, scheduleDict, attributeDict, o_agents, wb_agents
     e_agents_relevant = {key:agent for key,agent in e_agents.items() if agent.is_relevant()}
     return e_agents_relevant  
 
+#sample the electric agents of a day without their schedules, attributeDict only needs the lower bound of every agent
+#nested samples (default: NESTED_SAMPLING) are prefixes of a permutation of the agents with start socs drawn for all agents, so the sample of a larger e_quota contains the sample of every smaller one with the same seed
+#return list of (agent id, soc at start of the day)
+def sampleAgents(seed, e_quota, attributeDict, o_agents, wb_agents, nwb_agents, size=[0,0], nested=None):
+    #init
+    rng = np.random.default_rng(seed)
+
+    num_agents = round(TOT_AGENTS*e_quota)
+    num_outerAgents = round(O_QUOTA*num_agents)
+    num_innerAgents = num_agents-num_outerAgents
+
+    size[:]=[TOT_AGENTS,num_agents]
+
+    if NESTED_SAMPLING if nested is None else nested:
+        outerOrder = rng.permutation(len(o_agents))
+        innerAgents = wb_agents+nwb_agents
+        innerOrder = rng.permutation(len(innerAgents))
+        outerSocs = rng.random(len(o_agents))
+        innerSocs = rng.random(len(innerAgents))
+        sample = [(o_agents[i],u) for i,u in zip(outerOrder[:num_outerAgents],outerSocs)]+[(innerAgents[i],u) for i,u in zip(innerOrder[:num_innerAgents],innerSocs)]
+        return [(agent,float(attributeDict[agent]["lowerBound"])+u*(1-float(attributeDict[agent]["lowerBound"]))) for agent,u in sample]
+
+    e_agent_keys = rng.choice(o_agents,num_outerAgents,replace=False)
+    e_agent_keys = np.concatenate([e_agent_keys,rng.choice(wb_agents+nwb_agents,num_innerAgents,replace=False)])
+
+    return [(agent,rng.uniform(float(attributeDict[agent]["lowerBound"]),1)) for agent in e_agent_keys]
+
+#return the 2-bit codes of patterns (rows of a uint8 matrix with 0, 1 or 2 per stop), where stop k contributes its value times 4^k
+#codes of patterns with up to 31 stops are int64, longer patterns are encoded as python integers
+def patternCodes(patterns):
+    patterns = np.asarray(patterns,dtype=np.uint8)
+    if patterns.shape[1] < 32:
+        return patterns.astype(np.int64)@(np.int64(4)**np.arange(patterns.shape[1],dtype=np.int64))
+    return (patterns.astype(object)*np.array([4**k for k in range(patterns.shape[1])],dtype=object)).sum(axis=1)
+
+#return the pattern of a 2-bit code (see patternCodes) as tuple
+def decodePattern(code,num_stops):
+    return tuple((int(code)>>(2*k))&3 for k in range(num_stops))
+
+#return mask of the patterns (rows of a matrix) that are dominated by the pattern, i.e. charge at least as much at every stop
+def dominatedPatterns(patterns,pattern):
+    return (patterns>=pattern).all(axis=1)
+
 #add stop to corresponding sets if it is valid
 def addValidStop(index,bp,breakpoints_filter,valid_stops,valid_fastStops):
     if bp in breakpoints_filter:
@@ -234,9 +277,8 @@ class Agent:
                 return False
         return True
 
-    #calculate all valid patterns with a maximum number of max_exactStops charging stops and save in agent
-    def calculatePatterns(self,breakpoints_filter,max_exactStops=3):
-        self.valid_patterns = []
+    #return the stops at breakpoints and the stops at fast breakpoints
+    def eligibleStops(self,breakpoints_filter):
         valid_stops = set()
         valid_fastStops = set()
         for index,stop in enumerate(self.schedule):
@@ -245,39 +287,41 @@ class Agent:
         stop = self.schedule[-1]
         bp = (float(stop["ex"]),float(stop["ey"]))
         addValidStop(len(self.schedule),bp,breakpoints_filter,valid_stops,valid_fastStops)
+        return valid_stops, valid_fastStops
 
-        stop_combinations = [tuple([2 if k in fast_assignment else 1 if k in stop_set else 0 for k in range(self.num_stops)])
+    #calculate all valid patterns with a maximum number of max_exactStops charging stops and save in agent as uint8 matrix with one row per pattern
+    #if stops is given, only these stops (at breakpoints) are used for charging
+    def calculatePatterns(self,breakpoints_filter,max_exactStops=3,stops=None):
+        valid_stops, valid_fastStops = self.eligibleStops(breakpoints_filter)
+        if stops is not None:
+            valid_stops &= stops
+            valid_fastStops &= stops
+
+        stop_combinations = np.array([[2 if k in fast_assignment else 1 if k in stop_set else 0 for k in range(self.num_stops)]
                              for i in range(1,max_exactStops+1) 
                              for stop_set in itertools.combinations(valid_stops,i) 
                              for j in range(len(valid_fastStops.intersection(set(stop_set)))+1) 
-                             for fast_assignment in itertools.combinations(valid_fastStops.intersection(set(stop_set)),j)]
+                             for fast_assignment in itertools.combinations(valid_fastStops.intersection(set(stop_set)),j)],dtype=np.uint8).reshape(-1,self.num_stops)
 
-        while stop_combinations:
-            combination = stop_combinations.pop(0)
-            if not self.is_validPattern(combination):
+        #patterns are checked in order, every valid pattern removes the remaining patterns it dominates
+        remaining = np.ones(len(stop_combinations),dtype=bool)
+        valid = []
+        for index in range(len(stop_combinations)):
+            if not remaining[index]:
                 continue
-            self.valid_patterns += [combination]
-            dominated = []
-            for c in stop_combinations:
-                if all([x[0]<=x[1] for x in zip(combination,c)]):
-                    dominated.append(c)
-
-            for c in dominated:
-                stop_combinations.pop(stop_combinations.index(c))
+            remaining[index] = False
+            if not self.is_validPattern(stop_combinations[index].tolist()):
+                continue
+            valid.append(index)
+            remaining &= ~dominatedPatterns(stop_combinations,stop_combinations[index])
+        self.valid_patterns = stop_combinations[valid]
 
         return
 
     #calculate greedy pattern with respect to some starting pattern
     #return greedy pattern or False if there is none
     def calculateGreedyPattern(self,breakpoints_filter,start_pattern=[]):
-        valid_stops = set()
-        valid_fastStops = set()
-        for index,stop in enumerate(self.schedule):
-            bp = (float(stop["sx"]),float(stop["sy"]))
-            addValidStop(index,bp,breakpoints_filter,valid_stops,valid_fastStops)
-        stop = self.schedule[-1]
-        bp = (float(stop["ex"]),float(stop["ey"]))
-        addValidStop(len(self.schedule),bp,breakpoints_filter,valid_stops,valid_fastStops)
+        valid_stops, valid_fastStops = self.eligibleStops(breakpoints_filter)
         if not self.is_validPattern(start_pattern+[2 if i in valid_fastStops else 1 if i in valid_stops else 0 for i in range(len(start_pattern),self.num_stops)]):
             return False
         
@@ -0,0 +1,131 @@
+import copy
+import logging
+import numpy as np
+
+from .agentUtils import patternCodes
+
+_LOGGER = logging.getLogger(__name__)
+LOG_LEVEL = logging.DEBUG
+_LOGGER.setLevel(LOG_LEVEL)
+
+#return the signature of an agent: its number of charging opportunities, the index and location of its charging opportunities at relevant breakpoints and its valid patterns
+#only agents with equal signature can be equivalent, their break windows are compared separately (see aggregateAgents)
+def agentSignature(agent,rb):
+    opps = tuple((opp["index"],opp["loc"]) for opp in agent.charging_opps if opp["loc"] in rb)
+    return len(agent.charging_opps), opps, frozenset(patternCodes(agent.valid_patterns).tolist())
+
+#return the break windows (start,end) of the charging opportunities of an agent at relevant breakpoints as matrix
+def breakWindows(agent,rb):
+    return np.array([opp["time"] for opp in agent.charging_opps if opp["loc"] in rb],dtype=np.int64).reshape(-1,2)
+
+#return the agent of a class: its first member, whose break windows at relevant breakpoints are widened to the smallest windows containing the windows of all members
+#the widened agent is a copy, so capacity sets of the class contain its charging processes whenever one of the members is present
+def classAgent(agents,rb):
+    representative = agents[0]
+    windows = np.array([breakWindows(agent,rb) for agent in agents])
+    starts, ends = windows[:,:,0].min(axis=0), windows[:,:,1].max(axis=0)
+    if (starts==windows[0,:,0]).all() and (ends==windows[0,:,1]).all():
+        return representative
+    agent = copy.copy(representative)
+    hull = zip(starts.tolist(),ends.tolist())
+    agent.charging_opps = [dict(opp,time=next(hull)) if opp["loc"] in rb else opp for opp in representative.charging_opps]
+    return agent
+
+#group equivalent agents into classes, where agents of different groups (see csBaseModel.capacityGroups) are never merged
+#an agent joins the first class with equal signature whose representative (first member) has all break windows within the tolerance (in seconds) of its own
+#return agents per class (see classAgent), multiplicity per class, members per class and class keys per group
+def aggregateAgents(ear,rb,tolerance=0,groups=[None]):
+    classEar = {}
+    acm = {}
+    members = {}
+    classGroups = []
+    for agentKeys in groups:
+        classes = {}
+        classKeys = []
+        for key in (ear if agentKeys is None else agentKeys):
+            windows = breakWindows(ear[key],rb)
+            candidates = classes.setdefault(agentSignature(ear[key],rb),[])
+            classKey = next((classKey for classKey,representativeWindows in candidates if np.abs(windows-representativeWindows).max(initial=0)<=tolerance),None)
+            if classKey is None:
+                candidates.append((key,windows))
+                classKeys.append(key)
+                members[key] = [key]
+            else:
+                members[classKey].append(key)
+        for key in classKeys:
+            acm[key] = len(members[key])
+            classEar[key] = classAgent([ear[member] for member in members[key]],rb)
+        classGroups.append(None if agentKeys is None else classKeys)
+
+    _LOGGER.info(f"aggregated {len(ear)} agents into {len(classEar)} classes (largest class: {max(acm.values(),default=0)} agents)")
+    return classEar, acm, members, classGroups
+
+#distribute the solution of an aggregated model among the members of every agent class (see aggregateAgents)
+#ear are the agents per class, satisfied the number of satisfied agents per class, processes the value per charging process (class,index,cx,cy,speed) and patterns the valid patterns per class chosen by the pattern variables
+#with integral assignment every charging process of a class is given as a whole to one member: the first z members each take the processes of a valid pattern of the class (see assignPattern), preferably of the chosen patterns, and the remaining processes go to members without process at their stop
+#with fractional assignment the first z members share the charging processes of their class equally, which is a feasible assignment for each of them as the class assignment lies in z times their charging demand polytope
+#return set of satisfied agents and dict with value per charging process (agent,index,cx,cy,speed) of the individual agents
+def disaggregateSolution(ear,members,satisfied,processes,patterns={},fractional=False):
+    satisfiedAgents = set()
+    agentProcesses = {}
+    classProcesses = {}
+    for cp,value in processes.items():
+        classProcesses.setdefault(cp[0],[]).append((cp,value))
+    for key,agentKeys in members.items():
+        numSatisfied = int(round(satisfied[key]))
+        if fractional:
+            satisfiedAgents.update(agentKeys[:numSatisfied])
+            recipients = agentKeys[:numSatisfied] if numSatisfied else agentKeys
+            for cp,value in classProcesses.get(key,[]):
+                for agentKey in recipients:
+                    agentProcesses[(agentKey,)+cp[1:]] = value/len(recipients)
+            continue
+        #whole charging processes per stop of the class
+        units = {}
+        for cp,value in classProcesses.get(key,[]):
+            units.setdefault(cp[1],[]).extend([cp[2:]]*int(round(value)))
+        stops = {agentKey:{} for agentKey in agentKeys}
+        preferred = patterns.get(key,[])
+        for number,agentKey in enumerate(agentKeys[:numSatisfied]):
+            if assignPattern(ear[key],units,stops[agentKey],preferred[number:number+1]):
+                satisfiedAgents.add(agentKey)
+        for index,indexUnits in units.items():
+            #at most one process per stop and member, as the class has at most its multiplicity many processes per stop
+            for agentKey,unit in zip([agentKey for agentKey in agentKeys if index not in stops[agentKey]],indexUnits):
+                stops[agentKey][index] = unit
+        for agentKey,assignment in stops.items():
+            agentProcesses.update({(agentKey,index)+unit:1 for index,unit in assignment.items()})
+        if len(satisfiedAgents.intersection(agentKeys)) < numSatisfied:
+            _LOGGER.warning(f"class {key}: only {len(satisfiedAgents.intersection(agentKeys))} of {numSatisfied} satisfied members could be given a valid pattern")
+    _LOGGER.info(f"{len(satisfiedAgents)} of {sum(len(agentKeys) for agentKeys in members.values())} agents satisfied after disaggregation")
+    return satisfiedAgents, agentProcesses
+
+#take the whole charging processes (cx,cy,speed) of a valid pattern of the agent from the remaining processes per stop (units) and assign them to a member (stops: process per stop)
+#the first of the preferred patterns that the remaining processes cover is taken, otherwise the covered pattern whose stops have most remaining processes, which keeps scarce processes for the next members
+#stops of a pattern with value 1 prefer slow processes, agents without valid pattern take four processes at different stops, two of them fast
+#return whether a valid pattern was assigned, units are only changed in this case
+def assignPattern(agent,units,stops,preferred=[]):
+    def available(index,value):
+        return sorted([unit for unit in units.get(index,[]) if value==1 or unit[2]=="f"],key=lambda unit:unit[2]=="f")
+    def cover(pattern):
+        chosen = {index:available(index,value) for index,value in enumerate(pattern) if value}
+        return {index:candidates[0] for index,candidates in chosen.items()} if all(chosen.values()) else None
+    if not len(agent.valid_patterns):
+        fastStops = [index for index in units if available(index,2)][:2]
+        otherStops = [index for index in units if index not in fastStops and units[index]][:2]
+        if len(fastStops)<2 or len(otherStops)<2:
+            return False
+        chosen = {index:available(index,2)[0] for index in fastStops}
+        chosen.update({index:available(index,1)[0] for index in otherStops})
+    else:
+        chosen = next((chosen for chosen in map(cover,preferred) if chosen is not None),None)
+        if chosen is None:
+            covered = [(pattern,chosen) for pattern,chosen in ((pattern,cover(pattern)) for pattern in agent.valid_patterns.tolist()) if chosen is not None]
+            if not covered:
+                return False
+            remaining = lambda pattern:[len(available(index,value)) for index,value in enumerate(pattern) if value]
+            chosen = max(covered,key=lambda item:(min(remaining(item[0])),sum(remaining(item[0]))))[1]
+    for index,unit in chosen.items():
+        units[index].remove(unit)
+    stops.update(chosen)
+    return True
@@ -0,0 +1,204 @@
+import importlib
+import logging
+import numpy as np
+import scipy.sparse as sp
+import time
+
+from .aggregationUtils import disaggregateSolution
+from .fileUtils import saveChargingStations, silentremove
+from .matrixUtils import csMatrixBuilder
+from .settingsUtils import modelSettings
+
+_LOGGER = logging.getLogger(__name__)
+LOG_LEVEL = logging.DEBUG
+_LOGGER.setLevel(LOG_LEVEL)
+
+#modules of the optimization package that build gurobi models and therefore import gurobipy
+GUROBI_MODULES = ["bendersUtils","checkpointUtils","modelUtils","pipelineUtils","shardUtils"]
+
+#import the modules that build gurobi models (see GUROBI_MODULES) for the given use
+#raise an ImportError naming the missing solver if gurobipy is not installed
+def requireGurobi(use):
+    try:
+        import gurobipy
+    except ImportError as error:
+        raise ImportError(f"{use} needs the gurobi solver, but gurobipy is not installed (the models of createModel and createMultiModel can be solved with s_backend=\"highs\" instead)") from error
+    for name in GUROBI_MODULES:
+        importlib.import_module(f".{name}",__package__)
+
+#return the result of a solve as dict
+def solverResult(solution,objective,status,runtime,gap=None,nodes=None):
+    return {
+        "solution":solution,
+        "objective":objective,
+        "status":status,
+        "runtime":runtime,
+        "gap":gap,
+        "nodes":nodes
+    }
+
+#solves a model given by sparse constraint blocks (name, matrix, senses, right hand sides) with gurobi
+#gurobipy is only imported when this backend is used
+class gurobiBackend:
+    def __init__(self,settings):
+        self._settings = settings
+
+    def solve(self,c,maximize,blocks,ub,vtypes):
+        import gurobipy
+
+        m = gurobipy.Model()
+        m.setParam("Method",self._settings["i_method"])
+        if not self._settings["b_presolve"]:
+            m.setParam("Presolve",0)
+        if self._settings["s_logFile"]:
+            silentremove(self._settings["s_logFile"])
+            m.setParam("LogFile",self._settings["s_logFile"])
+        if self._settings["f_mipgap"]:
+            m.setParam("MIPGap",self._settings["f_mipgap"])
+        if self._settings["i_timelimit"]:
+            m.setParam("TimeLimit",self._settings["i_timelimit"])
+
+        x = m.addMVar(len(c),ub=ub,vtype=vtypes)
+        for name,A,sense,rhs in blocks:
+            if A.shape[0]:
+                m.addMConstr(A,x,sense,rhs)
+        m.setMObjective(None,c,0.0,xc=x,sense=gurobipy.GRB.MAXIMIZE if maximize else gurobipy.GRB.MINIMIZE)
+        m.optimize()
+
+        status = {gurobipy.GRB.OPTIMAL:"optimal",gurobipy.GRB.TIME_LIMIT:"time limit",gurobipy.GRB.INFEASIBLE:"infeasible"}.get(m.Status,"other")
+        if not m.SolCount:
+            result = solverResult(None,None,status,m.Runtime)
+        else:
+            result = solverResult(x.X,m.ObjVal,status,m.Runtime,m.MIPGap,m.NodeCount)
+        m.dispose()
+        return result
+
+#solves a model given by sparse constraint blocks (name, matrix, senses, right hand sides) with HiGHS through scipy (no license needed)
+class highsBackend:
+    def __init__(self,settings):
+        self._settings = settings
+
+    def solve(self,c,maximize,blocks,ub,vtypes):
+        from scipy.optimize import Bounds, LinearConstraint, milp
+
+        A = sp.vstack([A for _,A,_,_ in blocks]+[sp.csr_matrix((0,len(c)))],format="csr")
+        sense = np.concatenate([sense for _,_,sense,_ in blocks]+[np.array([],dtype="<U1")])
+        rhs = np.concatenate([rhs for _,_,_,rhs in blocks]+[np.array([])])
+        lower = np.where(sense=="<",-np.inf,rhs)
+        upper = np.where(sense==">",np.inf,rhs)
+        integer = vtypes!="C"
+        #binary variables may have an infinite upper bound in the layout
+        ub = np.where(vtypes=="B",np.minimum(ub,1),ub)
+
+        options = {"disp":bool(self._settings["s_logFile"]),"presolve":bool(self._settings["b_presolve"])}
+        if self._settings["f_mipgap"]:
+            options["mip_rel_gap"] = self._settings["f_mipgap"]
+        if self._settings["i_timelimit"]:
+            options["time_limit"] = self._settings["i_timelimit"]
+
+        t_start = time.time()
+        res = milp(-c if maximize else c,integrality=integer.astype(int),bounds=Bounds(np.zeros(len(c)),ub),constraints=LinearConstraint(A,lower,upper) if A.shape[0] else None,options=options)
+        runtime = time.time()-t_start
+
+        status = {0:"optimal",1:"time limit",2:"infeasible"}.get(res.status,"other")
+        if res.x is None:
+            return solverResult(None,None,status,runtime)
+        return solverResult(res.x,-res.fun if maximize else res.fun,status,runtime,getattr(res,"mip_gap",None),getattr(res,"mip_node_count",None))
+
+BACKENDS = {"gurobi":gurobiBackend, "highs":highsBackend}
+
+#charging station model that is assembled by the matrix builder and solved by an exchangeable backend (see BACKENDS)
+#groups are the sets of agents sharing the charging stations, robust maximizes the satisfied agents of the worst group (as csMultiModel)
+#facets are the outer descriptions per agent (see matrixUtils.calculateFacets), which are calculated if not given, requirementRows keeps the requirement rows per agent (see matrixUtils.csMatrixBuilder)
+class csBackendModel:
+    def __init__(self,ear,rc,rcpb,rb,rcc=None,acm=None,facets=None,groups=[None],robust=False,requirementRows=None,**kwargs):
+        #set values
+        self._settings = modelSettings(**kwargs)
+        for prop, value in self._settings.items():
+            setattr(self, "_"+prop, value)
+        if self._b_portCount or self._b_lazyCapacity:
+            raise ValueError("Port counts and lazy capacity constraints are only available for csBaseModel.")
+        if self._s_backend not in BACKENDS:
+            raise ValueError(f"unknown backend {self._s_backend}, possible values: {list(BACKENDS)}")
+
+        #model input
+        self._ear = ear
+        self._rc = rc
+        self._numAgents = sum(acm.get(key,1) for key in ear) if acm else len(ear)
+
+        self._backend = BACKENDS[self._s_backend](self._settings)
+        self._builder = csMatrixBuilder(ear,rc,rcpb,rb,rcc=rcc,acm=acm,facets=facets,groups=groups,robust=robust,requirementRows=requirementRows,**self._settings)
+        self._blocks = []
+        self._objective = None
+        self._result = None
+
+    def addStandardConstraints(self):
+        self._blocks = self._builder.standardBlocks()
+        for name,A,_,_ in self._blocks:
+            _LOGGER.info(f"{A.shape[0]} {name} constraints added")
+
+    def addCSObjective(self):
+        self._objective = self._builder.objective()
+
+    #return dict with solution vector, objective, status, runtime, gap and nodes
+    def optimize(self):
+        c, maximize = self._objective
+        self._result = self._backend.solve(c,maximize,self._blocks,self._builder._ub,self._builder._vtypes)
+        _LOGGER.info(f"{self._s_backend} finished with status {self._result['status']} after {self._result['runtime']:.2f}s (objective {self._result['objective']})")
+        return self._result
+
+    def logSolutionStatistics(self):
+        solution = self._result["solution"]
+        self._fastChargingPorts = self._builder.portValues(solution,"f")
+        self._slowChargingPorts = self._builder.portValues(solution,"s")
+
+        chargingProcesses = self._builder.processValues(solution)
+        _LOGGER.info(f"no of fast charging ports: {sum(self._fastChargingPorts.values())}")
+        _LOGGER.info(f"no of slow charging ports: {sum(self._slowChargingPorts.values())}")
+
+        _LOGGER.info(f"no of fast charging processes: {sum([val for key,val in chargingProcesses.items() if key[4]=='f'])}")
+        _LOGGER.info(f"no of slow charging processes: {sum([val for key,val in chargingProcesses.items() if key[4]=='s'])}")
+
+        _LOGGER.info(f"no of agents: {self._numAgents}")
+        _LOGGER.info(f"no of candidate charging stations: {len(self._rc)}")
+        return
+
+    #distribute the solution among the members of every agent class (see aggregationUtils.disaggregateSolution)
+    #return set of satisfied agents and dict with value per charging process (agent,index,cx,cy,speed) of the individual agents
+    def disaggregateSolution(self,members):
+        solution = self._result["solution"]
+        patterns = {key:self.chosenPatterns(key) for key in members}
+        return disaggregateSolution(self._ear,members,self._builder.satisfiedValues(solution),self._builder.processValues(solution,1e-6),patterns,self._b_fractionalAssignment)
+
+    #return the valid patterns of an agent (class) repeated by the values of their pattern variables (empty without pattern variables)
+    def chosenPatterns(self,key):
+        values = self._builder.patternValues(self._result["solution"],key)
+        return [pattern for pattern,value in zip(self._ear[key].valid_patterns.tolist(),values) for _ in range(int(round(value)))]
+
+    def saveSolutionToFile(self,filename):
+        saveChargingStations(filename,self._fastChargingPorts,self._slowChargingPorts)
+
+    #release the constraint blocks and the solution
+    def dispose(self):
+        self._blocks = []
+        self._result = None
+
+#create the model of an instance for the backend of the settings (s_backend, default: BACKEND)
+#gurobi builds a csBaseModel, every other backend a csBackendModel, which supports neither port counts nor lazy constraints
+def createModel(ear,rc,rcpb,rb,rcc=None,acm=None,**kwargs):
+    if modelSettings(**kwargs)["s_backend"] == "gurobi":
+        requireGurobi("csBaseModel")
+        from .modelUtils import csBaseModel
+        return csBaseModel(ear,rc,rcpb,rb,rcc,acm,**kwargs)
+    return csBackendModel(ear,rc,rcpb,rb,rcc=rcc,acm=acm,**kwargs)
+
+#create the robust model over several seeds (agent keys per seed akps) for the backend of the settings (see createModel)
+#weighted seeds are only supported by the csMultiModel of gurobi
+def createMultiModel(ear,rc,rcpb,rb,seeds,akps,rcc=None,weights=None,**kwargs):
+    if modelSettings(**kwargs)["s_backend"] == "gurobi":
+        requireGurobi("csMultiModel")
+        from .modelUtils import csMultiModel
+        return csMultiModel(ear,rc,rcpb,rb,seeds,akps,weights,rcc=rcc,**kwargs)
+    if weights:
+        raise ValueError("Weighted seeds are only available for csMultiModel with the gurobi backend.")
+    return csBackendModel(ear,rc,rcpb,rb,rcc=rcc,groups=[akps[seed] for seed in seeds],robust=True,**kwargs)
@@ -0,0 +1,271 @@
+from gurobipy import GRB, LinExpr, Model
+import logging
+from multiprocessing import Pipe, Process
+import numpy as np
+import scipy.sparse as sp
+import time
+
+from .fileUtils import saveChargingStations, silentremove
+from .matrixUtils import calculateFacets, csMatrixBuilder
+from .settingsUtils import modelSettings
+
+_LOGGER = logging.getLogger(__name__)
+LOG_LEVEL = logging.DEBUG
+_LOGGER.setLevel(LOG_LEVEL)
+
+#feasibility subproblem of one seed: charging processes (y) and pattern variables (w) for fixed charging stations (x) and satisfied agents (z)
+#every row gets an artificial variable, the minimal sum of the artificial variables is zero if and only if the fixed values are feasible
+class bendersSubproblem:
+    def __init__(self,ear,rc,rcpb,rb,rcc,facets,settings):
+        b = csMatrixBuilder(ear,rc,rcpb,rb,rcc=rcc,facets=facets,**settings)
+        blocks = [(A,sense,rhs) for name,A,sense,rhs in b.standardBlocks() if name in ["requirement","cpPerStop","capacity"] and A.shape[0]]
+        A = sp.vstack([A for A,_,_ in blocks]+[sp.csr_matrix((0,b.numVars()))],format="csc")
+        sense = np.concatenate([sense for _,sense,_ in blocks]+[np.array([],dtype="<U1")])
+        self._rhs = np.concatenate([rhs for _,_,rhs in blocks]+[np.array([])])
+
+        #master columns are x and z, all other columns belong to the subproblem
+        masterCols = np.concatenate([np.arange(b._xOffset,b._yOffset),np.arange(b._zOffset,b._wOffset)])
+        subCols = np.concatenate([np.arange(b._yOffset,b._zOffset),np.arange(b._wOffset,b._sOffset)])
+        self._Am = A[:,masterCols].tocsr()
+
+        #artificial variables: -a for <, +a for >, +a-a' for =
+        rows = np.arange(len(sense))
+        eqRows = np.nonzero(sense=="=")[0]
+        artRows = np.concatenate([rows,eqRows])
+        artVals = np.concatenate([np.where(sense=="<",-1.0,1.0),-np.ones(len(eqRows))])
+        D = sp.csc_matrix((artVals,(artRows,np.arange(len(artRows)))),shape=(len(sense),len(artRows)))
+
+        self._ub = np.concatenate([b._ub[subCols],np.full(len(artRows),np.inf)])
+        self._model = Model()
+        self._model.setParam("OutputFlag",0)
+        self._vars = self._model.addMVar(len(self._ub),ub=self._ub)
+        self._constrs = self._model.addMConstr(sp.hstack([A[:,subCols],D],format="csr"),self._vars,sense,self._rhs)
+        self._model.setMObjective(None,np.concatenate([np.zeros(len(subCols)),np.ones(len(artRows))]),0.0,xc=self._vars,sense=GRB.MINIMIZE)
+        self._numX = b._numX
+
+    #return the feasibility cut (coefficients of x, coefficients of z, right hand side) that is violated by the given values or None if they are feasible
+    #the cut g*(x,z) >= rhs is derived from the duals of the subproblem and is valid for all values, as the dual solution does not depend on them
+    def cut(self,xVals,zVals,tolerance=1e-6):
+        values = np.concatenate([xVals,zVals])
+        self._constrs.setAttr("RHS",self._rhs-self._Am@values)
+        self._model.optimize()
+        if self._model.ObjVal <= tolerance:
+            return None
+        pi = self._constrs.Pi
+        rc = self._vars.RC
+        finite = np.isfinite(self._ub)
+        rhs = pi@self._rhs+np.minimum(rc[finite],0)@self._ub[finite]
+        g = self._Am.T@pi
+        return g[:self._numX], g[self._numX:], rhs
+
+#worker process owning the subproblems of some seeds, it answers requests {seed:(x values, z values)} with {seed:cut or None} until it receives None
+def bendersWorker(conn,seedData,rc,rcpb,rb,rcc,settings):
+    subproblems = {seed:bendersSubproblem(ear,rc,rcpb,rb,rcc,facets,settings) for seed,(ear,facets) in seedData.items()}
+    conn.send(True)
+    while True:
+        request = conn.recv()
+        if request is None:
+            break
+        conn.send({seed:subproblems[seed].cut(*values) for seed,values in request.items()})
+    conn.close()
+
+#robust model of csMultiModel solved by benders decomposition
+#the master problem contains the charging stations (x), the satisfied agents (z) and the robust objective (s), the charging processes of every seed are checked by a feasibility subproblem in persistent worker processes
+#subproblems are linear programs, so fractional assignments are required; as the objective only involves master variables, all cuts are feasibility cuts
+class csBendersModel:
+    def __init__(self,ear,rc,rcpb,rb,seeds,akps,rcc=None,facets=None,workers=4,**kwargs):
+        #set values
+        self._settings = modelSettings(**kwargs)
+        for prop, value in self._settings.items():
+            setattr(self, "_"+prop, value)
+        if not self._b_fractionalAssignment:
+            raise ValueError("Benders decomposition requires fractional assignments, as its subproblems are linear programs.")
+        if self._b_portCount or self._b_lazyCapacity:
+            raise ValueError("Port counts and lazy capacity constraints are only available for csBaseModel.")
+
+        #model input
+        self._ear = ear
+        self._rc = rc
+        self._rcpb = rcpb
+        self._rb = rb
+        self._rcc = rcc
+        self._seeds = list(seeds)
+        self._akps = akps
+        self._numAgents = sum(len(akps[seed]) for seed in self._seeds)
+        if self._b_outer and facets is None:
+            facets = calculateFacets({key:ear[key] for seed in self._seeds for key in akps[seed]},self._i_polytopeThreads,self._i_polytopeTimeout,self._f_preprocessingBudget)
+        self._facets = facets if self._b_outer else {}
+        self._numWorkers = max(1,min(workers,len(self._seeds)))
+
+        #master columns: x (layout of the matrix builder without agents), z per agent of every seed and s
+        self._layout = csMatrixBuilder({},rc,rcpb,rb,rcc=rcc,facets={},**self._settings)
+        self._bZ = self._layout._bZ
+        self._bS = self._b_limit or self._b_budget
+        self._numX = self._layout._numX
+        self._zStarts = {}
+        numZ = 0
+        if self._bZ:
+            for seed in self._seeds:
+                self._zStarts[seed] = numZ
+                numZ += len(akps[seed])
+        self._numZ = numZ
+        self._numVars = self._numX+self._numZ+(1 if self._bS else 0)
+
+        #master model
+        self._master = Model()
+        self._master.setParam("Method",self._i_method)
+        self._master.setParam("LazyConstraints",1)
+        if not self._b_presolve:
+            self._master.setParam("Presolve",0)
+        if self._s_logFile:
+            silentremove(self._s_logFile)
+            self._master.setParam("LogFile",self._s_logFile)
+        if self._f_mipgap:
+            self._master.setParam("MIPGap",self._f_mipgap)
+        if self._i_timelimit:
+            self._master.setParam("TimeLimit",self._i_timelimit)
+        vtypes = np.array(["B"]*(self._numX+self._numZ)+["I"]*(self._numVars-self._numX-self._numZ))
+        self._vars = self._master.addMVar(self._numVars,ub=np.where(vtypes=="B",1,np.inf),vtype=vtypes)
+        self._varList = self._vars.tolist()
+
+        self._workers = []
+        self._numCuts = 0
+        self._numSeparations = 0
+        self._separationTime = 0
+        self._solution = None
+
+    #start the worker processes, every worker owns the subproblems of every numWorkers-th seed
+    def startWorkers(self):
+        for w in range(self._numWorkers):
+            seeds = self._seeds[w::self._numWorkers]
+            seedData = {seed:({key:self._ear[key] for key in self._akps[seed]},{key:self._facets[key] for key in self._akps[seed] if key in self._facets}) for seed in seeds}
+            conn, workerConn = Pipe()
+            process = Process(target=bendersWorker,args=(workerConn,seedData,self._rc,self._rcpb,self._rb,self._rcc,self._settings))
+            process.start()
+            self._workers.append((process,conn,seeds))
+        for _,conn,_ in self._workers:
+            conn.recv()
+        _LOGGER.info(f"{len(self._seeds)} subproblems started in {len(self._workers)} worker processes")
+
+    def stopWorkers(self):
+        for process,conn,_ in self._workers:
+            conn.send(None)
+            process.join()
+        self._workers = []
+
+    def addStandardConstraints(self):
+        blocks = [self._layout.maxCSBlock()]
+        if self._b_budget:
+            blocks.append(self._layout.budgetBlock())
+        elif self._b_limit:
+            blocks.append(self._layout.limitBlock())
+        for block in blocks:
+            name,A,sense,rhs = block.toMatrix(self._numVars)
+            self._master.addMConstr(A,self._vars,sense,rhs)
+            _LOGGER.info(f"{A.shape[0]} {name} constraints added to the master problem")
+        if self._bS:
+            for seed in self._seeds:
+                start = self._numX+self._zStarts[seed]
+                self._master.addLConstr(self._varList[-1]<=LinExpr([1.0]*len(self._akps[seed]),self._varList[start:start+len(self._akps[seed])]))
+        if self._b_proportion:
+            self._master.addLConstr(LinExpr([1.0]*self._numZ,self._varList[self._numX:self._numX+self._numZ])>=self._f_proportion*self._numAgents)
+        self.startWorkers()
+
+    def addCSObjective(self):
+        c = np.zeros(self._numVars)
+        if not self._bS:
+            c[:self._numX] = self._layout._xCost
+            self._master.setMObjective(None,c,0.0,xc=self._vars,sense=GRB.MINIMIZE)
+        else:
+            c[-1] = 1
+            self._master.setMObjective(None,c,0.0,xc=self._vars,sense=GRB.MAXIMIZE)
+
+    #send the master values to the subproblems and return the violated cuts as (coefficients of all master columns, right hand side)
+    def separate(self,values):
+        t_start = time.time()
+        xVals = values[:self._numX]
+        for _,conn,seeds in self._workers:
+            conn.send({seed:(xVals,self.seedZValues(values,seed)) for seed in seeds})
+        cuts = []
+        for _,conn,_ in self._workers:
+            for seed,cut in conn.recv().items():
+                if cut is None:
+                    continue
+                gX, gZ, rhs = cut
+                g = np.zeros(self._numVars)
+                g[:self._numX] = gX
+                if self._bZ:
+                    start = self._numX+self._zStarts[seed]
+                    g[start:start+len(gZ)] = gZ
+                cuts.append((g,rhs))
+        self._numSeparations += 1
+        self._separationTime += time.time()-t_start
+        return cuts
+
+    #return the z values of the agents of a seed (empty if z is constant)
+    def seedZValues(self,values,seed):
+        if not self._bZ:
+            return np.zeros(0)
+        start = self._numX+self._zStarts[seed]
+        return values[start:start+len(self._akps[seed])]
+
+    #return the linear expression of a cut
+    def cutExpression(self,g):
+        cols = np.nonzero(np.abs(g)>1e-9)[0]
+        return LinExpr(g[cols].tolist(),[self._varList[col] for col in cols])
+
+    def cutCallback(self,model,where):
+        if where == GRB.Callback.MIPSOL:
+            values = np.array(model.cbGetSolution(self._varList))
+            for g,rhs in self.separate(values):
+                model.cbLazy(self.cutExpression(g)>=rhs)
+                self._numCuts += 1
+
+    #strengthen the master problem by cuts that separate solutions of its lp relaxation
+    def addRootCuts(self,rounds=10):
+        self._master.update()
+        relaxed = self._master.relax()
+        relaxed.setParam("OutputFlag",0)
+        relaxedVars = relaxed.getVars()
+        for _ in range(rounds):
+            relaxed.optimize()
+            if not relaxed.SolCount:
+                break
+            cuts = self.separate(np.array(relaxed.getAttr("X",relaxedVars)))
+            if not cuts:
+                break
+            for g,rhs in cuts:
+                cols = np.nonzero(np.abs(g)>1e-9)[0]
+                relaxed.addLConstr(LinExpr(g[cols].tolist(),[relaxedVars[col] for col in cols])>=rhs)
+                self._master.addLConstr(self.cutExpression(g)>=rhs)
+                self._numCuts += 1
+        relaxed.dispose()
+        _LOGGER.info(f"{self._numCuts} benders cuts added at the root")
+
+    def optimize(self,rootRounds=10):
+        try:
+            self.addRootCuts(rootRounds)
+            self._master.optimize(self.cutCallback)
+        finally:
+            self.stopWorkers()
+        if self._master.SolCount:
+            self._solution = np.array(self._master.getAttr("X",self._varList))
+        _LOGGER.info(f"benders decomposition finished after {self._master.Runtime:.2f}s with {self._numCuts} cuts from {self._numSeparations} separations ({self._separationTime:.2f}s in subproblems)")
+
+    def logSolutionStatistics(self):
+        self._fastChargingPorts = self._layout.portValues(self._solution,"f")
+        self._slowChargingPorts = self._layout.portValues(self._solution,"s")
+        _LOGGER.info(f"no of fast charging ports: {sum(self._fastChargingPorts.values())}")
+        _LOGGER.info(f"no of slow charging ports: {sum(self._slowChargingPorts.values())}")
+        if self._bZ:
+            for seed in self._seeds:
+                _LOGGER.info(f"seed {seed}: {round(self.seedZValues(self._solution,seed).sum())} of {len(self._akps[seed])} agents satisfied")
+        _LOGGER.info(f"no of agents: {self._numAgents}")
+        _LOGGER.info(f"no of candidate charging stations: {len(self._rc)}")
+
+    def saveSolutionToFile(self,filename):
+        saveChargingStations(filename,self._fastChargingPorts,self._slowChargingPorts)
+
+    def dispose(self):
+        self.stopWorkers()
+        self._master.dispose()
@@ -0,0 +1,119 @@
+import logging
+from math import comb
+import numpy as np
+import time
+
+_LOGGER = logging.getLogger(__name__)
+LOG_LEVEL = logging.DEBUG
+_LOGGER.setLevel(LOG_LEVEL)
+
+#seconds per candidate pattern and stop of the pattern enumeration (see agentUtils.Agent.calculatePatterns)
+ENUMERATION_RATE = 2e-7
+#seconds per squared vertex and dimension of the outer description (see polytopeUtils.calculatePatternInequalities)
+FACET_RATE = 5e-7
+#estimated time (in seconds) up to which the outer description of an agent is calculated without a separate process
+INLINE_FACETS = 0.01
+#share of the preprocessing budget for the pattern enumeration, the rest is used for the outer descriptions
+ENUMERATION_SHARE = 0.5
+#number of patterns up to which an agent without outer description gets the inner description instead of cut generation
+INNER_PATTERNS = 200
+
+#return the number of candidate patterns with 1 to maxStops charging stops at numStops eligible stops, numFast of which are fast
+def candidateCount(numStops,numFast,maxStops=3):
+    return sum(comb(numFast,j)*comb(numStops-numFast,i-j)*2**j for i in range(1,maxStops+1) for j in range(min(i,numFast)+1))
+
+#return the number of vertices of the charging demand polytope of the patterns (see polytopeUtils.feasibleVertices)
+def vertexCount(patterns):
+    return int((2**(patterns==1).sum(axis=1)).sum())
+
+#return the estimated time of the outer description of an agent
+def facetCost(agent):
+    return FACET_RATE*vertexCount(agent.valid_patterns)**2*2*agent.num_stops
+
+#choose an option (mode, cost) for every key within the budget, options are ordered by preference and the last option of every key is always affordable
+#keys are processed by increasing cost of their preferred option and every key gets the first option whose cost is at most its fair share of the remaining budget
+#return dict with chosen (mode, cost) per key
+def allocate(options,budget):
+    choices = {}
+    remaining = budget
+    keys = sorted(options,key=lambda key:options[key][0][1])
+    for n,key in enumerate(keys):
+        fair = remaining/(len(keys)-n)
+        choices[key] = next((option for option in options[key] if option[1]<=fair),options[key][-1])
+        remaining -= choices[key][1]
+    return choices
+
+#plan the pattern enumeration of the agents within their share of the preprocessing budget (in seconds)
+#every agent gets exact enumeration, pruned enumeration (only its stops with the longest breaks are eligible) or a single greedy pattern
+#return dict with (mode, eligible stops or None, estimated time) per agent
+def planEnumeration(ear,rb,budget,maxStops=3):
+    options = {}
+    stops = {}
+    for key,agent in ear.items():
+        valid_stops, valid_fastStops = agent.eligibleStops(rb)
+        durations = {opp["index"]:opp["time"][1]-opp["time"][0] for opp in agent.charging_opps}
+        stops[key] = sorted(valid_stops,key=lambda index:-durations.get(index,0))
+        counts = [candidateCount(k,len(valid_fastStops.intersection(stops[key][:k])),maxStops) for k in range(len(stops[key]),0,-1)]
+        options[key] = [("exact" if n==0 else "pruned",ENUMERATION_RATE*count*agent.num_stops) for n,count in enumerate(counts)]
+        options[key].append(("greedy",ENUMERATION_RATE*agent.num_stops**2))
+    plan = {}
+    for key,(mode,cost) in allocate(options,ENUMERATION_SHARE*budget).items():
+        eligible = set(stops[key][:len(stops[key])-options[key].index((mode,cost))]) if mode=="pruned" else None
+        plan[key] = (mode,eligible,cost)
+    return plan
+
+#calculate the valid patterns of the agents within their share of the preprocessing budget (in seconds) according to planEnumeration
+#if the enumeration takes longer than its share, the remaining agents only get a greedy pattern, as do agents without valid pattern among their pruned stops
+#return the plan with the modes that were used
+def enumeratePatterns(ear,rb,budget,maxStops=3):
+    t_start = time.time()
+    plan = planEnumeration(ear,rb,budget,maxStops)
+    numOverrun = 0
+    for key,agent in ear.items():
+        mode, eligible, cost = plan[key]
+        if mode!="greedy" and time.time()-t_start>ENUMERATION_SHARE*budget:
+            mode = "greedy"
+            plan[key] = (mode,None,cost)
+            numOverrun += 1
+        if mode!="greedy":
+            agent.calculatePatterns(rb,maxStops,eligible)
+        if mode=="greedy" or (mode=="pruned" and not len(agent.valid_patterns)):
+            gp = agent.calculateGreedyPattern(rb)
+            agent.valid_patterns = np.array([gp] if gp else [],dtype=np.uint8).reshape(-1,agent.num_stops)
+        if mode!="exact":
+            _LOGGER.debug(f"agent {key}: {mode} enumeration (estimated {cost:.3f}s) with {len(agent.valid_patterns)} patterns")
+    logDecisions("enumeration",plan,time.time()-t_start,ENUMERATION_SHARE*budget)
+    if numOverrun:
+        _LOGGER.warning(f"budget exceeded, greedy patterns for {numOverrun} further agents")
+    return plan
+
+#plan the requirement constraints of the agents with valid patterns within their share of the preprocessing budget (in seconds), which is spent in the given number of parallel processes
+#every agent gets the outer description (with a timeout of at most timeout, which is reserved in the budget), the inner description if it has at most INNER_PATTERNS patterns or cut generation
+#a budget of 0 is unlimited, i.e. every agent gets the outer description in a separate process with the given timeout
+#return dict with (mode, timeout or None, estimated time) per agent, with a budget outer descriptions with an estimated time below INLINE_FACETS have timeout None, i.e. are calculated without separate process
+def planRequirements(ear,budget,timeout,processes=1):
+    options = {}
+    costs = {}
+    for key,agent in ear.items():
+        if not len(agent.valid_patterns):
+            continue
+        costs[key] = facetCost(agent)
+        reserved = costs[key] if costs[key]<INLINE_FACETS else min(timeout,2*costs[key]+INLINE_FACETS)
+        options[key] = [("outer",reserved if budget else 0),("inner" if len(agent.valid_patterns)<=INNER_PATTERNS else "cut",0)]
+    plan = {}
+    for key,(mode,reserved) in allocate(options,(1-ENUMERATION_SHARE)*budget*processes).items():
+        agentTimeout = (None if costs[key]<INLINE_FACETS else min(timeout,2*costs[key]+INLINE_FACETS)) if budget else timeout
+        plan[key] = (mode,agentTimeout if mode=="outer" else None,costs[key])
+        if mode!="outer":
+            _LOGGER.debug(f"agent {key}: {mode} description instead of outer description (estimated {costs[key]:.3f}s)")
+    if budget:
+        logDecisions("requirement",plan,None,(1-ENUMERATION_SHARE)*budget)
+    return plan
+
+#log the number of agents and estimated time per mode of a plan
+def logDecisions(stage,plan,runtime,budget):
+    modes = {}
+    for mode,_,cost in plan.values():
+        number, total = modes.get(mode,(0,0))
+        modes[mode] = (number+1,total+cost)
+    _LOGGER.info(f"{stage} budget {budget:.3g}s: "+", ".join(f"{mode} {number} agents (estimated {total:.2f}s)" for mode,(number,total) in modes.items())+(f", took {runtime:.2f}s" if runtime is not None else ""))
@@ -0,0 +1,114 @@
+import hashlib
+import logging
+import numpy as np
+import os
+import pickle
+import time
+
+from . import const
+from .reductionUtils import reducedAgent
+
+_LOGGER = logging.getLogger(__name__)
+LOG_LEVEL = logging.DEBUG
+_LOGGER.setLevel(LOG_LEVEL)
+
+#constants that the result of each stage of optimize depends on (in addition to the input files and the previous stages)
+AGENT_CONSTANTS = ["SEED","E_QUOTA","NESTED_SAMPLING","TOT_AGENTS","O_QUOTA","TOT_CAP","TOT_RANGE","MIN_CHARGE","MIN_CHARGE_EOD","EFFCSPEED_SLOW"]
+CELL_CONSTANTS = ["WALKING_RADIUS","MIN_X","MIN_Y"]
+PATTERN_CONSTANTS = ["PREPROCESSING_BUDGET"]
+REDUCTION_CONSTANTS = ["REDUCE_INSTANCE","CAPACITY_BUCKET"]
+MODEL_CONSTANTS = ["AGGREGATE_AGENTS","AGGREGATION_TOLERANCE","COST_FAST","COST_SLOW","CONF_FAST","CONF_SLOW"]
+#model settings that only affect the solve and not the model
+SOLVE_SETTINGS = ["i_method","f_mipgap","i_timelimit","b_presolve","s_logFile","s_start","s_checkpoint","s_backend","i_polytopeThreads"]
+
+#return the sha256 hash of the content of a file
+def fileHash(filename,chunkSize=1<<20):
+    h = hashlib.sha256()
+    with open(filename,"rb") as file:
+        for chunk in iter(lambda:file.read(chunkSize),b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+#return the key of a stage from the key of the previous stage and further values (file hashes, constants, settings)
+def stageKey(*values):
+    return hashlib.sha256(repr(values).encode()).hexdigest()[:16]
+
+#return the current values of constants of const.py
+def constantValues(names):
+    return tuple((name,getattr(const,name)) for name in names)
+
+#return the key of every stage of optimize: agents, cells, patterns, reduction and model
+def stageKeys(position_file,driver_file,trip_file,settings):
+    keys = {}
+    keys["agents"] = stageKey(fileHash(driver_file),fileHash(trip_file),constantValues(AGENT_CONSTANTS))
+    keys["cells"] = stageKey(keys["agents"],fileHash(position_file),constantValues(CELL_CONSTANTS))
+    keys["patterns"] = stageKey(keys["cells"],constantValues(PATTERN_CONSTANTS))
+    keys["reduction"] = stageKey(keys["patterns"],constantValues(REDUCTION_CONSTANTS))
+    keys["model"] = stageKey(keys["reduction"],constantValues(MODEL_CONSTANTS),sorted((prop,value) for prop,value in settings.items() if prop not in SOLVE_SETTINGS))
+    return keys
+
+#cache of the results of the stages of optimize in a directory with one file (or directory) per stage and key
+#agents, cells and reductions are pickled, patterns are stored as packed arrays and models as checkpoints (see checkpointUtils.csCheckpoint)
+class csStageCache:
+    def __init__(self,directory):
+        self._directory = directory
+        os.makedirs(directory,exist_ok=True)
+
+    def path(self,stage,key,extension=""):
+        return os.path.join(self._directory,f"{stage}_{key}{extension}")
+
+    #return the cached result of a stage or compute and cache it
+    def cached(self,stage,key,compute):
+        filename = self.path(stage,key,".pickle")
+        if os.path.exists(filename):
+            t_start = time.time()
+            with open(filename,"rb") as file:
+                result = pickle.load(file)
+            _LOGGER.info(f"{stage} loaded from cache in {time.time()-t_start:.2f}s")
+            return result
+        result = compute()
+        with open(filename+".tmp","wb") as file:
+            pickle.dump(result,file,protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(filename+".tmp",filename)
+        return result
+
+    #set the valid patterns of the agents from the cache
+    #return whether the patterns of all agents were cached
+    def loadPatterns(self,key,ear):
+        filename = self.path("patterns",key,".npz")
+        if not os.path.exists(filename):
+            return False
+        with np.load(filename) as data:
+            agentKeys, counts, lengths, values = data["agents"].tolist(), data["counts"], data["lengths"], data["values"]
+        if set(agentKeys) != set(ear):
+            return False
+        ends = np.cumsum(counts*lengths)
+        for agentKey,count,length,end in zip(agentKeys,counts,lengths,ends):
+            ear[agentKey].valid_patterns = values[end-count*length:end].reshape(count,length)
+        _LOGGER.info("patterns loaded from cache")
+        return True
+
+    #store the valid patterns of the agents as one array of all pattern matrices together with the number and length of the patterns per agent
+    def savePatterns(self,key,ear):
+        agentKeys = list(ear)
+        counts = np.array([len(ear[agentKey].valid_patterns) for agentKey in agentKeys],dtype=np.int64)
+        lengths = np.array([ear[agentKey].num_stops for agentKey in agentKeys],dtype=np.int64)
+        values = np.concatenate([ear[agentKey].valid_patterns.ravel() for agentKey in agentKeys]) if agentKeys else np.zeros(0,dtype=np.uint8)
+        filename = self.path("patterns",key,".npz")
+        with open(filename+".tmp","wb") as file:
+            np.savez_compressed(file,agents=np.array(agentKeys,dtype=str),counts=counts,lengths=lengths,values=values)
+        os.replace(filename+".tmp",filename)
+
+#return the result of reductionUtils.reduceInstance in a form that can be cached: remaining agents with the indices of their remaining charging opportunities, cells, cells per breakpoint, breakpoints and configurations
+def reductionRecord(ear,rc,rcpb,rb,rcc):
+    return {key:[opp["index"] for opp in agent.charging_opps] for key,agent in ear.items()}, rc, rcpb, rb, rcc
+
+#apply a cached reduction to the agents, which are not changed
+#return reduced copies of the agents, cells, cells per breakpoint, breakpoints and configurations as reductionUtils.reduceInstance
+def applyReduction(ear,record):
+    opps, rc, rcpb, rb, rcc = record
+    reducedEar = {}
+    for key,indices in opps.items():
+        indices = set(indices)
+        reducedEar[key] = reducedAgent(ear[key],[opp for opp in ear[key].charging_opps if opp["index"] in indices])
+    return reducedEar, rc, rcpb, rb, rcc
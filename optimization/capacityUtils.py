@@ -0,0 +1,119 @@
+import heapq
+from itertools import combinations
+
+#index the charging opportunities of the given agents (default: all) by the candidate cells that are reachable from their location
+#return dict with list of charging opportunities per cell
+def arrivalsPerCell(ear,rcpb,agentKeys=None):
+    arrivals = {}
+    for key in (ear if agentKeys is None else agentKeys):
+        for opp in ear[key].charging_opps:
+            for cell in rcpb[opp["loc"]]:
+                if cell in arrivals:
+                    arrivals[cell].append(opp)
+                else:
+                    arrivals[cell] = [opp]
+    return arrivals
+
+#sweep over the sorted endpoints of the closed intervals (start,end,item)
+#return the maximal sets of simultaneously present items together with the last arrival time before the set shrinks
+def maximalOverlapSets(intervals):
+    #arrivals are processed before departures at the same time, as intervals are closed
+    events = sorted([(start,0,index) for index,(start,_,_) in enumerate(intervals)]+[(end,1,index) for index,(_,end,_) in enumerate(intervals)])
+    active = set()
+    maximalSets = []
+    grown = False
+    lastArrival = None
+    for time,departure,index in events:
+        if not departure:
+            active.add(index)
+            grown = True
+            lastArrival = time
+        else:
+            if grown:
+                maximalSets.append((lastArrival,[intervals[i][2] for i in sorted(active)]))
+                grown = False
+            active.discard(index)
+    return maximalSets
+
+#return the maximal sets of simultaneous charging processes (agent,index) at a cell
+def maximalChargingSets(arrivals):
+    return maximalOverlapSets([(opp["time"][0],opp["time"][1],(opp["agent"],opp["index"])) for opp in arrivals])
+
+#enumerate every set of at most maxCard pairwise overlapping closed intervals (start,end,item) exactly once
+#each set is generated from its member with the latest start (anchor), whose start is a common point of all members
+#yield the anchor's start together with the items of the set
+def boundedOverlapSubsets(intervals,maxCard):
+    order = sorted(range(len(intervals)),key=lambda i:(intervals[i][0],i))
+    active = set()
+    departures = []
+    for i in order:
+        start = intervals[i][0]
+        while departures and departures[0][0] < start:
+            active.discard(heapq.heappop(departures)[1])
+        #sets with a single member need no candidates, which avoids sorting the active intervals at every arrival
+        candidates = sorted(active) if maxCard > 1 else ()
+        for r in range(maxCard):
+            for combination in combinations(candidates,r):
+                yield start, [intervals[j][2] for j in sorted(combination+(i,))]
+        active.add(i)
+        heapq.heappush(departures,(intervals[i][1],i))
+
+#sweep over the sorted endpoints of the closed intervals (start,end,item)
+#yield the set of items present at every arrival time (after all arrivals at that time) with more than minCard items, which includes every maximal set
+def arrivalOverlapSets(intervals,minCard=0):
+    events = sorted([(start,0,index) for index,(start,_,_) in enumerate(intervals)]+[(end,1,index) for index,(_,end,_) in enumerate(intervals)])
+    active = set()
+    for n,(time,departure,index) in enumerate(events):
+        if departure:
+            active.discard(index)
+            continue
+        active.add(index)
+        if n+1 < len(events) and events[n+1][:2] == (time,0):
+            continue
+        if len(active) > minCard:
+            yield time, [intervals[i][2] for i in sorted(active)]
+
+#return all sets of at most maxCard pairwise overlapping intervals and all larger sets of intervals present at an arrival time, each exactly once
+#with strengthened coefficients min(config,|S|) the row of a non-maximal set can be tighter in the LP relaxation than the row of its maximal superset, so larger sets are not restricted to the maximal ones
+def strengthenedOverlapSets(intervals,maxCard):
+    yield from boundedOverlapSubsets(intervals,maxCard)
+    yield from arrivalOverlapSets(intervals,maxCard)
+
+#return the sets of simultaneous charging processes (agent,index) at a cell for the strengthened capacity description
+def strengthenedChargingSets(arrivals,maxCard):
+    return strengthenedOverlapSets([(opp["time"][0],opp["time"][1],(opp["agent"],opp["index"])) for opp in arrivals],maxCard)
+
+#assign the closed intervals (start,end,item) to all time buckets of the given width they overlap
+#return the sets of items per bucket with the bucket start, where sets contained in the set of a neighboring bucket are skipped
+def bucketedOverlapSets(intervals,width):
+    buckets = {}
+    for start,end,item in intervals:
+        for bucket in range(start//width,end//width+1):
+            if bucket in buckets:
+                buckets[bucket].append(item)
+            else:
+                buckets[bucket] = [item]
+    bucketSets = []
+    previous = set()
+    for bucket in sorted(buckets):
+        current = set(buckets[bucket])
+        if current <= previous:
+            continue
+        if bucketSets and previous < current:
+            bucketSets.pop()
+        bucketSets.append((bucket*width,buckets[bucket]))
+        previous = current
+    return bucketSets
+
+#return the sets of charging processes (agent,index) at a cell that overlap the same time bucket
+def bucketedChargingSets(arrivals,width):
+    return bucketedOverlapSets([(opp["time"][0],opp["time"][1],(opp["agent"],opp["index"])) for opp in arrivals],width)
+
+#return the sets of charging processes (agent,index) at a cell that are restricted by a capacity constraint of the chosen capacity description
+#bucket is the width of the time buckets (0 for exact sets), strengthened adds all sets of at most maxCard simultaneous processes
+def capacityChargingSets(arrivals,bucket,strengthened,maxCard):
+    if bucket:
+        return bucketedChargingSets(arrivals,bucket)
+    if strengthened:
+        return strengthenedChargingSets(arrivals,maxCard)
+    return maximalChargingSets(arrivals)
@@ -0,0 +1,115 @@
+from gurobipy import GRB, read
+import logging
+import numpy as np
+import os
+import time
+
+from .fileUtils import saveChargingStations
+
+_LOGGER = logging.getLogger(__name__)
+LOG_LEVEL = logging.DEBUG
+_LOGGER.setLevel(LOG_LEVEL)
+
+MODEL_FILE = "model.mps.gz"
+PARAM_FILE = "model.prm"
+PORT_FILE = "ports.npz"
+INCUMBENT_FILE = "incumbent.npz"
+RESULT_FILE = "result.csv"
+SPEEDS = ["f","s"]
+
+#replace a file by the file written by write(filename), so that an interrupted write never leaves a broken checkpoint
+def atomicWrite(filename,write):
+    directory, name = os.path.split(filename)
+    tmp = os.path.join(directory,"tmp_"+name)
+    write(tmp)
+    os.replace(tmp,filename)
+
+#checkpoint directory of a model: the model (mps), its parameters, the map from variables to charging ports and the last incumbent
+#the port map consists of the cells and one entry (cell index, speed index, variable index, coefficient) per variable that contributes to the ports of a cell and speed
+class csCheckpoint:
+    def __init__(self,directory):
+        self._directory = directory
+        os.makedirs(directory,exist_ok=True)
+        self._cells = self._ports = None
+        self._numSaved = 0
+
+    def path(self,name):
+        return os.path.join(self._directory,name)
+
+    def hasModel(self):
+        return all(os.path.exists(self.path(name)) for name in [MODEL_FILE,PARAM_FILE,PORT_FILE])
+
+    #save the model, its parameters and the port map (see csBaseModel.portMap)
+    def saveModel(self,model,cells,ports):
+        t_start = time.time()
+        model.update()
+        atomicWrite(self.path(MODEL_FILE),model.write)
+        atomicWrite(self.path(PARAM_FILE),model.write)
+        atomicWrite(self.path(PORT_FILE),lambda filename:np.savez(filename,cells=np.array(cells,dtype=np.int64).reshape(-1,2),ports=ports))
+        self._cells, self._ports = [tuple(cell) for cell in cells], ports
+        _LOGGER.info(f"checkpoint model saved to {self._directory} in {time.time()-t_start:.2f}s")
+
+    #load the model and, if params is set, its parameters
+    #return gurobi model
+    def loadModel(self,params=True):
+        model = read(self.path(MODEL_FILE))
+        if params:
+            model.read(self.path(PARAM_FILE))
+        with np.load(self.path(PORT_FILE)) as data:
+            self._cells, self._ports = [tuple(cell) for cell in data["cells"].tolist()], data["ports"]
+        return model
+
+    #return the number of ports per cell of every speed in the solution (values indexed by variable index)
+    def portValues(self,solution):
+        cellIndex, speedIndex, varIndex, coeffs = self._ports
+        values = np.bincount(cellIndex.astype(np.int64)*len(SPEEDS)+speedIndex.astype(np.int64),weights=np.asarray(solution)[varIndex.astype(np.int64)]*coeffs,minlength=len(self._cells)*len(SPEEDS)).reshape(-1,len(SPEEDS))
+        return [dict(zip(self._cells,values[:,s])) for s in range(len(SPEEDS))]
+
+    #save the non-zero values of the solution, its objective and runtime and its charging stations as result file
+    def saveIncumbent(self,solution,objective,runtime):
+        solution = np.asarray(solution)
+        nonzero = np.nonzero(solution)[0]
+        atomicWrite(self.path(INCUMBENT_FILE),lambda filename:np.savez_compressed(filename,numVars=len(solution),index=nonzero,value=solution[nonzero],objective=objective,runtime=runtime))
+        atomicWrite(self.path(RESULT_FILE),lambda filename:saveChargingStations(filename,*self.portValues(solution)))
+        self._numSaved += 1
+        _LOGGER.info(f"incumbent with objective {objective} saved after {runtime:.1f}s")
+
+    #return the last saved solution (values per variable) and its objective or (None,None) if no incumbent was saved
+    def loadIncumbent(self):
+        if not os.path.exists(self.path(INCUMBENT_FILE)):
+            return None, None
+        with np.load(self.path(INCUMBENT_FILE)) as data:
+            solution = np.zeros(int(data["numVars"]))
+            solution[data["index"]] = data["value"]
+            return solution, float(data["objective"])
+
+#save every new incumbent of a model with attributes _checkpoint (csCheckpoint) and _checkpointVars
+def checkpointCallback(model,where):
+    if where == GRB.Callback.MIPSOL:
+        model._checkpoint.saveIncumbent(
+            model.cbGetSolution(model._checkpointVars),
+            model.cbGet(GRB.Callback.MIPSOL_OBJ),
+            model.cbGet(GRB.Callback.RUNTIME)
+            )
+
+#continue an interrupted optimization from a checkpoint directory without recomputing the instance
+#the saved model is solved with the last incumbent as mip start and new incumbents are saved again, the final charging stations are saved to the result file if given
+#return gurobi model
+def resumeOptimization(directory,result_file=None):
+    checkpoint = csCheckpoint(directory)
+    if not checkpoint.hasModel():
+        raise ValueError(f"{directory} contains no checkpoint model")
+    model = checkpoint.loadModel()
+    model._checkpoint = checkpoint
+    model._checkpointVars = model.getVars()
+    solution, objective = checkpoint.loadIncumbent()
+    if solution is not None:
+        model.setAttr("Start",model._checkpointVars,solution.tolist())
+        _LOGGER.info(f"resuming from incumbent with objective {objective}")
+    model.optimize(checkpointCallback)
+    if model.SolCount:
+        solution = model.getAttr("X",model._checkpointVars)
+        checkpoint.saveIncumbent(solution,model.ObjVal,model.Runtime)
+        if result_file:
+            saveChargingStations(result_file,*checkpoint.portValues(solution))
+    return model
@@ -4,6 +4,7 @@ SEC_PER_DAY = 24*60*60  #number of seconds in 24 hours
 #instance setup
 SEED = 72359    #seed for random representative day generation                        
 E_QUOTA = 0.03  #proportion of drivers with ev
+NESTED_SAMPLING = False     #sample agents as prefixes of a random permutation, so that the sample of a larger E_QUOTA contains the sample of every smaller one with the same seed
 
 #ev settings
 CSPEED_SLOW = 11    #charging speed for slow charging stations
@@ -33,16 +34,32 @@ B_PROPORTION = False    #boolean whether a certain proportion of drivers needs t
 PROPORTION = 1.0        #proportion that needs to be satisfied
 
 #model improvements
+AGGREGATE_AGENTS = False    #boolean whether equivalent agents are aggregated into classes with multiplicities
+AGGREGATION_TOLERANCE = 900     #tolerance (in seconds) up to which break windows of aggregated agents may differ
 CAPACITY_CUTS = True    #boolean whether capacity cuts are to be added
+CAPACITY_BUCKET = 0     #width (in seconds) of the time buckets for approximate capacity constraints (0 for exact capacity constraints)
 FRACTIONAL_ASSIGNMENT = True    #boolean whether the assignment of drivers to charging stations can be fractional
+LAZY_CAPACITY = False   #boolean whether capacity constraints are only added (as lazy constraints) when an incumbent violates them
 OUTER_DESCRIPTION = True    #boolean whether the outer description of charging demand is to be used
+PORT_COUNT = False      #boolean whether charging stations are modelled by integer port counts per cell and speed instead of one binary per configuration
+REDUCE_INSTANCE = False #boolean whether agents, charging processes, cells and configurations that cannot be part of an optimal solution are removed before the model is created
 
 #technical model settings
+BACKEND = "gurobi"      #mip solver for models that are solved through a backend ("gurobi" or "highs", see optimization/backendUtils.py)
+CACHE_DIR = ""       #directory in which the results of the stages of optimize are cached (empty for no cache, see optimization/cacheUtils.py)
+CHECKPOINT_DIR = ""  #directory in which the model and every new incumbent are saved to resume interrupted runs (empty for no checkpoints, see optimization/checkpointUtils.py)
+COMPACT_MODEL = False   #boolean whether the matrix build keeps only numeric side tables instead of dicts of variables (requires MATRIX_BUILD)
+CONSTRAINT_NAMES = False    #boolean whether constraints are named (costs memory and time for large models)
 LOG_FILE = ""       #log file (empty for no log)
+MATRIX_BUILD = False    #boolean whether the model is assembled from sparse matrices through gurobi's matrix api
 METHOD = 1          #lp method (see gurobi docs for specification)
 MIPGAP = 0.01       #mipgap (see gurobi docs for specification)
+MIP_START = ""      #source of the mip start: "" (none), "lp" (rounded lp relaxation), "greedy" (greedy placement) or name of a result file of a previous run
 POLYTOPE_THREADS = 6    #number of threads for calculating outer description using cdd
+POLYTOPE_TIMEOUT = 5    #time (in seconds) after which the outer description of an agent is replaced by the inner description
+PREPROCESSING_BUDGET = 0   #time (in seconds) for pattern enumeration and outer descriptions, which are chosen per agent within it (see optimization/budgetUtils.py), 0 for exact patterns and outer descriptions of all agents
 PRESOLVE = True     #presolve (see gurobi docs for specification)
+SHARD_SIZE = 20000  #number of sampled agents per shard of the sharded model build (see optimization/shardUtils.py)
 TIMELIMIT = 0       #timelimit (see gurobi docs for specification, 0 for no time limit)
 
 #city settings
@@ -0,0 +1,172 @@
+import copy
+import logging
+
+from .reductionUtils import reduceInstance
+
+_LOGGER = logging.getLogger(__name__)
+LOG_LEVEL = logging.DEBUG
+_LOGGER.setLevel(LOG_LEVEL)
+
+#return the neighbours of every cell in the breakpoint-cell incidence graph, i.e. the cells that are reachable from a common breakpoint
+def cellNeighbours(rc,rcpb):
+    neighbours = {cell:set() for cell in rc}
+    for cells in rcpb.values():
+        cells = [cell for cell in cells if cell in neighbours]
+        for cell in cells:
+            neighbours[cell].update(cells)
+    for cell in neighbours:
+        neighbours[cell].discard(cell)
+    return neighbours
+
+#return the cells reached by breadth-first search from start in the incidence graph restricted to the given cells in the order of the search
+def breadthFirst(start,cells,neighbours):
+    order = [start]
+    visited = {start}
+    for cell in order:
+        for neighbour in sorted(neighbours[cell]):
+            if neighbour in cells and neighbour not in visited:
+                visited.add(neighbour)
+                order.append(neighbour)
+    return order
+
+#order the cells by breadth-first search in the incidence graph restricted to the cells
+#every connected component is searched from the cell that is reached last from its first cell, so that prefixes of the order are compact regions of the graph
+def breadthFirstOrder(cells,neighbours):
+    remaining = set(cells)
+    order = []
+    for cell in sorted(cells):
+        if cell not in remaining:
+            continue
+        component = breadthFirst(cell,remaining,neighbours)
+        order.extend(breadthFirst(component[-1],set(component),neighbours))
+        remaining.difference_update(component)
+    return order
+
+#partition the cells into districts by recursive bisection of the breakpoint-cell incidence graph (see cellNeighbours)
+#every part is ordered by breadth-first search and split where the cumulative weight reaches the share of the first half, so that few breakpoints reach several districts
+#cells are weighted by their number of reachable breakpoints (their degree in the incidence graph), so that districts have a similar number of charging processes
+#return district per cell
+def partitionCells(rc,rcpb,numDistricts):
+    neighbours = cellNeighbours(rc,rcpb)
+    cellDistrict = {}
+    parts = [(sorted(rc),numDistricts,0)]
+    while parts:
+        cells, k, first = parts.pop()
+        if k<=1 or len(cells)<=1:
+            cellDistrict.update({cell:first for cell in cells})
+            continue
+        cells = breadthFirstOrder(cells,neighbours)
+        weights = [max(len(rc[cell]),1) for cell in cells]
+        target = sum(weights)*(k//2)/k
+        split, cumulative = 0, 0
+        while split < len(cells)-1 and cumulative+weights[split] <= target:
+            cumulative += weights[split]
+            split += 1
+        split = max(split,1)
+        parts.append((cells[:split],k//2,first))
+        parts.append((cells[split:],k-k//2,first+k//2))
+    return cellDistrict
+
+#assign every agent to the district in which it reaches most cells from its charging opportunities (its home district)
+#return district per agent
+def assignAgents(ear,rcpb,cellDistrict):
+    agentDistrict = {}
+    for key,agent in ear.items():
+        counts = {}
+        for opp in agent.charging_opps:
+            for cell in rcpb.get(opp["loc"],[]):
+                counts[cellDistrict[cell]] = counts.get(cellDistrict[cell],0)+1
+        agentDistrict[key] = max(counts,key=counts.get) if counts else 0
+    return agentDistrict
+
+#return the cells and agents of a district, which overlap with the neighbouring districts
+#the district contains its own cells, every cell that its agents reach from their charging opportunities (border cells of other districts) and every agent of another district that reaches one of its own cells (border agents)
+#return set of cells and list of agent keys
+def districtMembers(ear,rcpb,cellDistrict,agentDistrict,district):
+    cells = {cell for cell,d in cellDistrict.items() if d==district}
+    agentKeys = []
+    for key,agent in ear.items():
+        reached = {cell for opp in agent.charging_opps for cell in rcpb.get(opp["loc"],[])}
+        if agentDistrict[key]==district:
+            cells.update(reached)
+            agentKeys.append(key)
+        elif any(cellDistrict[cell]==district for cell in reached):
+            agentKeys.append(key)
+    return cells, agentKeys
+
+#return the cells that belong to several districts, given the cells per district (see districtMembers)
+def sharedCells(districtCells):
+    counts = {}
+    for cells in districtCells:
+        for cell in cells:
+            counts[cell] = counts.get(cell,0)+1
+    return {cell for cell,count in counts.items() if count>1}
+
+#return the number of breakpoints whose cells lie in several districts and the number of agents that belong to several districts, given the agents per district (see districtMembers)
+def borderStatistics(rcpb,cellDistrict,districtAgents):
+    borderBreakpoints = len([bp for bp,cells in rcpb.items() if len({cellDistrict[cell] for cell in cells})>1])
+    counts = {}
+    for agentKeys in districtAgents:
+        for key in agentKeys:
+            counts[key] = counts.get(key,0)+1
+    return borderBreakpoints, len([count for count in counts.values() if count>1])
+
+#create the instance of a district (see districtMembers): its agents may only charge at its cells, charging opportunities elsewhere are dropped, which only concerns border agents
+#the agents are copied and their patterns are recalculated for the breakpoints of the district, the instance is reduced if reduce is set (see reductionUtils.reduceInstance)
+#return agents, cells, cells per breakpoint, relevant breakpoints, configurations per cell (None if not reduced) and number of agents of the district (not border agents) that cannot be satisfied within it
+def districtInstance(ear,rc,rcpb,rb,cellDistrict,agentDistrict,district,reduce=True,bucket=0):
+    cells, agentKeys = districtMembers(ear,rcpb,cellDistrict,agentDistrict,district)
+    dRc = {cell:bps for cell,bps in rc.items() if cell in cells}
+    dRcpb = {bp:[cell for cell in bpCells if cell in dRc] for bp,bpCells in rcpb.items()}
+    dRb = {bp:speed for bp,speed in rb.items() if dRcpb.get(bp)}
+    dEar = {key:copy.deepcopy(ear[key]) for key in agentKeys}
+    for agent in dEar.values():
+        agent.calculatePatterns(dRb)
+    dRcc = None
+    if reduce:
+        dEar, dRc, dRcpb, dRb, dRcc, _ = reduceInstance(dEar,dRc,dRcpb,dRb,bucket=bucket)
+    numLost = len([key for key in agentKeys if agentDistrict[key]==district and key not in dEar])
+    return dEar, dRc, dRcpb, dRb, dRcc, numLost
+
+#return the charging stations (ports per (cell,speed)) of the shared cells as settled by the districts that own them, given the fast and slow ports per cell of every district
+def settleSharedCells(shared,cellDistrict,layouts):
+    stations = {}
+    for cell in shared:
+        fast, slow = layouts[cellDistrict[cell]]
+        stations[cell,"f"] = fast.get(cell,0)
+        stations[cell,"s"] = slow.get(cell,0)
+    return stations
+
+#split a total (budget or port limit) among the districts proportionally to their numbers of agents
+def splitProportionally(total,agentDistrict,numDistricts):
+    counts = [0]*numDistricts
+    for district in agentDistrict.values():
+        counts[district] += 1
+    shares = [total*count//max(sum(counts),1) for count in counts]
+    #distribute the remainder of rounding down
+    for district in sorted(range(numDistricts),key=lambda d:-counts[d])[:total-sum(shares)]:
+        shares[district] += 1
+    return shares
+
+#move budget from the districts that lose least to the districts that gain most when their budget changes by step
+#objectives maps (district,budget) to the objective of the district, districts are paired while the gain exceeds the loss and every district takes part in at most one transfer
+#return new budgets and number of transfers
+def rebalanceBudgets(budgets,objectives,step):
+    gains = {d:objectives[d,budget+step]-objectives[d,budget] for d,budget in enumerate(budgets)}
+    losses = {d:objectives[d,budget]-objectives[d,budget-step] if budget>=step else float("inf") for d,budget in enumerate(budgets)}
+    budgets = list(budgets)
+    receivers = sorted(gains,key=gains.get,reverse=True)
+    donors = sorted(losses,key=losses.get)
+    used = set()
+    transfers = 0
+    for receiver in receivers:
+        if receiver in used:
+            continue
+        donor = next((d for d in donors if d not in used and d!=receiver),None)
+        if donor is None or gains[receiver] <= losses[donor]:
+            break
+        budgets[receiver] += step
+        budgets[donor] -= step
+        used.update([receiver,donor])
+        transfers += 1
+    return budgets, transfers
@@ -1,8 +1,83 @@
+import csv
 import os, errno
 
+from .const import (
+    MIN_X,
+    MIN_Y
+)
+
 def silentremove(filename):
     try:
         os.remove(filename)
     except OSError as e:
         if e.errno != errno.ENOENT:
-            raise
\ No newline at end of file
+            raise
+
+#return the charging stations given by the number of fast and slow charging ports per cell as dict with the numbers of ports per cell {cell:{"fast":fast,"slow":slow}}, which the simulation accepts instead of the csv-file
+#port numbers are rounded and cells without ports are omitted as in saveChargingStations
+def chargingStations(fastChargingPorts,slowChargingPorts):
+    stations = {}
+    for column,ports in [("fast",fastChargingPorts),("slow",slowChargingPorts)]:
+        for loc,amount in ports.items():
+            if round(amount) > 0:
+                stations.setdefault(loc,{"fast":0,"slow":0})[column] = round(amount)
+    return stations
+
+#write the charging stations given by the number of fast and slow charging ports per cell to a csv-file
+#port numbers are rounded, as solvers may return almost integral values
+def saveChargingStations(filename,fastChargingPorts,slowChargingPorts):
+    file = open(filename,"w")
+    dw = csv.DictWriter(file, ["cx", "cy", "fast", "slow", "wkt"])
+    dw.writeheader()
+    for loc,amount in fastChargingPorts.items():
+        if round(amount) > 0:
+            dw.writerow({
+                "cx":loc[0],
+                "cy":loc[1],
+                "fast":round(amount),
+                "slow":0,
+                "wkt":f"POINT ({MIN_X + (loc[0]+0.5)*100} {MIN_Y + (loc[1]+0.5)*100})"
+                })
+    for loc,amount in slowChargingPorts.items():
+        if round(amount) > 0:
+            dw.writerow({
+                "cx":loc[0],
+                "cy":loc[1],
+                "fast":0,
+                "slow":round(amount),
+                "wkt":f"POINT ({MIN_X + (loc[0]+0.5)*100} {MIN_Y + (loc[1]+0.5)*100})"
+                })
+
+    file.close()
+
+#read the charging stations of a csv-file written by saveChargingStations
+#return number of ports per (cell,speed)
+def readChargingStations(filename):
+    stations = {}
+    with open(filename) as file:
+        for row in csv.DictReader(file):
+            cell = (int(row["cx"]),int(row["cy"]))
+            for speed,column in [("f","fast"),("s","slow")]:
+                if int(row[column]) > 0:
+                    stations[cell,speed] = stations.get((cell,speed),0)+int(row[column])
+    return stations
+
+#return the name of the file with the charging processes of the individual agents that belongs to a result file
+def assignmentFile(filename):
+    return os.path.splitext(filename)[0]+"_agents.csv"
+
+#write the charging processes (agent,index,cx,cy,speed) of individual agents with their values (see modelUtils.csBaseModel.disaggregateSolution) to a csv-file
+#satisfied is the set of satisfied agents
+def saveAssignment(filename,satisfied,processes):
+    with open(filename,"w",newline="") as file:
+        dw = csv.DictWriter(file, ["agent", "index", "cx", "cy", "speed", "value", "satisfied"])
+        dw.writeheader()
+        for (agent,index,cx,cy,speed),value in processes.items():
+            dw.writerow({"agent":agent,"index":index,"cx":cx,"cy":cy,"speed":speed,"value":value,"satisfied":agent in satisfied})
+
+#write one row per point of a parameter sweep (dicts with equal keys) to a csv-file
+def saveFrontier(filename,points):
+    with open(filename,"w",newline="") as file:
+        dw = csv.DictWriter(file, list(points[0].keys()) if points else [])
+        dw.writeheader()
+        dw.writerows(points)
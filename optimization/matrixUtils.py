@@ -0,0 +1,498 @@
+import logging
+import numpy as np
+import os
+import scipy.sparse as sp
+from multiprocessing import freeze_support, Pool, TimeoutError
+
+from .const import (
+    COST_FAST,
+    COST_SLOW,
+    CONF_FAST,
+    CONF_SLOW
+)
+from .budgetUtils import planRequirements
+from .capacityUtils import bucketedOverlapSets, maximalOverlapSets, strengthenedOverlapSets
+from .polytopeUtils import calculatePatternInequalities
+from .settingsUtils import modelSettings
+
+_LOGGER = logging.getLogger(__name__)
+LOG_LEVEL = logging.DEBUG
+_LOGGER.setLevel(LOG_LEVEL)
+
+SPEED_CODES = {"f":0, "s":1}
+
+#calculate the outer descriptions of the charging demand of all agents in worker processes, the outer descriptions of agents that are cheap to describe are calculated directly
+#agents and timeouts are chosen within the preprocessing budget if it is given (see budgetUtils.planRequirements), agents without outer description get the inner description
+#return dict with (equation indices, inequalities) per agent or None if the calculation timed out or was not planned
+def calculateFacets(ear,processes,timeout,budget=0):
+    if os.name == 'nt':
+        freeze_support()
+    plan = planRequirements(ear,budget,timeout,processes)
+    facets = {key:None for key,(mode,_,_) in plan.items() if mode!="outer"}
+    pool = Pool(processes)
+    results = {key:(pool.apply_async(calculatePatternInequalities,(ear[key].valid_patterns,)),agentTimeout) for key,(mode,agentTimeout,_) in plan.items() if mode=="outer" and agentTimeout is not None}
+    for key,(mode,agentTimeout,_) in plan.items():
+        if mode=="outer" and agentTimeout is None:
+            facets[key] = calculatePatternInequalities(ear[key].valid_patterns)
+    for key,(res,agentTimeout) in results.items():
+        try:
+            facets[key] = res.get(agentTimeout)
+        except TimeoutError:
+            facets[key] = None
+    pool.terminate()
+    pool.join()
+    _LOGGER.info(f"outer description calculated for {len([f for f in facets.values() if f is not None])} of {len(facets)} agents")
+    return facets
+
+#return the concatenation of the index ranges [start,start+count)
+def rangesToIndices(starts,counts):
+    starts = np.asarray(starts,dtype=np.int64)
+    counts = np.asarray(counts,dtype=np.int64)
+    offsets = np.repeat(np.cumsum(counts)-counts,counts)
+    return np.arange(counts.sum(),dtype=np.int64)-offsets+np.repeat(starts,counts)
+
+#collects the rows of one constraint family in coordinate format
+class rowBlock:
+    def __init__(self,name):
+        self.name = name
+        self._rows = []
+        self._cols = []
+        self._vals = []
+        self._sense = []
+        self._rhs = []
+        self._numRows = 0
+
+    #add a single row with the given columns and coefficients
+    def addRow(self,cols,vals,sense,rhs):
+        self.addRows(np.zeros(len(cols),dtype=np.int64),cols,vals,[sense],[rhs])
+
+    #add several rows, where rows is relative to the rows added in this call
+    def addRows(self,rows,cols,vals,sense,rhs):
+        self._rows.append(np.asarray(rows,dtype=np.int64)+self._numRows)
+        self._cols.append(np.asarray(cols,dtype=np.int64))
+        self._vals.append(np.asarray(vals,dtype=float))
+        self._sense += list(sense)
+        self._rhs.append(np.asarray(rhs,dtype=float))
+        self._numRows += len(sense)
+
+    def __len__(self):
+        return self._numRows
+
+    #return the rows, columns, coefficients, senses and right hand sides of all entries
+    def entries(self):
+        if not self._numRows:
+            return np.zeros(0,dtype=np.int64), np.zeros(0,dtype=np.int64), np.zeros(0), [], np.zeros(0)
+        return np.concatenate(self._rows), np.concatenate(self._cols), np.concatenate(self._vals), list(self._sense), np.concatenate(self._rhs)
+
+    #return the block as (name, sparse matrix, senses, right hand sides)
+    def toMatrix(self,numVars):
+        if not self._numRows:
+            return self.name, sp.csr_matrix((0,numVars)), np.array([],dtype="<U1"), np.array([])
+        A = sp.csr_matrix((np.concatenate(self._vals),(np.concatenate(self._rows),np.concatenate(self._cols))),shape=(self._numRows,numVars))
+        return self.name, A, np.array(self._sense,dtype="<U1"), np.concatenate(self._rhs)
+
+#assembles the charging station model as sparse constraint matrices
+#the column layout is x (charging stations), y (charging processes), z (satisfied agents), w (patterns), s (satisfied agents of the worst group, only if robust)
+#requirementRows is a dict that keeps the requirement rows per agent for further builders with the same agents (see requirementBlock)
+class csMatrixBuilder:
+    def __init__(self,ear,rc,rcpb,rb,rcc=None,acm=None,facets=None,groups=[None],robust=False,requirementRows=None,**kwargs):
+        for prop, value in modelSettings(**kwargs).items():
+            setattr(self, "_"+prop, value)
+
+        #constants
+        self._csSpeeds = ["f","s"]
+        self._csConfigs = {"f":CONF_FAST, "s":CONF_SLOW}
+        self._csCosts = {"f":COST_FAST, "s":COST_SLOW}
+        self._fractionalString = "C" if self._b_fractionalAssignment else "B"
+        self._bZ = self._b_limit or self._b_budget or self._b_proportion
+        self._bS = robust and (self._b_limit or self._b_budget)
+
+        #model input
+        self._ear = ear
+        self._agentKeys = list(ear.keys())
+        self._rc = rc
+        self._rcpb = rcpb
+        self._rb = rb
+        self._groups = groups
+        self._requirementRows = requirementRows
+
+        #charging station configurations per cell and speed (default: all configurations)
+        self._rcc = {cell:dict(self._csConfigs) for cell in rc}
+        if rcc:
+            self._rcc.update({cell:configs for cell,configs in rcc.items() if cell in rc})
+
+        #multiplicities of agent classes (default: every agent is its own class)
+        self._aggregated = bool(acm)
+        self._mult = np.array([acm.get(key,1) if acm else 1 for key in self._agentKeys],dtype=float)
+        self._assignmentString = "I" if self._aggregated and not self._b_fractionalAssignment else self._fractionalString
+
+        #outer description
+        if self._b_outer and facets is None:
+            facets = calculateFacets(self._ear,self._i_polytopeThreads,self._i_polytopeTimeout,self._f_preprocessingBudget)
+        self._facets = facets if self._b_outer else {}
+
+        self.createLayout()
+
+    def createLayout(self):
+        #charging stations (contiguous per cell and speed)
+        self._cells = list(self._rc)
+        self._cellIndex = {cell:index for index,cell in enumerate(self._cells)}
+        self._xKeys = [(cell[0],cell[1],config,speed) for cell in self._cells for speed in self._csSpeeds for config in self._rcc[cell][speed]]
+        self._xConfig = np.array([key[2] for key in self._xKeys],dtype=float)
+        self._xCost = np.array([key[2]*self._csCosts[key[3]] for key in self._xKeys],dtype=float)
+        self._xSpeed = np.array([SPEED_CODES[key[3]] for key in self._xKeys],dtype=np.int8)
+        self._xCell = np.array([self._cellIndex[key[:2]] for key in self._xKeys],dtype=np.int64)
+        self._xStarts = {}
+        for col,key in enumerate(self._xKeys):
+            self._xStarts.setdefault((self._cellIndex[key[:2]],key[3]),col)
+
+        #charging processes (contiguous per agent, stop and cell with speeds f,s)
+        #only numeric side tables are kept, keys are created on demand (see yKey)
+        numY = 0
+        yAgent, yOpp, yCell, ySpeed, yTime = [], [], [], [], []
+        self._oppStarts, self._oppCounts, self._oppInRb = [], [], []
+        self._agentSlices = []
+        for a,(key,agent) in enumerate(self._ear.items()):
+            agentStart = numY
+            for opp in agent.charging_opps:
+                self._oppStarts.append(numY)
+                for location in self._rcpb[opp["loc"]]:
+                    for speed in self._csSpeeds:
+                        yAgent.append(a)
+                        yOpp.append(opp["index"])
+                        yCell.append(self._cellIndex[location])
+                        ySpeed.append(SPEED_CODES[speed])
+                        yTime.append(opp["time"])
+                        numY += 1
+                self._oppCounts.append(numY-self._oppStarts[-1])
+                self._oppInRb.append(opp["loc"] in self._rb)
+            self._agentSlices.append((agentStart,numY))
+        self._yAgent = np.array(yAgent,dtype=np.int64)
+        self._yOpp = np.array(yOpp,dtype=np.int64)
+        self._yCell = np.array(yCell,dtype=np.int64)
+        self._ySpeed = np.array(ySpeed,dtype=np.int8)
+        self._yTime = np.array(yTime,dtype=np.int64).reshape(-1,2)
+        self._oppStarts = np.array(self._oppStarts,dtype=np.int64)
+        self._oppCounts = np.array(self._oppCounts,dtype=np.int64)
+        self._oppInRb = np.array(self._oppInRb,dtype=bool)
+        self._agentSlices = np.array(self._agentSlices,dtype=np.int64).reshape(-1,2)
+
+        #patterns for agents with inner description
+        self._wSlices = {}
+        numW = 0
+        for key,agent in self._ear.items():
+            if len(agent.valid_patterns) and (not self._b_outer or self._facets.get(key) is None):
+                self._wSlices[key] = (numW,numW+len(agent.valid_patterns))
+                numW += len(agent.valid_patterns)
+
+        #offsets
+        self._numX = len(self._xKeys)
+        self._numY = numY
+        self._numZ = len(self._agentKeys) if self._bZ else 0
+        self._xOffset = 0
+        self._yOffset = self._numX
+        self._zOffset = self._yOffset+self._numY
+        self._wOffset = self._zOffset+self._numZ
+        self._sOffset = self._wOffset+numW
+        self._numVars = self._sOffset+(1 if self._bS else 0)
+
+        self._vtypes = np.full(self._numVars,self._assignmentString,dtype="<U1")
+        self._vtypes[:self._numX] = "B"
+        self._vtypes[self._zOffset:self._wOffset] = "I" if self._aggregated else "B"
+        self._vtypes[self._sOffset:] = "I"
+        self._ub = np.full(self._numVars,np.inf)
+        self._ub[:self._numX] = 1
+        if self._bZ:
+            self._ub[self._zOffset:self._wOffset] = self._mult
+        if self._aggregated:
+            self._ub[self._yOffset:self._zOffset] = self._mult[self._yAgent]
+            agentIndex = {key:a for a,key in enumerate(self._agentKeys)}
+            for key,(start,end) in self._wSlices.items():
+                self._ub[self._wOffset+start:self._wOffset+end] = self._mult[agentIndex[key]]
+        _LOGGER.info(f"layout with {self._numX} x, {self._numY} y, {self._numZ} z and {numW} w variables created")
+
+    def numVars(self):
+        return self._numVars
+
+    #return the number of ports of a speed per cell for the given solution vector
+    def portValues(self,solution,speed):
+        xVals = solution[self._xOffset:self._yOffset]*self._xConfig*(self._xSpeed==SPEED_CODES[speed])
+        return dict(zip(self._cells,np.bincount(self._xCell,weights=xVals,minlength=len(self._cells))))
+
+    #return the values of all charging processes (agent,index,cx,cy,speed) of the given solution vector that exceed the tolerance
+    def processValues(self,solution,tolerance=0):
+        yVals = solution[self._yOffset:self._zOffset]
+        return {self.yKey(col):yVals[col] for col in np.nonzero(yVals>tolerance)[0]}
+
+    #return the number of satisfied agents per agent (class) of the given solution vector, which is its multiplicity without z variables
+    def satisfiedValues(self,solution):
+        zVals = solution[self._zOffset:self._wOffset] if self._bZ else self._mult
+        return dict(zip(self._agentKeys,zVals.tolist()))
+
+    #return the values of the pattern variables of an agent (class) in the order of its valid patterns (empty without pattern variables)
+    def patternValues(self,solution,key):
+        if key not in self._wSlices:
+            return []
+        start, end = self._wSlices[key]
+        return solution[self._wOffset+start:self._wOffset+end].tolist()
+
+    #return the start vector of the given charging stations (configuration per (cell,speed)) and, if given, charging processes (agent,index,cx,cy,speed) and satisfied agents
+    #entries without start value are set to undefined
+    def startValues(self,stations,processes=None,satisfied=None,undefined=np.nan):
+        start = np.full(self._numVars,undefined)
+        start[self._xOffset:self._yOffset] = [float(stations.get((key[:2],key[3]))==key[2]) for key in self._xKeys]
+        if processes is not None:
+            start[self._yOffset:self._zOffset] = 0
+            agentIndex = {key:a for a,key in enumerate(self._agentKeys)}
+            for (key,index,cx,cy,speed),value in processes.items():
+                if key not in agentIndex or (cx,cy) not in self._cellIndex:
+                    continue
+                agentStart,agentEnd = self._agentSlices[agentIndex[key]]
+                cols = np.nonzero((self._yOpp[agentStart:agentEnd]==index)&(self._yCell[agentStart:agentEnd]==self._cellIndex[cx,cy])&(self._ySpeed[agentStart:agentEnd]==SPEED_CODES[speed]))[0]
+                start[self._yOffset+agentStart+cols] = value
+        if satisfied is not None and self._bZ:
+            start[self._zOffset:self._wOffset] = [satisfied.get(key,0) for key in self._agentKeys]
+        return start
+
+    #drop the data that is only needed to create variables and constraints
+    def releaseBuildData(self):
+        self._facets = None
+        self._ub = None
+        self._vtypes = None
+
+    #return the key (agent,index,cx,cy,speed) of the charging process in column col of the y block
+    def yKey(self,col):
+        cell = self._cells[self._yCell[col]]
+        return (self._agentKeys[self._yAgent[col]],int(self._yOpp[col]),cell[0],cell[1],self._csSpeeds[self._ySpeed[col]])
+
+    #return the keys of all charging processes in column order
+    def yKeys(self):
+        return [self.yKey(col) for col in range(self._numY)]
+
+    #return the x columns of a cell and speed
+    def xColumns(self,cellIndex,speed):
+        start = self._xStarts[cellIndex,speed]
+        return np.arange(start,start+len(self._rcc[self._cells[cellIndex]][speed]))+self._xOffset
+
+    #add the term coeff*z of agent a to the row or move it to the right hand side if z is constant (the multiplicity of a)
+    def zTerm(self,a,coeff):
+        if self._bZ:
+            return [self._zOffset+a], [coeff], 0
+        return [], [], -coeff*self._mult[a]
+
+    def standardBlocks(self):
+        blocks = [self.requirementBlock(),self.maxCSBlock(),self.cpPerStopBlock()]
+        #with lazy capacity constraints the capacity rows are separated during the optimization (see csBaseModel.addLazyCapacityConstraints)
+        if not self._b_lazyCapacity:
+            if self._i_capBucket:
+                blocks.append(self.bucketedCapacityBlock())
+            elif not self._b_cap:
+                blocks.append(self.capacityBlock())
+            else:
+                blocks.append(self.strengthenedCapacityBlock())
+        if self._b_budget:
+            blocks.append(self.budgetBlock())
+        elif self._b_limit:
+            blocks.append(self.limitBlock())
+        if self._b_proportion:
+            blocks.append(self.proportionBlock())
+        if self._bS:
+            blocks.append(self.satisfactionBlock())
+        return [block.toMatrix(self._numVars) for block in blocks]
+
+    #return objective vector and whether it is to be maximized
+    def objective(self):
+        c = np.zeros(self._numVars)
+        if not (self._b_limit or self._b_budget):
+            c[self._xOffset:self._xOffset+self._numX] = self._xCost
+            return c, False
+        if self._bS:
+            c[self._sOffset] = 1
+        else:
+            c[self._zOffset:self._wOffset] = 1
+        return c, True
+
+    #the rows of an agent are taken from requirementRows if its charging processes and description did not change since they were kept there
+    def requirementBlock(self):
+        block = rowBlock("requirement")
+        for a,(key,agent) in enumerate(self._ear.items()):
+            if self._requirementRows is None:
+                self.addRequirementRows(block,a,key,agent)
+                continue
+            start,end = self._agentSlices[a]
+            signature = (self._yOpp[start:end].tobytes(),self._ySpeed[start:end].tobytes(),len(agent.valid_patterns),key in self._wSlices,self._bZ,self._mult[a])
+            if key not in self._requirementRows or self._requirementRows[key][0] != signature:
+                agentBlock = rowBlock("requirement")
+                self.addRequirementRows(agentBlock,a,key,agent)
+                rows, cols, vals, sense, rhs = agentBlock.entries()
+                self._requirementRows[key] = (signature,rows,self.localColumns(a,cols),vals,sense,rhs)
+            _, rows, localCols, vals, sense, rhs = self._requirementRows[key]
+            block.addRows(rows,self.globalColumns(a,localCols),vals,sense,rhs)
+        return block
+
+    def addRequirementRows(self,block,a,key,agent):
+        if not len(agent.valid_patterns):
+            self.addRequirementFallbackRows(block,a)
+        elif key in self._wSlices:
+            self.addRequirementInnerRows(block,a,agent)
+        else:
+            self.addRequirementOuterRows(block,a,self._facets[key])
+
+    #return the first y, the z and the first w column of agent a
+    def agentColumns(self,a):
+        wStart = self._wSlices.get(self._agentKeys[a],(0,0))[0]
+        return self._yOffset+self._agentSlices[a][0], self._zOffset+a, self._wOffset+wStart
+
+    #return the columns of agent a in its local layout: its y columns, its z column and its w columns
+    def localColumns(self,a,cols):
+        yStart, zCol, wStart = self.agentColumns(a)
+        numY = self._agentSlices[a][1]-self._agentSlices[a][0]
+        isY = (cols>=yStart)&(cols<yStart+numY)
+        isZ = (cols==zCol) if self._bZ else np.zeros(len(cols),dtype=bool)
+        return np.where(isY,cols-yStart,np.where(isZ,numY,cols-wStart+numY+1))
+
+    #return the columns of the local layout of agent a (see localColumns) in the layout of the builder
+    def globalColumns(self,a,localCols):
+        yStart, zCol, wStart = self.agentColumns(a)
+        numY = self._agentSlices[a][1]-self._agentSlices[a][0]
+        return np.where(localCols<numY,localCols+yStart,np.where(localCols==numY,zCol,localCols-numY-1+wStart))
+
+    #agents without valid pattern need to charge at least four times, twice fast
+    def addRequirementFallbackRows(self,block,a):
+        start,end = self._agentSlices[a]
+        cols = np.arange(start,end)
+        for fastOnly,amount in [(False,4),(True,2)]:
+            rowCols = cols[self._ySpeed[start:end]==SPEED_CODES["f"]] if fastOnly else cols
+            zCols,zVals,rhs = self.zTerm(a,-amount)
+            block.addRow(np.concatenate([rowCols+self._yOffset,zCols]).astype(np.int64),np.concatenate([np.ones(len(rowCols)),zVals]),">",rhs)
+
+    def addRequirementOuterRows(self,block,a,facet):
+        eq_indices, ineqs = facet
+        start,end = self._agentSlices[a]
+        ineqs = np.array(ineqs,dtype=float)
+        ineqIndices = 1+2*self._yOpp[start:end]+(self._ySpeed[start:end]==SPEED_CODES["f"])
+        coeffs = ineqs[:,ineqIndices]
+        rows,cols = np.nonzero(coeffs)
+        vals = coeffs[rows,cols]
+        cols = cols+start+self._yOffset
+        if self._bZ:
+            rows = np.concatenate([rows,np.arange(len(ineqs))])
+            cols = np.concatenate([cols,np.full(len(ineqs),self._zOffset+a)])
+            vals = np.concatenate([vals,ineqs[:,0]])
+            rhs = np.zeros(len(ineqs))
+        else:
+            rhs = -ineqs[:,0]*self._mult[a]
+        eq_indices = set(eq_indices)
+        block.addRows(rows,cols,vals,["=" if index in eq_indices else ">" for index in range(len(ineqs))],rhs)
+
+    def addRequirementInnerRows(self,block,a,agent):
+        key = self._agentKeys[a]
+        wStart,wEnd = self._wSlices[key]
+        wCols = np.arange(wStart,wEnd)+self._wOffset
+        patterns = agent.valid_patterns
+        zCols,zVals,rhs = self.zTerm(a,-1)
+        block.addRow(np.concatenate([wCols,zCols]).astype(np.int64),np.concatenate([np.ones(len(wCols)),zVals]),"=",rhs)
+
+        start,end = self._agentSlices[a]
+        yCols = np.arange(start,end)+self._yOffset
+        for index in [opp["index"] for opp in agent.charging_opps]:
+            atStop = self._yOpp[start:end]==index
+            for mode in [1,2]:
+                if mode==1:
+                    rowYCols = yCols[atStop]
+                    rowWCols = wCols[patterns[:,index]>0]
+                if mode==2:
+                    rowYCols = yCols[atStop & (self._ySpeed[start:end]==SPEED_CODES["f"])]
+                    rowWCols = wCols[patterns[:,index]==2]
+                block.addRow(np.concatenate([rowYCols,rowWCols]),np.concatenate([np.ones(len(rowYCols)),-np.ones(len(rowWCols))]),">",0)
+
+    def maxCSBlock(self):
+        block = rowBlock("csMax")
+        numCells = len(self._cells)
+        block.addRows(self._xCell,np.arange(self._numX)+self._xOffset,np.ones(self._numX),["<"]*numCells,np.ones(numCells))
+        return block
+
+    def cpPerStopBlock(self):
+        block = rowBlock("cpPerStop")
+        starts = self._oppStarts[self._oppInRb]
+        counts = self._oppCounts[self._oppInRb]
+        block.addRows(np.repeat(np.arange(len(counts)),counts),rangesToIndices(starts,counts)+self._yOffset,np.ones(counts.sum()),["<"]*len(counts),self._mult[self._yAgent[starts]])
+        return block
+
+    #return per cell the columns of the fast charging processes of a group of agents (default: all) with their time windows
+    def arrivalsPerCell(self,agentKeys=None):
+        fast = self._ySpeed==SPEED_CODES["f"]
+        if agentKeys is not None:
+            agentIndex = {key:a for a,key in enumerate(self._agentKeys)}
+            fast &= np.isin(self._yAgent,[agentIndex[key] for key in agentKeys])
+        fastCols = np.nonzero(fast)[0]
+        order = fastCols[np.argsort(self._yCell[fastCols],kind="stable")]
+        times = self._yTime[order]
+        bounds = np.searchsorted(self._yCell[order],np.arange(len(self._cells)+1))
+        return {cellIndex:(order[bounds[cellIndex]:bounds[cellIndex+1]],times[bounds[cellIndex]:bounds[cellIndex+1]]) for cellIndex in range(len(self._cells)) if bounds[cellIndex]<bounds[cellIndex+1]}
+
+    #add capacity rows sum(y_S,speed) <= sum(min(config,card)*x_config,speed) for every speed
+    def addCapacityRows(self,block,cellIndex,fastCols,card=None):
+        for speed in self._csSpeeds:
+            xCols = self.xColumns(cellIndex,speed)
+            xVals = -self._xConfig[xCols-self._xOffset]
+            if card is not None:
+                xVals = np.maximum(xVals,-card)
+            yCols = fastCols+SPEED_CODES[speed]+self._yOffset
+            block.addRow(np.concatenate([yCols,xCols]),np.concatenate([np.ones(len(yCols)),xVals]),"<",0)
+
+    #return the number of agents that the charging processes in the columns S belong to
+    def cardinality(self,S):
+        return self._mult[self._yAgent[np.asarray(S,dtype=np.int64)]].sum()
+
+    #iterate over the arrivals per cell of every group of agents sharing the charging stations
+    def groupArrivals(self):
+        for agentKeys in self._groups:
+            yield from self.arrivalsPerCell(agentKeys).items()
+
+    def capacityBlock(self):
+        block = rowBlock("capacity")
+        for cellIndex,(cols,times) in self.groupArrivals():
+            for time,S in maximalOverlapSets(list(zip(times[:,0],times[:,1],cols))):
+                self.addCapacityRows(block,cellIndex,np.array(S,dtype=np.int64))
+        return block
+
+    def strengthenedCapacityBlock(self):
+        block = rowBlock("capacity")
+        for cellIndex,(cols,times) in self.groupArrivals():
+            for time,S in strengthenedOverlapSets(list(zip(times[:,0],times[:,1],cols)),self._i_capMaxCard):
+                self.addCapacityRows(block,cellIndex,np.array(S,dtype=np.int64),card=self.cardinality(S))
+        return block
+
+    def bucketedCapacityBlock(self):
+        block = rowBlock("capacity")
+        for cellIndex,(cols,times) in self.groupArrivals():
+            for time,S in bucketedOverlapSets(list(zip(times[:,0],times[:,1],cols)),self._i_capBucket):
+                self.addCapacityRows(block,cellIndex,np.array(S,dtype=np.int64),card=self.cardinality(S) if self._b_cap else None)
+        return block
+
+    def budgetBlock(self):
+        block = rowBlock("budget")
+        block.addRow(np.arange(self._numX)+self._xOffset,self._xCost,"<",self._i_budget)
+        return block
+
+    def limitBlock(self):
+        block = rowBlock("limit")
+        for limit,speed in zip(self._t_limit,["s","f"]):
+            cols = np.nonzero(self._xSpeed==SPEED_CODES[speed])[0]
+            block.addRow(cols+self._xOffset,self._xConfig[cols],"<",limit)
+        return block
+
+    #the robust objective s is bounded by the number of satisfied agents of every group
+    def satisfactionBlock(self):
+        block = rowBlock("satisfaction")
+        agentIndex = {key:a for a,key in enumerate(self._agentKeys)}
+        for agentKeys in self._groups:
+            zCols = np.arange(self._numZ) if agentKeys is None else np.array([agentIndex[key] for key in agentKeys],dtype=np.int64)
+            block.addRow(np.concatenate([[self._sOffset],zCols+self._zOffset]),np.concatenate([[1],-np.ones(len(zCols))]),"<",0)
+        return block
+
+    def proportionBlock(self):
+        block = rowBlock("proportion")
+        block.addRow(np.arange(self._numZ)+self._zOffset,np.ones(self._numZ),">",self._f_proportion*self._mult.sum())
+        return block
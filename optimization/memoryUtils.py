@@ -0,0 +1,27 @@
+import sys
+
+#return the memory (in bytes) of an object including all python objects it references
+#objects in seen (given by id) are not counted again, which allows to exclude shared objects such as the model input
+#attributes are only followed for instances of classes of this package
+def deepSizeOf(obj,seen=None):
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    #the size of numpy arrays includes the data they own
+    size = sys.getsizeof(obj)
+    if isinstance(obj,dict):
+        size += sum(deepSizeOf(key,seen)+deepSizeOf(value,seen) for key,value in obj.items())
+    elif isinstance(obj,(list,tuple,set,frozenset)):
+        size += sum(deepSizeOf(item,seen) for item in obj)
+    elif hasattr(obj,"__dict__") and type(obj).__module__.startswith(__package__):
+        size += deepSizeOf(vars(obj),seen)
+    return size
+
+#return a human readable representation of a number of bytes
+def formatBytes(size):
+    for unit in ["B","KB","MB","GB"]:
+        if size < 1024 or unit == "GB":
+            return f"{size:.1f} {unit}"
+        size /= 1024
@@ -1,38 +1,32 @@
-import cdd
-import csv
 from gurobipy import *
-from itertools import chain, combinations
 from multiprocessing import freeze_support, Manager, Process
 import logging
 from multiprocessing.pool import ThreadPool
+import numpy as np
 import os
+from scipy.optimize import linprog
+import scipy.sparse as sp
+import time
 
 from .const import (
-    B_BUDGET,
-    B_LIMIT,
-    B_PROPORTION,
-    BUDGET,
-    CAPACITY_CUTS,
     COST_FAST, 
     COST_SLOW,
     CONF_FAST,
     CONF_SLOW,
-    FRACTIONAL_ASSIGNMENT,
-    LIMIT,
-    LOG_FILE,
-    METHOD,
     MIN_X,
-    MIN_Y,
-    MIPGAP,
-    OUTER_DESCRIPTION,
-    POLYTOPE_THREADS,
-    PRESOLVE,
-    PROPORTION,
-    TIMELIMIT
+    MIN_Y
 )
-from .fileUtils import silentremove
-from .timeUtils import intervalContainsPoint
-from .ineqUtils import roundInequality
+from .agentUtils import decodePattern, patternCodes
+from .aggregationUtils import disaggregateSolution
+from .budgetUtils import planRequirements
+from .capacityUtils import arrivalsPerCell, bucketedChargingSets, capacityChargingSets, maximalChargingSets, maximalOverlapSets, strengthenedChargingSets
+from .fileUtils import readChargingStations, saveChargingStations, silentremove
+from .checkpointUtils import checkpointCallback, csCheckpoint
+from .matrixUtils import csMatrixBuilder, SPEED_CODES
+from .memoryUtils import deepSizeOf, formatBytes
+from .polytopeUtils import calculateInequalities, feasibleVertices
+from .settingsUtils import modelSettings
+from .startUtils import greedyPlacement, roundedStations
 
 _LOGGER = logging.getLogger(__name__)
 LOG_LEVEL = logging.DEBUG
@@ -44,23 +38,16 @@ def multi_addRequirementConstraintsOuterWrapper(args):
 def multi_addRequirementConstraintsOuter(cs_model, agent_key, t_timeout):
     #create vertices
     agent = cs_model._ear[agent_key]
-    if not agent.valid_patterns:
-        cs_model.addLConstr(cs_model._y.sum(agent_key,"*","*","*","*")>=4*cs_model._z[agent_key],name=f"outer_{agent_key}_{0}")
-        cs_model.addLConstr(cs_model._y.sum(agent_key,"*","*","*","f")>=2*cs_model._z[agent_key],name=f"outer_{agent_key}_{1}")
+    if not len(agent.valid_patterns):
+        cs_model.addLConstr(cs_model._y.sum(agent_key,"*","*","*","*")>=4*cs_model._z[agent_key],name=cs_model.constrName("outer_{}_{}",agent_key,0))
+        cs_model.addLConstr(cs_model._y.sum(agent_key,"*","*","*","f")>=2*cs_model._z[agent_key],name=cs_model.constrName("outer_{}_{}",agent_key,1))
         return True
 
-    feas_vertices=[]
-    for vp in agent.valid_patterns:
-        indices = [i for i, x in enumerate(vp) if x == 1]
-        ind_powerset = chain.from_iterable(combinations(indices, r) for r in range(len(indices)+1))
-        variants = []
-        for combination in ind_powerset:
-            vp_new = list(vp[:])
-            for index in combination:
-                vp_new[index] = 2
-            variants.append(vp_new)
-        for v in variants:
-            feas_vertices.append([1 if (i==1 and j==0) or (i==2 and j==1) else 0 for i in v for j in range(2)])
+    feas_vertices = feasibleVertices(agent.valid_patterns)
+    if t_timeout is None:
+        #cheap outer description (see budgetUtils.planRequirements)
+        addOuterRequirementConstraints(cs_model,agent_key,*calculateInequalities(feas_vertices))
+        return True
 
     #start constraint calculation
     manager = Manager()
@@ -73,74 +60,182 @@ def multi_addRequirementConstraintsOuter(cs_model, agent_key, t_timeout):
         p.join()
 
         #create inner constraints instead
-        cs_model._w[agent_key] = cs_model.addVars(agent.valid_patterns, vtype=cs_model._fractionalString)
+        cs_model._w[agent_key] = cs_model.addPatternVariables(agent_key)
         cs_model.update()
         cs_model.addRequirementConstraintInner(agent)
         return False
 
-    eq_indices = return_dict["eq"]
-    ineqs = return_dict["ineqs"]
+    addOuterRequirementConstraints(cs_model,agent_key,return_dict["eq"],return_dict["ineqs"])
+    return True
 
+#add the outer description (equation indices and inequalities, see polytopeUtils.calculateInequalities) of the charging demand of an agent
+def addOuterRequirementConstraints(cs_model,agent_key,eq_indices,ineqs):
     for index,ineq in enumerate(ineqs):
-        weights = {(index2,speed):ineq[2*index2+1] if speed=="s" else ineq[2*index2+2] for index2 in range(len(cs_model._ear[agent_key].charging_opps)) for speed in cs_model._csSpeeds}
+        weights = {(opp["index"],speed):ineq[2*opp["index"]+1] if speed=="s" else ineq[2*opp["index"]+2] for opp in cs_model._ear[agent_key].charging_opps for speed in cs_model._csSpeeds}
         coeffs = {(agent_key,opp["index"],location[0],location[1],speed):weights[(opp["index"],speed)] for opp in cs_model._ear[agent_key].charging_opps for location in cs_model._rcpb[opp["loc"]] for speed in cs_model._csSpeeds}
         if index in eq_indices:
-            cs_model.addLConstr(cs_model._y.prod(coeffs)==-ineq[0]*cs_model._z[agent_key],name=f"outer_{agent_key}_{index}")
+            cs_model.addLConstr(cs_model._y.prod(coeffs)==-ineq[0]*cs_model._z[agent_key],name=cs_model.constrName("outer_{}_{}",agent_key,index))
         else:
-            cs_model.addLConstr(cs_model._y.prod(coeffs)>=-ineq[0]*cs_model._z[agent_key],name=f"outer_{agent_key}_{index}")
-
-    return True
+            cs_model.addLConstr(cs_model._y.prod(coeffs)>=-ineq[0]*cs_model._z[agent_key],name=cs_model.constrName("outer_{}_{}",agent_key,index))
 
 def multi_calculateInequalities(feas_vertices,return_dict):
-    mat = cdd.Matrix([[1]+fv for fv in feas_vertices])
-    pol = cdd.Polyhedron(mat)
+    eq_indices, ineqs = calculateInequalities(feas_vertices)
 
-    res = pol.get_inequalities()
-
-    ineqs = [roundInequality(res[i],20,0.0001) for i in range(res.row_size)]
-
-    return_dict["eq"] = list(res.lin_set)
+    return_dict["eq"] = eq_indices
     return_dict["ineqs"] = ineqs
     
     
+#set the gurobi parameters of a model from the model settings (see settingsUtils.modelSettings)
+def setSolverParameters(model,settings):
+    model.setParam("Method",settings["i_method"])
+    if not settings["b_presolve"]:
+        model.setParam("Presolve",0)
+    if settings["s_logFile"]:
+        silentremove(settings["s_logFile"])
+        model.setParam("LogFile",settings["s_logFile"])
+    if settings["f_mipgap"]:
+        model.setParam("MIPGap",settings["f_mipgap"])
+    if settings["i_timelimit"]:
+        model.setParam("TimeLimit",settings["i_timelimit"])
+
+#call every callback registered in the model
+def csCallback(model,where):
+    for callback in model._callbacks:
+        callback(where)
+
+#capacity description that is kept outside the model
+#every capacity set is a row of a sparse incidence matrix over the charging processes (agent,index,cx,cy)
+class lazyCapacityConstraints:
+    def __init__(self,cs_model,strengthened):
+        self._strengthened = strengthened
+        self._sets = []
+        processIndex = {}
+        rows, cols = [], []
+        for prefix,agentKeys in cs_model.capacityGroups():
+            for cell,arrivals in arrivalsPerCell(cs_model._ear,cs_model._rcpb,agentKeys).items():
+                for time,S in cs_model.capacitySets(arrivals):
+                    for key,index in S:
+                        cols.append(processIndex.setdefault((key,index)+cell,len(processIndex)))
+                        rows.append(len(self._sets))
+                    self._sets.append((cell,S))
+        processes = list(processIndex)
+        self._incidence = sp.csr_matrix((np.ones(len(rows)),(rows,cols)),shape=(len(self._sets),len(processes)))
+        self._cards = np.array([cs_model.cardinality(S) for _,S in self._sets])
+        cells = list(cs_model._rc)
+        cellIndex = {cell:index for index,cell in enumerate(cells)}
+        self._setCells = np.array([cellIndex[cell] for cell,_ in self._sets],dtype=np.int64)
+        self._yVars = {speed:[cs_model._y[process+(speed,)] for process in processes] for speed in cs_model._csSpeeds}
+        self._xVars = {speed:[cs_model._x[cell[0],cell[1],config,speed] for cell in cells for config in cs_model._rcc[cell][speed]] for speed in cs_model._csSpeeds}
+        #capacity of every set as linear map of the charging station variables of one speed
+        self._capacityMaps = {speed:self.capacityMap(cs_model._rcc,cells,speed) for speed in cs_model._csSpeeds}
+        self._numAdded = 0
+
+    def __len__(self):
+        return len(self._sets)
+
+    #return sparse matrix with the (possibly strengthened) number of ports of every configuration per set
+    def capacityMap(self,rcc,cells,speed):
+        starts = np.cumsum([0]+[len(rcc[cell][speed]) for cell in cells])
+        rows, cols, vals = [], [], []
+        for s,cellIndex in enumerate(self._setCells):
+            configs = np.array(rcc[cells[cellIndex]][speed])
+            rows.append(np.full(len(configs),s))
+            cols.append(np.arange(starts[cellIndex],starts[cellIndex+1]))
+            vals.append(np.minimum(configs,self._cards[s]) if self._strengthened else configs)
+        if not rows:
+            return sp.csr_matrix((0,starts[-1]))
+        return sp.csr_matrix((np.concatenate(vals),(np.concatenate(rows),np.concatenate(cols))),shape=(len(self._sets),starts[-1]))
+
+    #return the capacity of every set for the given values of the charging station variables of one speed
+    def capacities(self,xVals,speed):
+        return self._capacityMaps[speed]@np.array(xVals)
+
+    #add all capacity constraints that are violated by the current incumbent as lazy constraints
+    def separate(self,cs_model):
+        for speed in cs_model._csSpeeds:
+            loads = self._incidence@np.array(cs_model.cbGetSolution(self._yVars[speed]))
+            capacities = self.capacities(cs_model.cbGetSolution(self._xVars[speed]),speed)
+            for s in np.nonzero(loads>capacities+1e-6)[0]:
+                cell,S = self._sets[s]
+                cs_model.cbLazy(quicksum(cs_model._y[key,index,cell[0],cell[1],speed] for key,index in S) <= cs_model.portExpression(cell,speed,cs_model.cardinality(S) if self._strengthened else None))
+                self._numAdded += 1
+
+#requirement constraints of agents without outer description that are kept outside the model and only added if violated by an incumbent
+#every constraint u*y_any+v*y_fast>=mu*z (u,v>=0 per stop) is valid for the charging processes that dominate a combination of the patterns of an agent, which is the projection of the inner description
+class lazyRequirementConstraints:
+    def __init__(self):
+        self._agents = {}
+        self._vars = []
+        self._numAdded = 0
+
+    def __len__(self):
+        return len(self._agents)
+
+    #prepare the separation for the agents and add the most violated constraint of no charging at all to the model
+    def addAgents(self,cs_model,keys):
+        for key in keys:
+            agent = cs_model._ear[key]
+            indices = [opp["index"] for opp in agent.charging_opps]
+            anyVars = [cs_model._y.select(key,index,"*","*","*") for index in indices]
+            fastVars = [cs_model._y.select(key,index,"*","*","f") for index in indices]
+            start = len(self._vars)
+            self._vars += [var for stopVars in anyVars+fastVars for var in stopVars]
+            #column positions of the variables per stop
+            positions = np.split(np.arange(start,len(self._vars)),np.cumsum([len(stopVars) for stopVars in anyVars+fastVars])[:-1])
+            z = cs_model._z[key]
+            if isinstance(z,Var):
+                self._vars.append(z)
+            patterns = agent.valid_patterns[:,indices]
+            self._agents[key] = (anyVars,fastVars,positions,len(self._vars)-1 if isinstance(z,Var) else None,(patterns>0).astype(float),(patterns==2).astype(float))
+            cut = self.deepestCut(key,np.zeros(len(indices)),np.zeros(len(indices)),1)
+            if cut is not None:
+                u, v, mu = cut
+                cs_model.addLConstr(self.cutExpression(key,u,v)>=mu*z,name=cs_model.constrName("cut_{}_{}",key,0))
+
+    #return the left hand side u*y_any+v*y_fast of a constraint of an agent
+    def cutExpression(self,key,u,v):
+        anyVars, fastVars = self._agents[key][:2]
+        return quicksum(u[i]*var for i in np.nonzero(u>1e-9)[0] for var in anyVars[i])+quicksum(v[i]*var for i in np.nonzero(v>1e-9)[0] for var in fastVars[i])
+
+    #return the most violated normalized constraint (u,v,mu) of an agent for the given charging per stop (any and fast) and satisfaction or None if there is none
+    #the separation lp maximizes mu*z-u*y_any-v*y_fast such that mu<=u*a_p+v*b_p for every pattern p and sum(u)+sum(v)<=1
+    def deepestCut(self,key,yAny,yFast,z):
+        A, B = self._agents[key][4:]
+        n = A.shape[1]
+        c = np.concatenate(([-z],yAny,yFast))
+        A_ub = np.vstack([np.hstack([np.ones((len(A),1)),-A,-B]),np.concatenate(([0],np.ones(2*n)))])
+        b_ub = np.concatenate([np.zeros(len(A)),[1]])
+        res = linprog(c,A_ub=A_ub,b_ub=b_ub,bounds=(0,None),method="highs")
+        if res.status != 0 or -res.fun <= 1e-6:
+            return None
+        return res.x[1:n+1], res.x[n+1:], res.x[0]
+
+    #add the most violated constraint of every agent that is violated by the current incumbent as lazy constraint
+    def separate(self,cs_model):
+        values = np.array(cs_model.cbGetSolution(self._vars))
+        for key,(anyVars,fastVars,positions,zPosition,_,_) in self._agents.items():
+            z = cs_model._z[key] if zPosition is None else values[zPosition]
+            if z < 1e-6:
+                continue
+            sums = np.array([values[stopPositions].sum() for stopPositions in positions])
+            cut = self.deepestCut(key,sums[:len(anyVars)],sums[len(anyVars):],z)
+            if cut is not None:
+                u, v, mu = cut
+                cs_model.cbLazy(self.cutExpression(key,u,v)>=mu*cs_model._z[key])
+                self._numAdded += 1
+
 class csBaseModel(Model):
-    def __init__(self,ear,rc,rcpb,rb,**kwargs):
+    def __init__(self,ear,rc,rcpb,rb,rcc=None,acm=None,**kwargs):
         #create base model
         Model.__init__(self)
 
         #set values
-        prop_defaults = {
-            "b_outer": OUTER_DESCRIPTION, 
-            "b_cap": CAPACITY_CUTS,
-            "i_capMaxCard": 1,
-            "b_budget": B_BUDGET,
-            "i_budget": BUDGET,
-            "b_limit": B_LIMIT,
-            "t_limit": LIMIT,
-            "b_proportion": B_PROPORTION,
-            "f_proportion": PROPORTION,
-            "b_fractionalAssignment": FRACTIONAL_ASSIGNMENT,
-            "i_method":METHOD, 
-            "f_mipgap": MIPGAP,
-            "i_timelimit": TIMELIMIT,
-            "b_presolve": PRESOLVE,
-            "i_polytopeThreads":POLYTOPE_THREADS,
-            "s_logFile": LOG_FILE
-        }
-        for prop, default in prop_defaults.items():
-            setattr(self, "_"+prop, kwargs.get(prop, default))
+        self._settings = modelSettings(**kwargs)
+        for prop, value in self._settings.items():
+            setattr(self, "_"+prop, value)
 
         #set gurobi model parameters
-        self.setParam("Method",self._i_method)
-        if not self._b_presolve:
-            self.setParam("Presolve",0)
-        if self._s_logFile:
-            silentremove(self._s_logFile)
-            self.setParam("LogFile",self._s_logFile)
-        if self._f_mipgap:
-            self.setParam("MIPGap",self._f_mipgap)
-        if self._i_timelimit:
-            self.setParam("TimeLimit",self._i_timelimit)
+        setSolverParameters(self,self._settings)
 
         #constants
         self._csSpeeds = ["f","s"]
@@ -150,152 +245,578 @@ class csBaseModel(Model):
         self._costSlow = COST_SLOW
         self._minX = MIN_X
         self._minY = MIN_Y
-        self._numAgents = len(ear)
         self._fractionalString = "C" if self._b_fractionalAssignment else "B"
 
+        #callbacks that are called during optimization
+        self._callbacks = []
+        #time needed to compute the mip start and times (in seconds of the solve) of the first incumbent and of reaching the mip gap
+        self._progress = {"start time":None,"first incumbent":None,"gap reached":None}
+        #budget, limit and proportion constraints, whose right hand sides can be changed in place (see setConstraintParameter)
+        self._parameterConstrs = {}
+        #checkpoint directory to which new incumbents are saved (see addCheckpoints)
+        self._checkpoint = None
+        #requirement constraints of agents with cut generation (see addLazyRequirementConstraints)
+        self._lazyRequirements = None
+
         #model input
         self._agents = ear.keys()
         self._ear = ear
         self._rc = rc
         self._rcpb = rcpb
         self._rb = rb
+
+        #charging station configurations per cell and speed (default: all configurations)
+        self._rcc = {cell:dict(self._csConfigs) for cell in rc}
+        if rcc:
+            self._rcc.update({cell:configs for cell,configs in rcc.items() if cell in rc})
+
+        #multiplicities of agent classes (default: every agent is its own class)
+        self._aggregated = bool(acm)
+        self._acm = {key:acm.get(key,1) if acm else 1 for key in ear}
+        self._numAgents = sum(self._acm.values())
+        self._assignmentString = "I" if self._aggregated and not self._b_fractionalAssignment else self._fractionalString
         
         #create variables
+        if self._b_portCount and (self._b_matrix or self._b_lazyCapacity):
+            raise ValueError("The port count formulation is only available for the standard model build without lazy capacity constraints.")
+        if self._b_compact and (not self._b_matrix or self._b_lazyCapacity):
+            raise ValueError("The compact model is only available for the matrix build without lazy capacity constraints.")
+        if self._b_matrix:
+            self.addMatrixVariables()
+            return
+        if self._b_portCount:
+            self.addPortCountVariables()
+        else:
+            self._possibleChargingStations = {(cell[0],cell[1],config,speed):config*self._csCosts[speed] for cell in self._rc for speed in self._csSpeeds for config in self._rcc[cell][speed]}
+            self._speedConfigs = {cs:cs[2] for cs in self._possibleChargingStations}
+            self._x = self.addVars(self._possibleChargingStations, vtype="B")
         self._w = dict()
+        self._possibleChargingProcesses = []
+        self._y = tupledict()
+        self._z = dict(self._acm) if not (self._b_limit or self._b_budget or self._b_proportion) else tupledict()
+        self.addAgentVariables(self._ear)
+        self.update()
+        _LOGGER.info("variables added")
+
+    #create the pattern, charging process and satisfaction variables of the given agents (classes)
+    def addAgentVariables(self,keys):
         if not self._b_outer:
-            for key,agent in self._ear.items():
-                self._w[key] = self.addVars(agent.valid_patterns, vtype=self._fractionalString)
-        self._possibleChargingStations = {(cell[0],cell[1],config,speed):config*self._csCosts[speed] for cell in self._rc for speed in self._csSpeeds for config in self._csConfigs[speed]}
-        self._speedConfigs = {cs:cs[2] for cs in self._possibleChargingStations}
-        self._x = self.addVars(self._possibleChargingStations, vtype="B")
-        self._possibleChargingProcesses = [(key,opp["index"])+location+(speed,) for key,agent in self._ear.items() for opp in agent.charging_opps for location in self._rcpb[opp["loc"]] for speed in self._csSpeeds]
-        self._y = self.addVars(self._possibleChargingProcesses, vtype=self._fractionalString)
+            for key in keys:
+                self._w[key] = self.addPatternVariables(key)
+        processes = [(key,opp["index"])+location+(speed,) for key in keys for opp in self._ear[key].charging_opps for location in self._rcpb[opp["loc"]] for speed in self._csSpeeds]
+        self._possibleChargingProcesses += processes
+        if self._aggregated:
+            self._y.update(self.addVars(processes, vtype=self._assignmentString, ub=[self._acm[cp[0]] for cp in processes]))
+        else:
+            self._y.update(self.addVars(processes, vtype=self._fractionalString))
         if not (self._b_limit or self._b_budget or self._b_proportion):
-            self._z = {key:1 for key in self._ear}
+            self._z.update({key:self._acm[key] for key in keys})
+        elif self._aggregated:
+            self._z.update(self.addVars(keys, vtype="I", ub=[self._acm[key] for key in keys]))
         else:
-            self._z = self.addVars(self._ear, vtype="B")
+            self._z.update(self.addVars(keys, vtype="B"))
+
+    #return the constraint name from the template and its arguments or an empty name if constraints are not named
+    def constrName(self,template,*args):
+        if not self._b_names:
+            return ""
+        return template.format(*args)
+
+    #create the pattern variables of an agent (class), which count the members charging according to each pattern
+    #the variables are keyed by the 2-bit codes of the patterns (see agentUtils.patternCodes)
+    def addPatternVariables(self,key):
+        codes = patternCodes(self._ear[key].valid_patterns).tolist()
+        if self._aggregated:
+            return self.addVars(codes, vtype=self._assignmentString, ub=self._acm[key])
+        return self.addVars(codes, vtype=self._fractionalString)
+
+    #return the number of agents that the charging processes S=[(agent,index)] belong to
+    def cardinality(self,S):
+        return sum(self._acm[key] for key,_ in S)
+
+    #create one integer port count per cell and speed that is restricted to the allowed configurations
+    #u indicates whether a cell has a charging station of the speed
+    def addPortCountVariables(self):
+        keys = [(cell[0],cell[1],speed) for cell in self._rc for speed in self._csSpeeds]
+        self._u = self.addVars(keys, vtype="B")
+        self._ports = {}
+        for key in keys:
+            configs = sorted(self._rcc[key[:2]][key[2]])
+            steps = {configs[i+1]-configs[i] for i in range(len(configs)-1)}
+            if len(steps)<=1:
+                #configurations form an arithmetic progression: ports = min*u + step*k with 0 <= k <= (max-min)/step*u
+                step = steps.pop() if steps else 0
+                numSteps = (configs[-1]-configs[0])//step if step else 0
+                k = self.addVar(vtype="I", ub=numSteps)
+                self.addLConstr(k<=numSteps*self._u[key],name=self.constrName("portSteps_{}",key))
+                self._ports[key] = configs[0]*self._u[key]+step*k
+            else:
+                #arbitrary configurations: one weight per configuration, at most one of them non-zero
+                cellWeights = list(self.addVars(configs, ub=1).values())
+                self.addSOS(GRB.SOS_TYPE1,cellWeights,configs)
+                self.addLConstr(quicksum(cellWeights)==self._u[key],name=self.constrName("portConfig_{}",key))
+                self._ports[key] = quicksum(config*weight for config,weight in zip(configs,cellWeights))
+
+    #return the number of ports of a speed at a cell, where at most card ports are needed if card is given
+    def portExpression(self,cell,speed,card=None):
+        if self._b_portCount:
+            if card is None:
+                return self._ports[cell[0],cell[1],speed]
+            return card*self._u[cell[0],cell[1],speed]
+        return quicksum((config if card is None else min(config,card))*self._x[cell[0],cell[1],config,speed] for config in self._rcc[cell][speed])
+
+    #return the number of ports of a speed at a cell in the current solution or in the given solution (values indexed by variable index)
+    def portValue(self,cell,speed,solution=None):
+        value = (lambda var:var.x) if solution is None else (lambda var:solution[var.index])
+        if self._b_portCount:
+            expr = self._ports[cell[0],cell[1],speed]
+            return expr.getConstant()+sum(expr.getCoeff(i)*value(expr.getVar(i)) for i in range(expr.size()))
+        return sum([value(self._x[cell[0],cell[1],config,speed])*config for config in self._rcc[cell][speed]])
+
+    #return the number of ports of a speed per cell in the current solution or in the given solution (values indexed by variable index)
+    def portValues(self,speed,solution=None):
+        if self._b_compact:
+            return self._builder.portValues(self._mvars.X if solution is None else np.array(solution),speed)
+        return {cell:self.portValue(cell,speed,solution) for cell in self._rc}
+
+    #return the values of all charging processes (agent,index,cx,cy,speed) in the current solution that exceed the tolerance
+    def chargingProcessValues(self,tolerance=0):
+        if self._b_compact:
+            return self._builder.processValues(self._mvars.X,tolerance)
+        return {cp:self._y[cp].x for cp in self._possibleChargingProcesses if self._y[cp].x>tolerance}
+
+    #return the total cost of all charging stations
+    def costExpression(self):
+        if self._b_portCount:
+            return quicksum(self._csCosts[speed]*self._ports[cell[0],cell[1],speed] for cell in self._rc for speed in self._csSpeeds)
+        return self._x.prod(self._possibleChargingStations,"*","*","*","*")
+
+    #create all variables at once from the column layout of the matrix builder
+    def addMatrixVariables(self):
+        self._builder = csMatrixBuilder(self._ear,self._rc,self._rcpb,self._rb,rcc=self._rcc,acm=self._acm if self._aggregated else None,groups=[agentKeys for _,agentKeys in self.capacityGroups()],**self._settings)
+        b = self._builder
+        self._mvars = self.addMVar(b.numVars(),ub=b._ub,vtype=b._vtypes)
         self.update()
+        if self._b_compact:
+            #variables are only addressed by their column in the layout of the builder
+            self._possibleChargingStations = self._speedConfigs = self._possibleChargingProcesses = None
+            self._x = self._y = None
+            self._z = dict(self._acm) if not b._bZ else dict(zip(b._agentKeys,self._mvars[b._zOffset:b._wOffset].tolist()))
+            self._w = {}
+            _LOGGER.info("variables added")
+            return
+        variables = self._mvars.tolist()
+        self._possibleChargingStations = {key:int(cost) for key,cost in zip(b._xKeys,b._xCost)}
+        self._speedConfigs = {cs:cs[2] for cs in self._possibleChargingStations}
+        self._x = tupledict(zip(b._xKeys,variables[b._xOffset:b._yOffset]))
+        self._possibleChargingProcesses = b.yKeys()
+        self._y = tupledict(zip(self._possibleChargingProcesses,variables[b._yOffset:b._zOffset]))
+        if not b._bZ:
+            self._z = dict(self._acm)
+        else:
+            self._z = tupledict(zip(b._agentKeys,variables[b._zOffset:b._wOffset]))
+        self._w = {key:tupledict(zip(patternCodes(self._ear[key].valid_patterns).tolist(),variables[b._wOffset+start:b._wOffset+end])) for key,(start,end) in b._wSlices.items()}
         _LOGGER.info("variables added")
 
     def addStandardConstraints(self):
+        if self._b_matrix:
+            self.addMatrixConstraints()
+            if self._b_lazyCapacity:
+                self.addLazyCapacityConstraints()
+            return
         self.addRequirementConstraints()
         _LOGGER.info("requirement constraints added")
         self.addMaxCSConstraints()
         _LOGGER.info("max cs constraints added")
         self.addCPPerStopConstraints()
         _LOGGER.info("cp per stop constraints added")
-        if not self._b_cap:
-            self.addCapacityConstraints()
-            _LOGGER.info("capacity constraints added")
+        if self._b_lazyCapacity:
+            self.addLazyCapacityConstraints()
         else:
-            self.addStrengthenedCapacityDescription()
-            _LOGGER.info("strengthened capacity description added")
+            self.addCapacityDescription()
+        self.addParameterConstraints()
+        self.update()
+
+    #add the budget or limit constraint and the proportion constraint if they are set
+    def addParameterConstraints(self):
         if self._b_budget:
             self.addBudgetConstraint()
         elif self._b_limit:
             self.addLimitConstraint()
         if self._b_proportion:
             self.addProportionConstraint()
+
+    #add the capacity constraints of the chosen capacity description for the given groups of agents (default: all capacity groups)
+    def addCapacityDescription(self,groups=None):
+        if self._i_capBucket:
+            self.addBucketedCapacityConstraints(groups)
+            _LOGGER.info(f"bucketed capacity constraints added (bucket width {self._i_capBucket}s)")
+        elif not self._b_cap:
+            self.addCapacityConstraints(groups)
+            _LOGGER.info("capacity constraints added")
+        else:
+            self.addStrengthenedCapacityDescription(groups)
+            _LOGGER.info("strengthened capacity description added")
+
+    #add every constraint family with a single call to the matrix api
+    def addMatrixConstraints(self):
+        for name,A,sense,rhs in self._builder.standardBlocks():
+            if A.shape[0]:
+                constrs = self.addMConstr(A,self._mvars,sense,rhs,name=self.constrName(name))
+                if name in ["budget","limit","proportion"]:
+                    self._parameterConstrs[name] = constrs.tolist()
+            _LOGGER.info(f"{A.shape[0]} {name} constraints added")
+        if self._b_compact:
+            self._builder.releaseBuildData()
         self.update()
 
     def addCSObjective(self):
-        if not (self._b_limit or self._b_budget):
-            self.setObjective(self._x.prod(self._possibleChargingStations,"*","*","*"),GRB.MINIMIZE)
+        if self._b_matrix:
+            c, maximize = self._builder.objective()
+            self.setMObjective(None,c,0.0,xc=self._mvars,sense=GRB.MAXIMIZE if maximize else GRB.MINIMIZE)
+        elif not (self._b_limit or self._b_budget):
+            self.setObjective(self.costExpression(),GRB.MINIMIZE)
         else:
             self.setObjective(self._z.sum(),GRB.MAXIMIZE)
 
-    def addRequirementConstraints(self):
+    #add the requirement constraints of the given agents (default: all agents)
+    def addRequirementConstraints(self,keys=None):
         if self._b_outer:
-            self.addRequirementConstraintsOuter()
+            self.addRequirementConstraintsOuter(self._i_polytopeTimeout,keys)
         else:
-            self.addRequirementConstraintsInner()
+            self.addRequirementConstraintsInner(keys)
 
-    def addRequirementConstraintsOuter(self,timeout=5):
+    #add the outer description of the given agents (default: all agents) in a pool of threads, each agent is described as planned within the preprocessing budget (see budgetUtils.planRequirements)
+    #with a preprocessing budget, agents with a cheap outer description are described directly, all others in their own process with their planned timeout (at most timeout, default: i_polytopeTimeout)
+    def addRequirementConstraintsOuter(self,timeout=None,keys=None):
         if os.name == 'nt':
             freeze_support()
+        timeout = self._i_polytopeTimeout if timeout is None else timeout
+        keys = list(self._ear if keys is None else keys)
+        plan = planRequirements({key:self._ear[key] for key in keys},self._f_preprocessingBudget,timeout,self._i_polytopeThreads)
         pool = ThreadPool(self._i_polytopeThreads)
-        l = [(self,key,timeout) for key in self._ear]
+        l = [(self,key,plan[key][1] if key in plan else timeout) for key in keys if key not in plan or plan[key][0]=="outer"]
         suc = pool.map(multi_addRequirementConstraintsOuterWrapper,l)
+        innerKeys = [key for key in keys if key in plan and plan[key][0]=="inner"]
+        for key in innerKeys:
+            self._w[key] = self.addPatternVariables(key)
+        self.update()
+        self.addRequirementConstraintsInner(innerKeys)
+        cutKeys = [key for key in keys if key in plan and plan[key][0]=="cut"]
+        if cutKeys:
+            self.addLazyRequirementConstraints(cutKeys)
         return
 
-    def addRequirementConstraintsInner(self):
-        for agent in self._ear.values():
-            self.addRequirementConstraintInner(agent)
+    def addRequirementConstraintsInner(self,keys=None):
+        for key in (self._ear if keys is None else keys):
+            self.addRequirementConstraintInner(self._ear[key])
         return
 
     def addRequirementConstraintInner(self,agent):
-        if not agent.valid_patterns:
-            self.addLConstr(self._y.sum(agent.name,"*","*","*","*")>=4*self._z[agent.name],name=f"inner_{agent.name}_{0}")
-            self.addLConstr(self._y.sum(agent.name,"*","*","*","f")>=2*self._z[agent.name],name=f"inner_{agent.name}_{1}")
+        if not len(agent.valid_patterns):
+            self.addLConstr(self._y.sum(agent.name,"*","*","*","*")>=4*self._z[agent.name],name=self.constrName("inner_{}_{}",agent.name,0))
+            self.addLConstr(self._y.sum(agent.name,"*","*","*","f")>=2*self._z[agent.name],name=self.constrName("inner_{}_{}",agent.name,1))
             return True
 
-        self.addLConstr(self._w[agent.name].sum()==self._z[agent.name],name=f"innerSat_{agent.name}")
-        for index,_ in enumerate(agent.charging_opps):
+        self.addLConstr(self._w[agent.name].sum()==self._z[agent.name],name=self.constrName("innerSat_{}",agent.name))
+        codes = patternCodes(agent.valid_patterns)
+        for index in [opp["index"] for opp in agent.charging_opps]:
             for mode in [1,2]:
                 if mode==1:
-                    coeffs = {vp:1 for vp in agent.valid_patterns if vp[index]}
-                    self.addLConstr(self._y.sum(agent.name,index,"*","*","*")>=self._w[agent.name].prod(coeffs),name=f"inner_{agent.name}_{mode}_{index}")
+                    coeffs = dict.fromkeys(codes[agent.valid_patterns[:,index]>0].tolist(),1)
+                    self.addLConstr(self._y.sum(agent.name,index,"*","*","*")>=self._w[agent.name].prod(coeffs),name=self.constrName("inner_{}_{}_{}",agent.name,mode,index))
                 if mode==2:
-                    coeffs = {vp:1 for vp in agent.valid_patterns if vp[index]==2}
-                    self.addLConstr(self._y.sum(agent.name,index,"*","*","f")>=self._w[agent.name].prod(coeffs),name=f"inner_{agent.name}_{mode}_{index}")
+                    coeffs = dict.fromkeys(codes[agent.valid_patterns[:,index]==2].tolist(),1)
+                    self.addLConstr(self._y.sum(agent.name,index,"*","*","f")>=self._w[agent.name].prod(coeffs),name=self.constrName("inner_{}_{}_{}",agent.name,mode,index))
         return
 
     def addMaxCSConstraints(self):
         for cell in self._rc:
-            self.addLConstr(self._x.sum(cell[0],cell[1],"*","*")<=1,name=f"csMax_{cell}_0")
+            stations = self._u.sum(cell[0],cell[1],"*") if self._b_portCount else self._x.sum(cell[0],cell[1],"*","*")
+            self.addLConstr(stations<=1,name=self.constrName("csMax_{}_0",cell))
         return
 
-    def addCPPerStopConstraints(self):
-        for key,agent in self._ear.items():
-            for opp in agent.charging_opps:
+    def addCPPerStopConstraints(self,keys=None):
+        for key in (self._ear if keys is None else keys):
+            for opp in self._ear[key].charging_opps:
                 if (opp["loc"]) in self._rb:
-                    self.addLConstr(self._y.sum(key,opp["index"],"*","*","*")<=1,name=f"cpPerStop_{key}_{opp['index']}")
+                    self.addLConstr(self._y.sum(key,opp["index"],"*","*","*")<=self._acm[key],name=self.constrName("cpPerStop_{}_{}",key,opp["index"]))
         return
 
-    def addCapacityConstraints(self):
-        for cell in self._rc:
-            arrivalAtRefPoint = [opp for key,agent in self._ear.items() for opp in agent.charging_opps if cell in self._rcpb[opp["loc"]]]
-            for time in [opp["time"][0] for opp in arrivalAtRefPoint]:
-                relevantChargingProcesses = [[opp["agent"],opp["index"],cell] for opp in arrivalAtRefPoint if intervalContainsPoint(opp["time"],time)]
-                for speed in ["f","s"]:
-                    self.addLConstr(quicksum(self._y[index[0],index[1],index[2][0],index[2][1],speed] for index in relevantChargingProcesses) <= self._x.prod(self._speedConfigs,cell[0],cell[1],"*",speed),name=f"capacity_{cell}_{time}_{speed}")
+    #groups of agents that compete for the same charging stations together with a name prefix
+    def capacityGroups(self):
+        return [("",None)]
+
+    def addCapacityConstraints(self,groups=None):
+        for prefix,agentKeys in (self.capacityGroups() if groups is None else groups):
+            for cell,arrivals in arrivalsPerCell(self._ear,self._rcpb,agentKeys).items():
+                for time,relevantChargingProcesses in maximalChargingSets(arrivals):
+                    for speed in self._csSpeeds:
+                        self.addCapacityConstraint(relevantChargingProcesses,cell,speed,None,("capacity_{}{}_{}_{}",prefix,cell,time,speed))
         return
 
-    def addStrengthenedCapacityDescription(self):
-        for cell in self._rc:
-            subsets = []
-            arrivalAtRefPoint = [opp for key,agent in self._ear.items() for opp in agent.charging_opps if cell in self._rcpb[opp["loc"]]]
-            for time in [opp["time"][0] for opp in arrivalAtRefPoint]:
-                relevantChargingProcesses = [(opp["agent"],opp["index"],cell) for opp in arrivalAtRefPoint if intervalContainsPoint(opp["time"],time)]
-                for i in range(1,min(self._i_capMaxCard+1,len(relevantChargingProcesses))):
-                    for S in combinations(relevantChargingProcesses,i):
-                        if not set(S) in subsets:
-                            subsets.append(set(S))
-                if not set(relevantChargingProcesses) in subsets:
-                    subsets.append(set(relevantChargingProcesses))
-            for S in subsets:
-                coeffs = {k:min(v,len(S)) for k,v in self._speedConfigs.items()}
-                for speed in ["f","s"]:
-                    self.addLConstr(quicksum(self._y[index[0],index[1],index[2][0],index[2][1],speed] for index in S) <= self._x.prod(coeffs,cell[0],cell[1],"*",speed),name=f"capacity_{cell}_{time}_{speed}")
+    #restrict the number of simultaneous charging processes S of a speed at a cell by its ports (or by card if smaller)
+    #nameFormat is the name template of the constraint followed by its arguments (see constrName)
+    def addCapacityConstraint(self,S,cell,speed,card,nameFormat):
+        load = quicksum(self._y[key,index,cell[0],cell[1],speed] for key,index in S)
+        if not self._b_portCount:
+            self.addLConstr(load <= self.portExpression(cell,speed,card),name=self.constrName(*nameFormat))
+            return
+        #min(ports,card) is split into two constraints, each of which is only needed if it can be tight
+        configs = self._rcc[cell][speed]
+        if card is None or card > min(configs):
+            self.addLConstr(load <= self.portExpression(cell,speed),name=self.constrName(*nameFormat))
+        if card is not None and card < max(configs):
+            self.addLConstr(load <= self.portExpression(cell,speed,card),name=self.constrName(nameFormat[0]+"_card",*nameFormat[1:]))
+
+    #return the sets of charging processes at a cell that are restricted by a capacity constraint
+    def capacitySets(self,arrivals):
+        return capacityChargingSets(arrivals,self._i_capBucket,self._b_cap,self._i_capMaxCard)
+
+    #approximate capacity constraints for all processes overlapping the same time bucket
+    def addBucketedCapacityConstraints(self,groups=None):
+        for prefix,agentKeys in (self.capacityGroups() if groups is None else groups):
+            for cell,arrivals in arrivalsPerCell(self._ear,self._rcpb,agentKeys).items():
+                for time,S in bucketedChargingSets(arrivals,self._i_capBucket):
+                    for speed in self._csSpeeds:
+                        self.addCapacityConstraint(S,cell,speed,self.cardinality(S) if self._b_cap else None,("capacity_{}{}_{}_{}",prefix,cell,time,speed))
+        return
+
+    def addStrengthenedCapacityDescription(self,groups=None):
+        for prefix,agentKeys in (self.capacityGroups() if groups is None else groups):
+            for cell,arrivals in arrivalsPerCell(self._ear,self._rcpb,agentKeys).items():
+                for number,(time,S) in enumerate(strengthenedChargingSets(arrivals,self._i_capMaxCard)):
+                    for speed in self._csSpeeds:
+                        self.addCapacityConstraint(S,cell,speed,self.cardinality(S),("capacity_{}{}_{}_{}_{}",prefix,cell,time,number,speed))
 
         return
 
+    #keep the capacity description outside the model and only add constraints violated by an incumbent
+    def addLazyCapacityConstraints(self):
+        self._lazyCapacity = lazyCapacityConstraints(self,self._b_cap)
+        self.setParam("LazyConstraints",1)
+        self._callbacks.append(self.lazyCapacityCallback)
+        _LOGGER.info(f"{len(self._lazyCapacity)} lazy capacity sets prepared")
+
+    def lazyCapacityCallback(self,where):
+        if where == GRB.Callback.MIPSOL:
+            self._lazyCapacity.separate(self)
+
+    #keep the requirement constraints of the agents outside the model and only add constraints violated by an incumbent
+    def addLazyRequirementConstraints(self,keys):
+        if self._lazyRequirements is None:
+            self._lazyRequirements = lazyRequirementConstraints()
+            self.setParam("LazyConstraints",1)
+            self._callbacks.append(self.lazyRequirementCallback)
+        self.update()
+        self._lazyRequirements.addAgents(self,keys)
+        _LOGGER.info(f"lazy requirement constraints prepared for {len(keys)} agents")
+
+    def lazyRequirementCallback(self,where):
+        if where == GRB.Callback.MIPSOL:
+            self._lazyRequirements.separate(self)
+
+    #set start values for the charging stations (ports per (cell,speed)) and, if given, for the charging processes (agent,index,cx,cy,speed) and the satisfied agents
+    #port numbers are rounded up to the next configuration, gurobi completes the values of all other variables
+    def setStart(self,stations,processes=None,satisfied=None):
+        stations = roundedStations(stations,self._rcc)
+        if self._b_matrix:
+            self._mvars.Start = self._builder.startValues(stations,processes,satisfied,GRB.UNDEFINED)
+            return
+        if self._b_portCount:
+            for (cx,cy,speed),u in self._u.items():
+                u.Start = float(((cx,cy),speed) in stations)
+        else:
+            for (cx,cy,config,speed),x in self._x.items():
+                x.Start = float(stations.get(((cx,cy),speed))==config)
+        if processes is not None:
+            for cp,y in self._y.items():
+                y.Start = processes.get(cp,0)
+        if satisfied is not None:
+            for key,z in self._z.items():
+                if isinstance(z,Var):
+                    z.Start = satisfied.get(key,0)
+
+    #fix the charging stations of the given cells to the given ports per (cell,speed), which are rounded up to the next configuration (see startUtils.roundedStations), cells without ports get no charging station
+    #if lower is set, the charging stations are only bounded from below, i.e. a cell may get more ports of the same speed
+    #return the fixed charging stations as configuration per (cell,speed)
+    def fixStations(self,cells,stations,lower=False):
+        if self._b_matrix:
+            raise ValueError("Charging stations can only be fixed in the standard model build.")
+        fixed = roundedStations(stations,{cell:self._rcc[cell] for cell in cells})
+        for cell in cells:
+            for speed in self._csSpeeds:
+                ports = fixed.get((cell,speed),0)
+                if lower:
+                    if ports:
+                        self.addLConstr(self.portExpression(cell,speed)>=ports,name=self.constrName("fixed_{}",(cell,speed)))
+                else:
+                    self.addLConstr(self.portExpression(cell,speed)==ports,name=self.constrName("fixed_{}",(cell,speed)))
+        return fixed
+
+    #return the (fractional) number of ports per (cell,speed) in an optimal solution of the lp relaxation or None if it has no solution
+    def relaxedStations(self):
+        self.update()
+        relaxed = self.relax()
+        relaxed.optimize()
+        solution = relaxed.getAttr("X",relaxed.getVars()) if relaxed.SolCount else None
+        relaxed.dispose()
+        if solution is None:
+            return None
+        return {(cell,speed):ports for speed in self._csSpeeds for cell,ports in self.portValues(speed,solution).items()}
+
+    #set a mip start obtained by rounding the lp relaxation ("lp"), by the greedy placement ("greedy", see startUtils.greedyPlacement) or from the charging stations of a result file
+    def addMIPStart(self,source):
+        t_start = time.time()
+        processes = satisfied = None
+        if source == "lp":
+            stations = self.relaxedStations()
+            if stations is None:
+                _LOGGER.warning("lp relaxation has no solution, no mip start set")
+                return
+        elif source == "greedy":
+            stations, processes, satisfied = greedyPlacement(
+                self._ear,
+                self._rcpb,
+                self._rcc,
+                self._csCosts,
+                budget=self._i_budget if self._b_budget else None,
+                limit=self._t_limit if self._b_limit else None,
+                acm=self._acm if self._aggregated else None
+                )
+        else:
+            stations = readChargingStations(source)
+        self.setStart(stations,processes,satisfied)
+        self._progress["start time"] = time.time()-t_start
+        _LOGGER.info(f"mip start from {source} computed in {self._progress['start time']:.2f}s")
+
+    #record when the first incumbent is found and when the mip gap is reached during the next optimization
+    def trackProgress(self):
+        self._progress.update({"first incumbent":None,"gap reached":None})
+        self._progressGap = self.Params.MIPGap
+        if self.progressCallback not in self._callbacks:
+            self._callbacks.append(self.progressCallback)
+
+    def progressCallback(self,where):
+        if where == GRB.Callback.MIPSOL and self._progress["first incumbent"] is None:
+            self._progress["first incumbent"] = self.cbGet(GRB.Callback.RUNTIME)
+        elif where == GRB.Callback.MIP and self._progress["gap reached"] is None:
+            best = self.cbGet(GRB.Callback.MIP_OBJBST)
+            bound = self.cbGet(GRB.Callback.MIP_OBJBND)
+            if abs(best) < GRB.INFINITY and abs(best-bound) <= self._progressGap*abs(best):
+                self._progress["gap reached"] = self.cbGet(GRB.Callback.RUNTIME)
+
+    #return the cells and the map from variables to ports with entries (cell index, speed index, variable index, coefficient), see checkpointUtils.csCheckpoint
+    def portMap(self):
+        self.update()
+        if self._b_compact:
+            #speed codes of the builder are the speed indices
+            b = self._builder
+            return b._cells, np.array([b._xCell,b._xSpeed,np.arange(b._xOffset,b._yOffset),b._xConfig],dtype=float)
+        cells = list(self._rc)
+        cellIndex = {cell:index for index,cell in enumerate(cells)}
+        speedIndex = {speed:index for index,speed in enumerate(self._csSpeeds)}
+        if self._b_portCount:
+            entries = [(cellIndex[key[:2]],speedIndex[key[2]],expr.getVar(i).index,expr.getCoeff(i)) for key,expr in self._ports.items() for i in range(expr.size())]
+        else:
+            entries = [(cellIndex[key[:2]],speedIndex[key[3]],var.index,key[2]) for key,var in self._x.items()]
+        return cells, np.array(entries,dtype=float).reshape(-1,4).T
+
+    #save the model and every new incumbent to the directory, from which an interrupted run can be resumed (see checkpointUtils.resumeOptimization)
+    def addCheckpoints(self,directory):
+        if self._b_lazyCapacity:
+            raise ValueError("Checkpoints are not available with lazy capacity constraints, which are not part of the saved model.")
+        if self._lazyRequirements is not None:
+            raise ValueError("Checkpoints are not available with lazy requirement constraints, which are not part of the saved model.")
+        self._checkpoint = csCheckpoint(directory)
+        self._checkpointVars = self.getVars()
+        self._checkpoint.saveModel(self,*self.portMap())
+        self._callbacks.append(self.checkpointCallback)
+
+    def checkpointCallback(self,where):
+        checkpointCallback(self,where)
+
+    def optimize(self):
+        if self._s_start and self._progress["start time"] is None:
+            self.addMIPStart(self._s_start)
+            self.trackProgress()
+        if self._s_checkpoint and self._checkpoint is None:
+            self.addCheckpoints(self._s_checkpoint)
+        if self._callbacks:
+            Model.optimize(self,csCallback)
+        else:
+            Model.optimize(self)
+        if self._b_lazyCapacity:
+            _LOGGER.info(f"{self._lazyCapacity._numAdded} lazy capacity constraints added")
+        if self._lazyRequirements is not None:
+            _LOGGER.info(f"{self._lazyRequirements._numAdded} lazy requirement constraints added")
+        if self.progressCallback in self._callbacks:
+            #the gap may be closed without a further mip callback
+            if self._progress["gap reached"] is None and self.SolCount and self.MIPGap <= self._progressGap:
+                self._progress["gap reached"] = self.Runtime
+            _LOGGER.info(f"first incumbent after {self._progress['first incumbent']}s, mip gap reached after {self._progress['gap reached']}s")
+
     def addLimitConstraint(self):
-        self.addLConstr(self._x.prod(self._speedConfigs,"*","*","*","s")<=self._t_limit[0])
-        self.addLConstr(self._x.prod(self._speedConfigs,"*","*","*","f")<=self._t_limit[1])
+        self._parameterConstrs["limit"] = [
+            self.addLConstr(quicksum(self.portExpression(cell,"s") for cell in self._rc)<=self._t_limit[0]),
+            self.addLConstr(quicksum(self.portExpression(cell,"f") for cell in self._rc)<=self._t_limit[1])
+        ]
 
     def addBudgetConstraint(self):
-        self.addLConstr(self._x.prod(self._possibleChargingStations,"*","*","*","*")<=self._i_budget)
+        self._parameterConstrs["budget"] = [self.addLConstr(self.costExpression()<=self._i_budget)]
 
     def addProportionConstraint(self):
-        self.addLConstr(self._z.sum()>=self._f_proportion*self._numAgents)
+        self._parameterConstrs["proportion"] = [self.addLConstr(self._z.sum()>=self._f_proportion*self._numAgents)]
+
+    #change the budget, the limits (slow,fast) or the proportion in place by setting the right hand sides of the corresponding constraints
+    def setConstraintParameter(self,parameter,value):
+        for constr,rhs in zip(self._parameterConstrs[parameter],self.parameterRHS(parameter,value)):
+            constr.RHS = rhs
+        if parameter == "budget":
+            self._i_budget = value
+        elif parameter == "limit":
+            self._t_limit = tuple(value)
+        else:
+            self._f_proportion = value
+
+    #return the right hand sides of the constraints of a parameter for the given value
+    def parameterRHS(self,parameter,value):
+        if parameter not in self._parameterConstrs:
+            raise ValueError(f"model has no {parameter} constraint, possible parameters: {list(self._parameterConstrs)}")
+        if parameter == "budget":
+            return [value]
+        elif parameter == "limit":
+            return list(value)
+        return [value*self._numAgents]
+
+    #check whether the current solution satisfies the constraints of a parameter with the given value, i.e. whether it is a feasible start after setConstraintParameter
+    def solutionSatisfiesParameter(self,parameter,value,tolerance=1e-6):
+        for constr,rhs in zip(self._parameterConstrs[parameter],self.parameterRHS(parameter,value)):
+            activity = self.getRow(constr).getValue()
+            if (constr.Sense == "<" and activity > rhs+tolerance) or (constr.Sense == ">" and activity < rhs-tolerance):
+                return False
+        return True
+
+    #use the current solution as start of the next optimization
+    def keepSolutionAsStart(self):
+        variables = self.getVars()
+        self.setAttr("Start",variables,self.getAttr("X",variables))
+
+    #discard the current solution and the start, so that the next optimization is not started from either of them
+    def clearStart(self):
+        self.reset(1)
+
+    #return the number of satisfied agents (of the given agents) in the current solution
+    def numSatisfied(self,keys=None):
+        return sum(z.x if isinstance(z,Var) else z for key,z in self._z.items() if keys is None or key in keys)
 
     def logSolutionStatistics(self):
-        self._fastChargingPorts = {cell:sum([self._x[cell[0],cell[1],config,"f"].x*config for config in self._csConfigs["f"]]) for cell in self._rc}
-        self._slowChargingPorts = {cell:sum([self._x[cell[0],cell[1],config,"s"].x*config for config in self._csConfigs["s"]]) for cell in self._rc}
+        self._fastChargingPorts = self.portValues("f")
+        self._slowChargingPorts = self.portValues("s")
 
-        fastChargingProcesses = {cp:self._y[cp].x for cp in self._possibleChargingProcesses if cp[4]=="f"}
-        slowChargingProcesses = {cp:self._y[cp].x for cp in self._possibleChargingProcesses if cp[4]=="s"}
+        chargingProcesses = self.chargingProcessValues()
+        fastChargingProcesses = {cp:value for cp,value in chargingProcesses.items() if cp[4]=="f"}
+        slowChargingProcesses = {cp:value for cp,value in chargingProcesses.items() if cp[4]=="s"}
 
         _LOGGER.info(f"no of fast charging ports: {sum([val for key,val in self._fastChargingPorts.items()])}")
         _LOGGER.info(f"no of slow charging ports: {sum([val for key,val in self._slowChargingPorts.items()])}")
@@ -303,52 +824,94 @@ class csBaseModel(Model):
         _LOGGER.info(f"no of fast charging processes: {sum([val for key,val in fastChargingProcesses.items()])}")
         _LOGGER.info(f"no of slow charging processes: {sum([val for key,val in slowChargingProcesses.items()])}")
 
-        _LOGGER.info(f"no of agents: {len(self._ear)}")
+        _LOGGER.info(f"no of agents: {self._numAgents}")
+        if self._aggregated:
+            _LOGGER.info(f"no of agent classes: {len(self._ear)}")
         _LOGGER.info(f"no of candidate charging stations: {len(self._rc)}")
+        if self._i_capBucket:
+            self.logCapacityApproximation()
         return
 
+    #compare the installed ports with the ports that the exact capacity description requires for the same charging processes
+    #a cell requires the smallest configuration that covers its peak load, i.e. the largest load of its exact capacity sets
+    #return dict with (installed ports, exactly required ports) per speed
+    def logCapacityApproximation(self):
+        ports = {"f":self._fastChargingPorts,"s":self._slowChargingPorts}
+        peaks = {speed:{cell:0 for cell in self._rc} for speed in self._csSpeeds}
+        for cell,speed,load in self.exactCapacityLoads():
+            peaks[speed][cell] = max(peaks[speed][cell],load)
+        comparison = {}
+        for speed in self._csSpeeds:
+            installed = round(sum(ports[speed].values()))
+            exact = sum(self.coveringConfiguration(cell,speed,peak) for cell,peak in peaks[speed].items())
+            comparison[speed] = (installed,exact)
+            _LOGGER.info(f"bucketed capacity ({self._i_capBucket}s): {installed} {speed} ports installed, {exact} in the smallest configurations covering the peak loads of the exact capacity sets ({installed-exact} due to approximation)")
+        return comparison
+
+    #return the number of ports of the smallest configuration of a speed at a cell that covers the load (0 without load, the largest configuration if none covers it)
+    def coveringConfiguration(self,cell,speed,load):
+        if load < 1e-6:
+            return 0
+        configs = sorted(self._rcc[cell][speed])
+        return next((config for config in configs if config >= load-1e-6),configs[-1])
+
+    #return (cell,speed,load) for every exact capacity set, where load is the number of its charging processes in the current solution
+    def exactCapacityLoads(self):
+        if self._b_compact:
+            b = self._builder
+            yVals = self._mvars.X[b._yOffset:b._zOffset]
+            for cellIndex,(cols,times) in b.groupArrivals():
+                for time,S in maximalOverlapSets(list(zip(times[:,0],times[:,1],cols))):
+                    for speed in self._csSpeeds:
+                        yield b._cells[cellIndex], speed, yVals[np.array(S,dtype=np.int64)+SPEED_CODES[speed]].sum()
+            return
+        for prefix,agentKeys in self.capacityGroups():
+            for cell,arrivals in arrivalsPerCell(self._ear,self._rcpb,agentKeys).items():
+                for time,S in maximalChargingSets(arrivals):
+                    for speed in self._csSpeeds:
+                        yield cell, speed, sum(self._y[key,index,cell[0],cell[1],speed].x for key,index in S)
+
+    #distribute the solution among the members of every agent class (see aggregationUtils.disaggregateSolution)
+    #return set of satisfied agents and dict with value per charging process (agent,index,cx,cy,speed) of the individual agents
+    def disaggregateSolution(self,members):
+        satisfied = {key:(self._z[key] if not isinstance(self._z[key],Var) else self._z[key].x) for key in members}
+        patterns = {key:self.chosenPatterns(key) for key in members}
+        return disaggregateSolution(self._ear,members,satisfied,self.chargingProcessValues(1e-6),patterns,self._b_fractionalAssignment)
+
+    #return the valid patterns of an agent (class) repeated by the values of their pattern variables (empty without pattern variables)
+    #every pattern can be taken by one member, as the charging processes of the class cover all of them (see addRequirementConstraintInner)
+    def chosenPatterns(self,key):
+        if not self._w.get(key):
+            return []
+        numStops = self._ear[key].valid_patterns.shape[1]
+        return [decodePattern(code,numStops) for code,var in self._w[key].items() for _ in range(int(round(var.x)))]
+
+    #measure the python-side memory of every component of the model bookkeeping (without the shared model input)
+    #return dict with size in bytes per component
+    def memoryReport(self):
+        seen = {id(obj) for obj in [self._ear,self._rc,self._rcpb,self._rb]}
+        components = ["possibleChargingStations","speedConfigs","x","possibleChargingProcesses","y","z","w","u","ports","acm","rcc","mvars","builder","lazyCapacity"]
+        report = {name:deepSizeOf(getattr(self,"_"+name),seen) for name in components if getattr(self,"_"+name,None) is not None}
+        _LOGGER.info("python-side memory: "+", ".join(f"{name} {formatBytes(size)}" for name,size in report.items())+f" (total {formatBytes(sum(report.values()))})")
+        return report
+
     def saveSolutionToFile(self,filename):
-        file = open(filename,"w")
-        dw = csv.DictWriter(file, ["cx", "cy", "fast", "slow", "wkt"])
-        dw.writeheader()
-        for loc,amount in self._fastChargingPorts.items():
-            if amount > 0:
-                dw.writerow({
-                    "cx":loc[0],
-                    "cy":loc[1],
-                    "fast":int(amount),
-                    "slow":0,
-                    "wkt":f"POINT ({self._minX + (loc[0]+0.5)*100} {self._minY + (loc[1]+0.5)*100})"
-                    })
-        for loc,amount in self._slowChargingPorts.items():
-            if amount > 0:
-                dw.writerow({
-                    "cx":loc[0],
-                    "cy":loc[1],
-                    "fast":0,
-                    "slow":int(amount),
-                    "wkt":f"POINT ({self._minX + (loc[0]+0.5)*100} {self._minY + (loc[1]+0.5)*100})"
-                    })
-
-        file.close()
+        saveChargingStations(filename,self._fastChargingPorts,self._slowChargingPorts)
 
     
+#robust model over several seeds (sampled days), which maximizes the number of satisfied agents of the worst seed
+#if weights per seed are given (e.g. representatives of scenarioUtils.reduceScenarios), the weighted number of satisfied agents is maximized instead
 class csMultiModel(csBaseModel):
-    def __init__(self,ear,rc,rcpb,rb,seeds,akps,**kwargs):
+    def __init__(self,ear,rc,rcpb,rb,seeds,akps,weights=None,**kwargs):
         self._seeds = seeds
         self._akps = akps
+        self._weights = weights
         csBaseModel.__init__(self,ear,rc,rcpb,rb,**kwargs)
         if self._b_limit or self._b_budget:
             self._s = self.addVar(vtype="I")
 
-    def addCapacityConstraints(self):
-        for seed in self._seeds:
-            for cell in self._rc:
-                arrivalAtRefPoint = [opp for key in self._akps[seed] for opp in self._ear[key].charging_opps if cell in self._rcpb[opp["loc"]]]
-                for time in [opp["time"][0] for opp in arrivalAtRefPoint]:
-                    relevantChargingProcesses = [[opp["agent"],opp["index"],cell] for opp in arrivalAtRefPoint if intervalContainsPoint(opp["time"],time)]
-                    for speed in ["f","s"]:
-                        self.addLConstr(quicksum(self._y[index[0],index[1],index[2][0],index[2][1],speed] for index in relevantChargingProcesses) <= self._x.prod(self._speedConfigs,cell[0],cell[1],"*",speed),name=f"capacity_{seed}_{cell}_{time}_{speed}")
+    def capacityGroups(self,seeds=None):
+        return [(f"{seed}_",self._akps[seed]) for seed in (self._seeds if seeds is None else seeds)]
 
     def addStandardConstraints(self):
         super().addStandardConstraints()
@@ -356,32 +919,62 @@ class csMultiModel(csBaseModel):
             self.addSatisfactionConstraints()
             _LOGGER.info("Satisfaction constraints added")
 
-    def addSatisfactionConstraints(self):
-        for seed in self._seeds:
-            self.addLConstr(self._s<=quicksum(self._z[key] for key in self._akps[seed]),name=f"satisfaction_{seed}")
+    def addSatisfactionConstraints(self,seeds=None):
+        for seed in (self._seeds if seeds is None else seeds):
+            self.addLConstr(self._s<=quicksum(self._z[key] for key in self._akps[seed]),name=self.constrName("satisfaction_{}",seed))
+
+    #add the agents of further seeds to the built model, only their variables, requirement, cp per stop, capacity and satisfaction constraints are created
+    #ear contains the agents of the new seeds with patterns calculated for the relevant breakpoints of the model, akps are their agent keys per seed and weights their weights (only if the model is weighted)
+    #the agents may only charge at the candidate cells of the model, which was possibly reduced for the previous seeds only
+    #the current solution is kept as start of the next optimization, gurobi completes the values of the new variables
+    def addSeeds(self,ear,seeds,akps,weights=None):
+        if self._b_matrix or self._b_lazyCapacity:
+            raise ValueError("Seeds can only be added to the standard model build without lazy capacity constraints.")
+        if bool(weights) != bool(self._weights):
+            raise ValueError("Weights must be given for the new seeds if and only if the model is weighted.")
+        seeds = [seed for seed in seeds if seed not in self._akps]
+        self.update()
+        variables = self.getVars()
+        values = self.getAttr("X",variables) if self.SolCount else None
+
+        #model input
+        self._ear = {**self._ear,**{key:ear[key] for seed in seeds for key in akps[seed]}}
+        self._agents = self._ear.keys()
+        keys = [key for seed in seeds for key in akps[seed]]
+        self._rcpb = {**{opp["loc"]:[] for key in keys for opp in ear[key].charging_opps},**self._rcpb}
+        self._acm.update({key:1 for key in keys})
+        self._numAgents = sum(self._acm.values())
+        self._seeds = list(self._seeds)+seeds
+        self._akps = {**self._akps,**{seed:akps[seed] for seed in seeds}}
+        if weights:
+            self._weights = {**self._weights,**{seed:weights[seed] for seed in seeds}}
+
+        self.addAgentVariables(keys)
+        self.update()
+        self.addRequirementConstraints(keys)
+        self.addCPPerStopConstraints(keys)
+        self.addCapacityDescription(self.capacityGroups(seeds))
+        if self._b_limit or self._b_budget:
+            self.addSatisfactionConstraints(seeds)
+        if "proportion" in self._parameterConstrs:
+            for key in keys:
+                self.chgCoeff(self._parameterConstrs["proportion"][0],self._z[key],1.0)
+            self._parameterConstrs["proportion"][0].RHS = self._f_proportion*self._numAgents
+        if self._weights:
+            self.addCSObjective()
+        self.update()
+        _LOGGER.info(f"{len(seeds)} seeds with {len(keys)} agents added, model has {len(self._seeds)} seeds")
+
+        if values is not None:
+            self.setAttr("Start",variables,values)
+            if self._b_limit or self._b_budget:
+                #the worst seed may have changed
+                self._s.Start = GRB.UNDEFINED
 
     def addCSObjective(self):
         if not (self._b_limit or self._b_budget):
-            self.setObjective(self._x.prod(self._possibleChargingStations,"*","*","*"),GRB.MINIMIZE)
+            self.setObjective(self.costExpression(),GRB.MINIMIZE)
+        elif self._weights:
+            self.setObjective(quicksum(self._weights[seed]*self._z[key] for seed in self._seeds for key in self._akps[seed]),GRB.MAXIMIZE)
         else:
             self.setObjective(self._s,GRB.MAXIMIZE)
-
-    def addStrengthenedCapacityDescription(self):
-        for seed in self._seeds:
-            for cell in self._rc:
-                subsets = []
-                arrivalAtRefPoint = [opp for key in self._akps[seed] for opp in self._ear[key].charging_opps if cell in self._rcpb[opp["loc"]]]
-                for time in [opp["time"][0] for opp in arrivalAtRefPoint]:
-                    relevantChargingProcesses = [(opp["agent"],opp["index"],cell) for opp in arrivalAtRefPoint if intervalContainsPoint(opp["time"],time)]
-                    for i in range(1,min(self._i_capMaxCard+1,len(relevantChargingProcesses))):
-                        for S in combinations(relevantChargingProcesses,i):
-                            if not set(S) in subsets:
-                                subsets.append(set(S))
-                    if not set(relevantChargingProcesses) in subsets:
-                        subsets.append(set(relevantChargingProcesses))
-                for S in subsets:
-                    coeffs = {k:min(v,len(S)) for k,v in self._speedConfigs.items()}
-                    for speed in ["f","s"]:
-                        self.addLConstr(quicksum(self._y[index[0],index[1],index[2][0],index[2][1],speed] for index in S) <= self._x.prod(coeffs,cell[0],cell[1],"*",speed),name=f"capacity_{cell}_{time}_{speed}")
-
-        return
\ No newline at end of file
@@ -0,0 +1,148 @@
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import freeze_support, Pipe, Pool, Process
+import logging
+import os
+import queue
+import time
+from types import SimpleNamespace
+
+from .capacityUtils import arrivalsPerCell, capacityChargingSets
+from .modelUtils import addOuterRequirementConstraints, csBaseModel
+from .polytopeUtils import calculatePatternInequalities
+
+_LOGGER = logging.getLogger(__name__)
+LOG_LEVEL = logging.DEBUG
+_LOGGER.setLevel(LOG_LEVEL)
+
+#calculate the valid patterns of agents (key,agent) in a worker process
+#return list of (key, valid patterns) and the computation time
+def patternWorker(agents,rb):
+    t_start = time.time()
+    for _,agent in agents:
+        agent.calculatePatterns(rb)
+    return [(key,agent.valid_patterns) for key,agent in agents], time.time()-t_start
+
+#calculate the capacity sets of all cells from the charging opportunities per agent in a worker process, the sets do not depend on the patterns
+#return list of (cell, time, number, set of charging processes (agent,index)) and the computation time
+def capacityWorker(opps,rcpb,bucket,strengthened,maxCard):
+    t_start = time.time()
+    ear = {key:SimpleNamespace(charging_opps=agentOpps) for key,agentOpps in opps.items()}
+    sets = [(cell,setTime,number,S) for cell,arrivals in arrivalsPerCell(ear,rcpb).items() for number,(setTime,S) in enumerate(capacityChargingSets(arrivals,bucket,strengthened,maxCard))]
+    return sets, time.time()-t_start
+
+#send the outer description of the charging demand of an agent through the connection
+def facetProcess(patterns,conn):
+    conn.send(calculatePatternInequalities(patterns))
+    conn.close()
+
+#calculate the outer description of the charging demand of an agent in a separate process, which is terminated after the timeout
+#return equation indices, inequalities and the computation time or None if the calculation timed out
+def facetTask(patterns,timeout):
+    t_start = time.time()
+    receiver, sender = Pipe(duplex=False)
+    p = Process(target=facetProcess,args=(patterns,sender))
+    p.start()
+    sender.close()
+    if not receiver.poll(timeout):
+        p.terminate()
+        p.join()
+        return None
+    eq_indices, ineqs = receiver.recv()
+    p.join()
+    return eq_indices, ineqs, time.time()-t_start
+
+#create the model of an instance while its patterns, outer descriptions and capacity sets are computed
+#patterns are computed in chunks of agents and the capacity sets in a pool of worker processes, the outer description of an agent is computed in its own process (started by a pool of polytope threads) as soon as its patterns are known
+#the model is assembled in the calling thread from the results in the order in which they arrive: the variables and cp per stop constraints of an agent with its patterns, its requirement constraints with its outer description (or the inner description after the polytope timeout) and the capacity constraints once all agents are known
+#agents that cannot be satisfied (see interface.removeUnsatisfiableAgents) are removed from ear, the instance cannot be reduced as the reduction needs all patterns
+#kwargs are passed to csBaseModel, which is returned with the standard constraints (without objective)
+def pipelinedModel(ear,rc,rcpb,rb,rcc=None,processes=4,chunkSize=16,**kwargs):
+    t_start = time.time()
+    m = csBaseModel({},rc,rcpb,rb,rcc,**kwargs)
+    if m._b_matrix or m._b_lazyCapacity:
+        raise ValueError("The pipelined model build is only available for the standard model build without lazy capacity constraints.")
+    if os.name == 'nt':
+        freeze_support()
+
+    events = queue.Queue()
+    def put(kind,key=None):
+        return lambda result:events.put((kind,key,result))
+    def fail(error):
+        events.put(("error",None,error))
+    def putFacets(key):
+        return lambda future:events.put(("facets",key,future.result()) if future.exception() is None else ("error",key,future.exception()))
+
+    stageTimes = {"patterns":0.0,"facets":0.0,"capacity":0.0,"assembly":0.0}
+    keys = list(ear)
+    removed = set()
+    numFallbacks = 0
+    patternPool = Pool(processes)
+    facetThreads = ThreadPoolExecutor(m._i_polytopeThreads)
+    try:
+        patternPool.apply_async(capacityWorker,({key:agent.charging_opps for key,agent in ear.items()},rcpb,m._i_capBucket,m._b_cap,m._i_capMaxCard),callback=put("capacity"),error_callback=fail)
+        for start in range(0,len(keys),chunkSize):
+            patternPool.apply_async(patternWorker,([(key,ear[key]) for key in keys[start:start+chunkSize]],rb),callback=put("patterns"),error_callback=fail)
+        numPending = 1+(len(keys)+chunkSize-1)//chunkSize
+        capacitySets = None
+        while numPending:
+            kind, key, result = events.get()
+            t_assembly = time.time()
+            numPending -= 1
+            if kind == "error":
+                raise result
+            elif kind == "capacity":
+                capacitySets, stageTimes["capacity"] = result
+            elif kind == "patterns":
+                patterns, t_patterns = result
+                stageTimes["patterns"] += t_patterns
+                for key,valid_patterns in patterns:
+                    agent = ear[key]
+                    agent.valid_patterns = valid_patterns
+                    if not len(valid_patterns) and len([opp for opp in agent.charging_opps if opp["loc"] in rb])<4:
+                        removed.add(key)
+                        continue
+                    m._ear[key] = agent
+                    m._acm[key] = 1
+                    m._numAgents += 1
+                    m.addAgentVariables([key])
+                    m.update()
+                    m.addCPPerStopConstraints([key])
+                    if m._b_outer and len(valid_patterns):
+                        facetThreads.submit(facetTask,valid_patterns,m._i_polytopeTimeout).add_done_callback(putFacets(key))
+                        numPending += 1
+                    else:
+                        m.addRequirementConstraintInner(agent)
+            elif result is not None:
+                eq_indices, ineqs, t_facets = result
+                stageTimes["facets"] += t_facets
+                addOuterRequirementConstraints(m,key,eq_indices,ineqs)
+            else:
+                #polytope timeout: inner description instead
+                numFallbacks += 1
+                stageTimes["facets"] += m._i_polytopeTimeout
+                m._w[key] = m.addPatternVariables(key)
+                m.update()
+                m.addRequirementConstraintInner(m._ear[key])
+            stageTimes["assembly"] += time.time()-t_assembly
+    finally:
+        patternPool.terminate()
+        facetThreads.shutdown()
+
+    t_assembly = time.time()
+    for key in removed:
+        del ear[key]
+    if removed:
+        _LOGGER.warning(f"removing {len(removed)} agents with less than 4 charging opportunities that have no valid schedule!")
+    for cell,setTime,number,S in capacitySets:
+        S = [(key,index) for key,index in S if key not in removed]
+        if S:
+            for speed in m._csSpeeds:
+                m.addCapacityConstraint(S,cell,speed,m.cardinality(S) if m._b_cap else None,("capacity_{}_{}_{}_{}",cell,setTime,number,speed))
+    m.addMaxCSConstraints()
+    m.addParameterConstraints()
+    m.update()
+    stageTimes["assembly"] += time.time()-t_assembly
+    _LOGGER.info(f"model ready after {time.time()-t_start:.2f}s, sequential stage times: "+", ".join(f"{stage} {t:.2f}s" for stage,t in stageTimes.items())+f" (total {sum(stageTimes.values()):.2f}s)")
+    if numFallbacks:
+        _LOGGER.info(f"inner description used for {numFallbacks} agents after polytope timeout")
+    return m
@@ -0,0 +1,37 @@
+import cdd
+from itertools import chain, combinations
+
+from .ineqUtils import roundInequality
+
+#create the vertices of the charging demand polytope of an agent from its valid patterns
+#every stop is represented by two coordinates (any charging, fast charging)
+def feasibleVertices(valid_patterns):
+    feas_vertices=[]
+    for vp in valid_patterns.tolist():
+        indices = [i for i, x in enumerate(vp) if x == 1]
+        ind_powerset = chain.from_iterable(combinations(indices, r) for r in range(len(indices)+1))
+        variants = []
+        for combination in ind_powerset:
+            vp_new = list(vp[:])
+            for index in combination:
+                vp_new[index] = 2
+            variants.append(vp_new)
+        for v in variants:
+            feas_vertices.append([1 if (i==1 and j==0) or (i==2 and j==1) else 0 for i in v for j in range(2)])
+    return feas_vertices
+
+#calculate the (integral) inequality description of the convex hull of the given vertices
+#return indices of the equations and list of all inequalities
+def calculateInequalities(feas_vertices):
+    mat = cdd.Matrix([[1]+fv for fv in feas_vertices])
+    pol = cdd.Polyhedron(mat)
+
+    res = pol.get_inequalities()
+
+    ineqs = [roundInequality(res[i],20,0.0001) for i in range(res.row_size)]
+
+    return list(res.lin_set), ineqs
+
+#calculate the inequality description of the charging demand polytope of an agent
+def calculatePatternInequalities(valid_patterns):
+    return calculateInequalities(feasibleVertices(valid_patterns))
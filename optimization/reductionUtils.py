@@ -0,0 +1,97 @@
+import copy
+import logging
+
+from .const import (
+    CAPACITY_CUTS,
+    CONF_FAST,
+    CONF_SLOW
+)
+from .capacityUtils import arrivalsPerCell, bucketedChargingSets, capacityChargingSets, maximalChargingSets
+
+_LOGGER = logging.getLogger(__name__)
+LOG_LEVEL = logging.DEBUG
+_LOGGER.setLevel(LOG_LEVEL)
+
+#check whether an agent can be satisfied if every charging station is built
+#agents without valid pattern need four charging processes at relevant breakpoints, two of them fast
+def isSatisfiable(agent,rcpb,rb):
+    if len(agent.valid_patterns):
+        return True
+    relevantOpps = [opp for opp in agent.charging_opps if opp["loc"] in rb and rcpb.get(opp["loc"])]
+    return len(relevantOpps)>=4 and len([opp for opp in relevantOpps if rb[opp["loc"]]=="f"])>=2
+
+#return the charging opportunities of an agent that are used by at least one valid pattern
+#charging processes at all other stops can never help to satisfy the agent and only occupy ports
+def usedChargingOpps(agent):
+    if not len(agent.valid_patterns):
+        return agent.charging_opps
+    used = agent.valid_patterns.any(axis=0)
+    return [opp for opp in agent.charging_opps if used[opp["index"]]]
+
+#return the configurations per cell and speed up to the smallest one that covers the peak number of simultaneous arrivals
+#larger configurations are never needed, as the covering configuration is cheaper and already admits every assignment
+def reducedConfigurations(ear,rc,rcpb,groups=[None],bucket=0):
+    configs = {"f":sorted(CONF_FAST), "s":sorted(CONF_SLOW)}
+    peaks = {cell:0 for cell in rc}
+    for agentKeys in groups:
+        for cell,arrivals in arrivalsPerCell(ear,rcpb,agentKeys).items():
+            sets = bucketedChargingSets(arrivals,bucket) if bucket else maximalChargingSets(arrivals)
+            peaks[cell] = max([peaks[cell]]+[len(S) for _,S in sets])
+    rcc = {}
+    for cell,peak in peaks.items():
+        rcc[cell] = {}
+        for speed,speedConfigs in configs.items():
+            covering = [config for config in speedConfigs if config>=peak]
+            rcc[cell][speed] = [config for config in speedConfigs if not covering or config<=covering[0]]
+    return rcc
+
+#count the sets of simultaneous charging processes of the capacity description (see capacityUtils.capacityChargingSets), i.e., the capacity constraints per speed
+def numCapacitySets(ear,rcpb,groups=[None],bucket=0,strengthened=CAPACITY_CUTS,maxCard=1):
+    return sum(sum(1 for _ in capacityChargingSets(arrivals,bucket,strengthened,maxCard)) for agentKeys in groups for arrivals in arrivalsPerCell(ear,rcpb,agentKeys).values())
+
+#return a copy of an agent with the given charging opportunities, the rest of the agent is shared with the original
+def reducedAgent(agent,charging_opps):
+    agent = copy.copy(agent)
+    agent.charging_opps = charging_opps
+    return agent
+
+#remove agents, charging processes, cells and charging station configurations that cannot be part of an optimal solution
+#the agents of ear are not changed, the remaining agents are returned as copies without the unused charging opportunities
+#groups are the sets of agents sharing the charging stations (see csBaseModel.capacityGroups), bucket, strengthened and maxCard describe the capacity constraints of the model (see capacityUtils.capacityChargingSets)
+#return reduced agents, cells, cells per breakpoint, relevant breakpoints, configurations per cell and dict with numbers of removed variables and rows
+def reduceInstance(ear,rc,rcpb,rb,groups=[None],bucket=0,strengthened=CAPACITY_CUTS,maxCard=1):
+    before = instanceSize(ear,rc,rcpb,rb,groups,bucket=bucket,strengthened=strengthened,maxCard=maxCard)
+
+    #unsatisfiable agents and stops that no valid pattern uses
+    ear = {key:reducedAgent(agent,usedChargingOpps(agent)) for key,agent in ear.items() if isSatisfiable(agent,rcpb,rb)}
+    groups = [agentKeys if agentKeys is None else [key for key in agentKeys if key in ear] for agentKeys in groups]
+
+    #breakpoints and cells that are only reachable from removed charging processes
+    locs = {opp["loc"] for agent in ear.values() for opp in agent.charging_opps}
+    usedCells = {cell for loc in locs for cell in rcpb.get(loc,[])}
+    rc = {cell:{bp for bp in bps if bp in locs} for cell,bps in rc.items() if cell in usedCells}
+    rcpb = {bp:[cell for cell in cells if cell in rc] for bp,cells in rcpb.items() if bp in locs}
+    rb = {bp:speed for bp,speed in rb.items() if rcpb.get(bp)}
+
+    #configurations
+    rcc = reducedConfigurations(ear,rc,rcpb,groups,bucket)
+
+    after = instanceSize(ear,rc,rcpb,rb,groups,rcc,bucket,strengthened,maxCard)
+    removed = {name:before[name]-after[name] for name in before}
+    _LOGGER.info(f"instance reduction removed "+", ".join(f"{value} of {before[name]} {name}" for name,value in removed.items()))
+    return ear, rc, rcpb, rb, rcc, removed
+
+#return the number of variables and rows that the instance induces in csBaseModel with the given capacity description
+def instanceSize(ear,rc,rcpb,rb,groups=[None],rcc=None,bucket=0,strengthened=CAPACITY_CUTS,maxCard=1):
+    numConfigs = len(CONF_FAST)+len(CONF_SLOW)
+    opps = [opp for agent in ear.values() for opp in agent.charging_opps]
+    return {
+        "agents":len(ear),
+        "cells":len(rc),
+        "breakpoints":len(rb),
+        "station variables":sum(len(configs) for cell in rc for configs in rcc[cell].values()) if rcc else numConfigs*len(rc),
+        "charging process variables":2*sum(len(rcpb.get(opp["loc"],[])) for opp in opps),
+        "csMax rows":len(rc),
+        "cpPerStop rows":len([opp for opp in opps if opp["loc"] in rb]),
+        "capacity rows":2*numCapacitySets(ear,rcpb,groups,bucket,strengthened,maxCard)
+    }
@@ -0,0 +1,75 @@
+import logging
+import numpy as np
+
+from .const import SEC_PER_DAY
+
+_LOGGER = logging.getLogger(__name__)
+LOG_LEVEL = logging.DEBUG
+_LOGGER.setLevel(LOG_LEVEL)
+
+#return the charging demand of some agents as histograms of arrival times per cell, split by fast and slow eligibility
+#a charging opportunity is fast (slow) eligible if a valid pattern charges fast (at all) at it, agents without valid patterns are eligible at every relevant breakpoint
+#return flat array with the number of eligible arrivals per (cell, speed, time bin)
+def demandSummary(ear,agentKeys,rcpb,rb,cellIndex,binWidth=3600):
+    numBins = -(-SEC_PER_DAY//binWidth)
+    summary = np.zeros((len(cellIndex),2,numBins))
+    for key in agentKeys:
+        agent = ear[key]
+        fastStops = (agent.valid_patterns==2).any(axis=0)
+        slowStops = agent.valid_patterns.any(axis=0)
+        for opp in agent.charging_opps:
+            if opp["loc"] not in rb:
+                continue
+            if len(agent.valid_patterns):
+                fast = fastStops[opp["index"]]
+                slow = slowStops[opp["index"]]
+            else:
+                fast, slow = rb[opp["loc"]]=="f", True
+            timeBin = (opp["time"][0]%SEC_PER_DAY)//binWidth
+            for cell in rcpb.get(opp["loc"],[]):
+                summary[cellIndex[cell],0,timeBin] += fast
+                summary[cellIndex[cell],1,timeBin] += slow
+    return summary.ravel()
+
+#return the matrix of L1 distances between the summaries
+def summaryDistances(summaries):
+    summaries = np.array(summaries)
+    return np.array([np.abs(summaries-summary).sum(axis=1) for summary in summaries])
+
+#cluster items by k-medoids with farthest-first initialization, starting from the most central item
+#return medoids (indices) and medoid index per item
+def kMedoids(distances,k,maxIterations=100):
+    n = len(distances)
+    k = min(k,n)
+    medoids = [int(np.argmin(distances.sum(axis=1)))]
+    while len(medoids) < k:
+        gaps = distances[:,medoids].min(axis=1)
+        #all remaining items equal a medoid
+        if not gaps.max():
+            break
+        medoids.append(int(np.argmax(gaps)))
+    for iteration in range(maxIterations):
+        labels = np.argmin(distances[:,medoids],axis=1)
+        newMedoids = []
+        for c in range(len(medoids)):
+            members = np.nonzero(labels==c)[0]
+            newMedoids.append(int(members[np.argmin(distances[np.ix_(members,members)].sum(axis=1))]) if len(members) else medoids[c])
+        if newMedoids == medoids:
+            break
+        medoids = newMedoids
+    return medoids, [medoids[label] for label in np.argmin(distances[:,medoids],axis=1)]
+
+#reduce the seeds of a multi model to representative seeds with similar charging demand
+#akps are the agent keys per seed, the demand of every seed is summarized by demandSummary
+#return representative seeds, weight (number of represented seeds) per representative and representative per seed
+def reduceScenarios(ear,akps,rcpb,rb,numRepresentatives,binWidth=3600):
+    seeds = list(akps)
+    cells = sorted({cell for cells in rcpb.values() for cell in cells})
+    cellIndex = {cell:index for index,cell in enumerate(cells)}
+    summaries = [demandSummary(ear,akps[seed],rcpb,rb,cellIndex,binWidth) for seed in seeds]
+    medoids, labels = kMedoids(summaryDistances(summaries),numRepresentatives)
+    representatives = [seeds[medoid] for medoid in medoids]
+    representativePerSeed = {seed:seeds[label] for seed,label in zip(seeds,labels)}
+    weights = {seed:list(representativePerSeed.values()).count(seed) for seed in representatives}
+    _LOGGER.info(f"reduced {len(seeds)} seeds to {len(representatives)} representatives with weights {weights}")
+    return representatives, weights, representativePerSeed
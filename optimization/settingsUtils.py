@@ -0,0 +1,61 @@
+from .const import (
+    BACKEND,
+    B_BUDGET,
+    B_LIMIT,
+    B_PROPORTION,
+    BUDGET,
+    CAPACITY_BUCKET,
+    CAPACITY_CUTS,
+    CHECKPOINT_DIR,
+    COMPACT_MODEL,
+    CONSTRAINT_NAMES,
+    FRACTIONAL_ASSIGNMENT,
+    LAZY_CAPACITY,
+    LIMIT,
+    LOG_FILE,
+    MATRIX_BUILD,
+    METHOD,
+    MIPGAP,
+    MIP_START,
+    OUTER_DESCRIPTION,
+    POLYTOPE_THREADS,
+    PORT_COUNT,
+    POLYTOPE_TIMEOUT,
+    PREPROCESSING_BUDGET,
+    PRESOLVE,
+    PROPORTION,
+    TIMELIMIT
+)
+
+#return the model settings, where every setting not given in kwargs is set to its default
+def modelSettings(**kwargs):
+    prop_defaults = {
+        "b_outer": OUTER_DESCRIPTION, 
+        "b_cap": CAPACITY_CUTS,
+        "i_capMaxCard": 1,
+        "i_capBucket": CAPACITY_BUCKET,
+        "b_lazyCapacity": LAZY_CAPACITY,
+        "b_budget": B_BUDGET,
+        "i_budget": BUDGET,
+        "b_limit": B_LIMIT,
+        "t_limit": LIMIT,
+        "b_proportion": B_PROPORTION,
+        "f_proportion": PROPORTION,
+        "b_fractionalAssignment": FRACTIONAL_ASSIGNMENT,
+        "b_portCount": PORT_COUNT,
+        "b_matrix": MATRIX_BUILD,
+        "b_compact": COMPACT_MODEL,
+        "b_names": CONSTRAINT_NAMES,
+        "i_method":METHOD, 
+        "f_mipgap": MIPGAP,
+        "i_timelimit": TIMELIMIT,
+        "b_presolve": PRESOLVE,
+        "i_polytopeThreads":POLYTOPE_THREADS,
+        "i_polytopeTimeout":POLYTOPE_TIMEOUT,
+        "f_preprocessingBudget":PREPROCESSING_BUDGET,
+        "s_logFile": LOG_FILE,
+        "s_backend": BACKEND,
+        "s_start": MIP_START,
+        "s_checkpoint": CHECKPOINT_DIR
+    }
+    return {prop:kwargs.get(prop, default) for prop, default in prop_defaults.items()}
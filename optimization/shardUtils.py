@@ -0,0 +1,293 @@
+from concurrent.futures import ProcessPoolExecutor
+import csv
+import logging
+from multiprocessing import freeze_support
+import numpy as np
+import os
+import pickle
+import scipy.sparse as sp
+import time
+
+from gurobipy import GRB, Model
+
+from .agentUtils import Agent, read_schedules, sampleAgents
+from .capacityUtils import bucketedOverlapSets, maximalOverlapSets, strengthenedOverlapSets
+from .matrixUtils import calculateFacets, csMatrixBuilder, rowBlock
+from .modelUtils import setSolverParameters
+from .settingsUtils import modelSettings
+
+_LOGGER = logging.getLogger(__name__)
+LOG_LEVEL = logging.DEBUG
+_LOGGER.setLevel(LOG_LEVEL)
+
+#number of buffered trips after which the trips are written to the shard files
+BUFFERED_TRIPS = 1<<18
+#number of capacity rows that are added to the model at once
+CAPACITY_CHUNK = 1<<16
+
+#directory of the files of the sharded model build: per shard the sampled agents, their trips, the relevant agents and the spilled constraint blocks
+class csShardStore:
+    def __init__(self,directory):
+        self._directory = directory
+        os.makedirs(directory,exist_ok=True)
+
+    def path(self,stage,shard,extension):
+        return os.path.join(self._directory,f"{stage}_{shard}{extension}")
+
+    def save(self,stage,shard,data):
+        with open(self.path(stage,shard,".pickle"),"wb") as file:
+            pickle.dump(data,file,protocol=pickle.HIGHEST_PROTOCOL)
+
+    def load(self,stage,shard):
+        with open(self.path(stage,shard,".pickle"),"rb") as file:
+            return pickle.load(file)
+
+#read the attributes of all drivers that are needed to sample agents
+#return attributes (wallbox, lowerBound and home) per driver and the drivers from outside, with and without wallbox as agentUtils.read_attributes
+def readSampleAttributes(filename):
+    attributeDict = dict()
+    o_agents, wb_agents, nwb_agents = [], [], []
+    with open(filename,"r") as file:
+        for attributes in csv.DictReader(file):
+            attributeDict[attributes["id"]] = {prop:attributes[prop] for prop in ["wallbox","lowerBound","home"]}
+            if attributes["home"]=="o":
+                o_agents.append(attributes["id"])
+            elif attributes["wallbox"]=="True":
+                wb_agents.append(attributes["id"])
+            else:
+                nwb_agents.append(attributes["id"])
+    return attributeDict, o_agents, wb_agents, nwb_agents
+
+#sample the agents of a day (same agents and start soc as agentUtils.createEAgents) and split them with their trips into shards of at most shardSize agents
+#the trip file is read once and the trips of sampled agents are written to one file per shard
+#return number of shards
+def sampleShards(store,seed,e_quota,trip_file,driver_file,shardSize):
+    t_start = time.time()
+    attributeDict, o_agents, wb_agents, nwb_agents = readSampleAttributes(driver_file)
+    sample = sampleAgents(seed,e_quota,attributeDict,o_agents,wb_agents,nwb_agents)
+    numShards = (len(sample)+shardSize-1)//shardSize
+    shardOf = {}
+    for shard in range(numShards):
+        agents = [(agent,attributeDict[agent]["wallbox"]=="True",soc_start,float(attributeDict[agent]["lowerBound"]),attributeDict[agent]["home"]=="o") for agent,soc_start in sample[shard*shardSize:(shard+1)*shardSize]]
+        store.save("sample",shard,agents)
+        shardOf.update((agent[0],shard) for agent in agents)
+    del attributeDict, o_agents, wb_agents, nwb_agents, sample
+
+    with open(trip_file,"r",newline="") as file:
+        reader = csv.reader(file)
+        header = next(reader)
+        agentColumn = header.index("agent")
+        for shard in range(numShards):
+            with open(store.path("trips",shard,".csv"),"w",newline="") as shardFile:
+                csv.writer(shardFile).writerow(header)
+        buffers = [[] for _ in range(numShards)]
+        numBuffered = 0
+        for row in reader:
+            shard = shardOf.get(row[agentColumn])
+            if shard is None:
+                continue
+            buffers[shard].append(row)
+            numBuffered += 1
+            if numBuffered >= BUFFERED_TRIPS:
+                flushTrips(store,buffers)
+                numBuffered = 0
+        flushTrips(store,buffers)
+    _LOGGER.info(f"{len(shardOf)} agents sampled and split into {numShards} shards in {time.time()-t_start:.2f}s")
+    return numShards
+
+#append the buffered trips to the shard files and empty the buffers
+def flushTrips(store,buffers):
+    for shard,rows in enumerate(buffers):
+        if rows:
+            with open(store.path("trips",shard,".csv"),"a",newline="") as shardFile:
+                csv.writer(shardFile).writerows(rows)
+            rows.clear()
+
+#model input shared by the worker processes of emitShards
+_shardData = {}
+
+def initShardWorker(data):
+    _shardData.update(data)
+
+#create the agents of a shard from its sample and trips and keep the relevant ones
+#return breakpoints of the relevant agents and their number
+def screenShard(args):
+    store, shard = args
+    scheduleDict = read_schedules(store.path("trips",shard,".csv"))
+    agents = {}
+    for agent,wallbox,soc_start,lowerBound,outer in store.load("sample",shard):
+        agents[str(agent)] = Agent(str(agent),scheduleDict[agent],wallbox,soc_start,lowerBound,outer)
+    ear = {key:agent for key,agent in agents.items() if agent.is_relevant()}
+    store.save("agents",shard,ear)
+    return {(float(stop["sx"]),float(stop["sy"])) for agent in ear.values() for stop in agent.schedule}, len(ear)
+
+#calculate patterns and outer descriptions of the relevant agents of a shard and spill their constraint blocks (requirement and cp per stop) to disk
+#the blocks use the column layout of matrixUtils.csMatrixBuilder for the agents of the shard, the fast charging processes per cell are spilled with their time windows for the capacity constraints
+#return number of agents and constraint rows of the shard
+def emitShard(args):
+    store, shard = args
+    rc, rcpb, rb, settings = _shardData["rc"], _shardData["rcpb"], _shardData["rb"], _shardData["settings"]
+    ear = store.load("agents",shard)
+    for agent in ear.values():
+        agent.calculatePatterns(rb)
+    unsat_agents = [key for key,agent in ear.items() if not len(agent.valid_patterns) and len([opp for opp in agent.charging_opps if opp["loc"] in rb])<4]
+    for key in unsat_agents:
+        del ear[key]
+    if unsat_agents:
+        _LOGGER.warning(f"removing {len(unsat_agents)} agents of shard {shard} with less than 4 charging opportunities that have no valid schedule!")
+
+    facets = calculateFacets(ear,settings["i_polytopeThreads"],settings["i_polytopeTimeout"]) if settings["b_outer"] else {}
+    b = csMatrixBuilder(ear,rc,rcpb,rb,facets=facets,**settings)
+    blocks = [b.requirementBlock().toMatrix(b.numVars()),b.cpPerStopBlock().toMatrix(b.numVars())]
+    A = sp.vstack([A for _,A,_,_ in blocks],format="csr")
+    fastCells, fastCols, fastTimes = [], [], []
+    for cellIndex,(cols,times) in b.arrivalsPerCell().items():
+        fastCells.append(np.full(len(cols),cellIndex,dtype=np.int64))
+        fastCols.append(cols)
+        fastTimes.append(times)
+    np.savez(
+        store.path("blocks",shard,".npz"),
+        numY=b._numY,
+        numZ=b._numZ,
+        numW=b._sOffset-b._wOffset,
+        numAgents=len(ear),
+        ub=b._ub[b._yOffset:b._sOffset],
+        vtypes=b._vtypes[b._yOffset:b._sOffset],
+        data=A.data,
+        indices=A.indices,
+        indptr=A.indptr,
+        sense=np.concatenate([sense for _,_,sense,_ in blocks]),
+        rhs=np.concatenate([rhs for _,_,_,rhs in blocks]),
+        fastCells=np.concatenate(fastCells) if fastCells else np.zeros(0,dtype=np.int64),
+        fastCols=np.concatenate(fastCols) if fastCols else np.zeros(0,dtype=np.int64),
+        fastTimes=np.concatenate(fastTimes) if fastTimes else np.zeros((0,2),dtype=np.int64)
+    )
+    return len(ear), A.shape[0]
+
+#run a shard function on all shards in worker processes, so that at most one shard per process is in memory
+#return list of results per shard
+def mapShards(function,store,numShards,processes,data=None):
+    if os.name == 'nt':
+        freeze_support()
+    with ProcessPoolExecutor(processes,initializer=initShardWorker,initargs=(data or {},)) as executor:
+        return list(executor.map(function,[(store,shard) for shard in range(numShards)]))
+
+#assemble the model from the spilled blocks of all shards, the column layout is x (charging stations), y, z and w of the first shard, y, z and w of the second shard and so on
+#capacity constraints are created per cell from the spilled fast charging processes of all shards, the other constraints are read shard by shard
+#the instance is neither reduced nor aggregated and there is a single group of agents sharing the charging stations
+#return gurobi model with the variables (_mvars) and the layout of the charging stations (_builder, see matrixUtils.csMatrixBuilder)
+def shardedModel(store,numShards,rc,rcpb,rb,**kwargs):
+    t_start = time.time()
+    settings = modelSettings(**kwargs)
+    if settings["b_lazyCapacity"] or settings["b_portCount"]:
+        raise ValueError("The sharded model build is only available for the configuration formulation without lazy capacity constraints.")
+    b = csMatrixBuilder({},rc,rcpb,rb,facets={},**settings)
+    numX = b._numX
+
+    #global offsets of the y, z and w columns of every shard
+    sizes = np.zeros((numShards,3),dtype=np.int64)
+    numAgents = 0
+    for shard in range(numShards):
+        with np.load(store.path("blocks",shard,".npz")) as data:
+            sizes[shard] = [data["numY"],data["numZ"],data["numW"]]
+            numAgents += int(data["numAgents"])
+    totals = sizes.sum(axis=0)
+    segmentStarts = numX+np.concatenate([[0],np.cumsum(totals)[:-1]])
+    offsets = segmentStarts+np.cumsum(sizes,axis=0)-sizes
+    numVars = numX+totals.sum()
+
+    ub = np.empty(numVars)
+    vtypes = np.empty(numVars,dtype="<U1")
+    ub[:numX], vtypes[:numX] = b._ub[:numX], b._vtypes[:numX]
+    for shard in range(numShards):
+        with np.load(store.path("blocks",shard,".npz")) as data:
+            localStarts = np.concatenate([[0],np.cumsum(sizes[shard])[:-1]])
+            for segment in range(3):
+                local = slice(localStarts[segment],localStarts[segment]+sizes[shard,segment])
+                ub[offsets[shard,segment]:offsets[shard,segment]+sizes[shard,segment]] = data["ub"][local]
+                vtypes[offsets[shard,segment]:offsets[shard,segment]+sizes[shard,segment]] = data["vtypes"][local]
+
+    m = Model()
+    setSolverParameters(m,settings)
+    m._mvars = m.addMVar(numVars,ub=ub,vtype=vtypes)
+    m._builder = b
+    m._numAgents = numAgents
+    del ub, vtypes
+    _LOGGER.info(f"{numVars} variables of {numAgents} agents in {numShards} shards added")
+
+    #requirement and cp per stop constraints with local columns mapped to the global layout
+    numRows = 0
+    fastCells, fastCols, fastTimes = [], [], []
+    for shard in range(numShards):
+        with np.load(store.path("blocks",shard,".npz")) as data:
+            bounds = numX+np.cumsum(sizes[shard])[:-1]
+            shifts = np.concatenate([[0],offsets[shard]-numX-np.concatenate([[0],np.cumsum(sizes[shard])[:-1]])])
+            indices = data["indices"].astype(np.int64)
+            indices += shifts[np.searchsorted(np.concatenate([[numX],bounds]),indices,side="right")]
+            A = sp.csr_matrix((data["data"],indices,data["indptr"]),shape=(len(data["indptr"])-1,numVars))
+            if A.shape[0]:
+                m.addMConstr(A,m._mvars,data["sense"],data["rhs"])
+            numRows += A.shape[0]
+            fastCells.append(data["fastCells"])
+            fastCols.append(data["fastCols"]+offsets[shard,0]-numX)
+            fastTimes.append(data["fastTimes"])
+    _LOGGER.info(f"{numRows} requirement and cp per stop constraints added")
+
+    #capacity constraints per cell over the charging processes of all shards
+    fastCells, fastCols, fastTimes = np.concatenate(fastCells), np.concatenate(fastCols), np.concatenate(fastTimes).reshape(-1,2)
+    order = np.argsort(fastCells,kind="stable")
+    fastCells, fastCols, fastTimes = fastCells[order], fastCols[order], fastTimes[order]
+    bounds = np.searchsorted(fastCells,np.arange(len(b._cells)+1))
+    block = rowBlock("capacity")
+    numRows = 0
+    for cellIndex in range(len(b._cells)):
+        cols, times = fastCols[bounds[cellIndex]:bounds[cellIndex+1]], fastTimes[bounds[cellIndex]:bounds[cellIndex+1]]
+        if not len(cols):
+            continue
+        intervals = list(zip(times[:,0],times[:,1],cols))
+        if settings["i_capBucket"]:
+            for _,S in bucketedOverlapSets(intervals,settings["i_capBucket"]):
+                b.addCapacityRows(block,cellIndex,np.array(S,dtype=np.int64),card=len(S) if settings["b_cap"] else None)
+        elif not settings["b_cap"]:
+            for _,S in maximalOverlapSets(intervals):
+                b.addCapacityRows(block,cellIndex,np.array(S,dtype=np.int64))
+        else:
+            for _,S in strengthenedOverlapSets(intervals,settings["i_capMaxCard"]):
+                b.addCapacityRows(block,cellIndex,np.array(S,dtype=np.int64),card=len(S))
+        if block._numRows >= CAPACITY_CHUNK:
+            numRows += addRowBlock(m,block,numVars)
+            block = rowBlock("capacity")
+    numRows += addRowBlock(m,block,numVars)
+    del fastCells, fastCols, fastTimes
+    _LOGGER.info(f"{numRows} capacity constraints added")
+
+    #charging station constraints, the proportion constraint is the only one with z columns
+    blocks = [b.maxCSBlock()]
+    if settings["b_budget"]:
+        blocks.append(b.budgetBlock())
+    elif settings["b_limit"]:
+        blocks.append(b.limitBlock())
+    for block in blocks:
+        addRowBlock(m,block,numVars)
+    zCols = np.arange(segmentStarts[1],segmentStarts[1]+totals[1])
+    if settings["b_proportion"]:
+        m.addMConstr(sp.csr_matrix((np.ones(len(zCols)),(np.zeros(len(zCols),dtype=np.int64),zCols)),shape=(1,numVars)),m._mvars,">",[settings["f_proportion"]*numAgents])
+
+    c = np.zeros(numVars)
+    if not (settings["b_limit"] or settings["b_budget"]):
+        c[:numX] = b._xCost
+        m.setMObjective(None,c,0.0,xc=m._mvars,sense=GRB.MINIMIZE)
+    else:
+        c[zCols] = 1
+        m.setMObjective(None,c,0.0,xc=m._mvars,sense=GRB.MAXIMIZE)
+    m.update()
+    _LOGGER.info(f"sharded model assembled in {time.time()-t_start:.2f}s")
+    return m
+
+#add the rows of a block to the model with columns of the global layout
+#return number of added rows
+def addRowBlock(m,block,numVars):
+    _,A,sense,rhs = block.toMatrix(numVars)
+    if A.shape[0]:
+        m.addMConstr(A,m._mvars,sense,rhs)
+    return A.shape[0]
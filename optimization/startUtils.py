@@ -0,0 +1,98 @@
+import logging
+
+from .capacityUtils import maximalOverlapSets
+
+_LOGGER = logging.getLogger(__name__)
+LOG_LEVEL = logging.DEBUG
+_LOGGER.setLevel(LOG_LEVEL)
+
+#return the maximum number of simultaneously present closed intervals (start,end)
+def peakOverlap(intervals):
+    return max([len(S) for _,S in maximalOverlapSets([(start,end,index) for index,(start,end) in enumerate(intervals)])],default=0)
+
+#return the smallest configuration that offers at least the given number of ports or None if there is none
+def coveringConfiguration(configs,ports):
+    covering = [config for config in configs if config>=ports]
+    return min(covering) if covering else None
+
+#return the charging stations (ports per (cell,speed)) obtained by rounding the given (possibly fractional) port numbers up to the next configuration
+#every cell keeps only the speed with more ports, as a cell can hold only one charging station, and cells without configurations are dropped
+def roundedStations(stations,rcc):
+    rounded = {}
+    for cell in rcc:
+        speed, ports = max([(speed,stations.get((cell,speed),0)) for speed in ["f","s"]],key=lambda sp:sp[1])
+        if ports > 1e-6:
+            config = coveringConfiguration(rcc[cell][speed],ports-1e-6)
+            rounded[cell,speed] = config if config is not None else max(rcc[cell][speed])
+    return rounded
+
+#plan the charging processes of a valid pattern given the stations placed so far
+#every charging stop is assigned to the reachable cell with the smallest additional cost (slow charging for 1, fast charging for 2)
+#return additional cost, assignments (index,cell,speed) and new number of ports per (cell,speed) or None if the pattern cannot be realized
+def planPattern(vp,opps,rcpb,rcc,costs,intervals,stations):
+    addedCost = 0
+    assignments = []
+    newIntervals = {}
+    newStations = {}
+    for index,mode in enumerate(vp):
+        if not mode:
+            continue
+        if index not in opps:
+            return None
+        speed = "f" if mode==2 else "s"
+        best = None
+        for cell in rcpb[opps[index]["loc"]]:
+            if any((cell,other) in stations or (cell,other) in newStations for other in ["f","s"] if other!=speed):
+                continue
+            cellIntervals = intervals.get((cell,speed),[])+newIntervals.get((cell,speed),[])+[opps[index]["time"]]
+            config = coveringConfiguration(rcc[cell][speed],peakOverlap(cellIntervals))
+            if config is None:
+                continue
+            current = newStations.get((cell,speed),stations.get((cell,speed),0))
+            cost = (max(config,current)-current)*costs[speed]
+            if best is None or cost < best[0]:
+                best = (cost,cell,max(config,current))
+        if best is None:
+            return None
+        cost, cell, config = best
+        addedCost += cost
+        assignments.append((index,cell,speed))
+        newIntervals.setdefault((cell,speed),[]).append(opps[index]["time"])
+        newStations[cell,speed] = config
+    return addedCost, assignments, newStations
+
+#place charging stations greedily: agents with few valid patterns first, every agent (or member of an agent class) is assigned its cheapest valid pattern given the stations placed so far
+#agents are skipped if their pattern would exceed the budget or the limits (slow,fast) on the number of ports
+#return ports per (cell,speed), charging processes (agent,index,cx,cy,speed) with their number and number of satisfied members per agent
+def greedyPlacement(ear,rcpb,rcc,costs,budget=None,limit=None,acm=None):
+    stations = {}
+    intervals = {}
+    processes = {}
+    satisfied = {}
+    totalCost = 0
+    for key in sorted(ear,key=lambda key:len(ear[key].valid_patterns)):
+        agent = ear[key]
+        opps = {opp["index"]:opp for opp in agent.charging_opps}
+        satisfied[key] = 0
+        for member in range(acm.get(key,1) if acm else 1):
+            plans = [plan for plan in (planPattern(vp,opps,rcpb,rcc,costs,intervals,stations) for vp in agent.valid_patterns.tolist()) if plan is not None]
+            if not plans:
+                break
+            addedCost, assignments, newStations = min(plans,key=lambda plan:plan[0])
+            if budget is not None and totalCost+addedCost > budget:
+                break
+            if limit is not None:
+                merged = {**stations,**newStations}
+                ports = {speed:sum(config for cs,config in merged.items() if cs[1]==speed) for speed in ["s","f"]}
+                if ports["s"] > limit[0] or ports["f"] > limit[1]:
+                    break
+            totalCost += addedCost
+            stations.update(newStations)
+            for index,cell,speed in assignments:
+                intervals.setdefault((cell,speed),[]).append(opps[index]["time"])
+                process = (key,index,cell[0],cell[1],speed)
+                processes[process] = processes.get(process,0)+1
+            satisfied[key] += 1
+
+    _LOGGER.info(f"greedy placement satisfies {sum(satisfied.values())} agents at cost {totalCost}")
+    return stations, processes, satisfied
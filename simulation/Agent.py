@@ -1,7 +1,9 @@
 import itertools
 
+import numpy as np
+
 from .const import MAX_EXACT_STOPS, SEC_PER_DAY, TOT_RANGE, MIN_CHARGE, MIN_CHARGE_EOD
-from .agentUtils import add_valid_stop, soc_after_break
+from .agentUtils import add_valid_stop, dominated_patterns, soc_after_break
 
 
 class Agent:
@@ -105,9 +107,8 @@ class Agent:
 
     def compute_valid_patterns(self, breakpoints_filter, zero_break=True):
         """
-        calculate all valid patterns with a maximum number of MAX_EXACT_STOPS charging stops and save in agent
+        calculate all valid patterns with a maximum number of MAX_EXACT_STOPS charging stops and save in agent as uint8 matrix with one row per pattern
         """
-        self.valid_patterns = []
         valid_stops = set()
         valid_fast_stops = set()
 
@@ -122,35 +123,38 @@ class Agent:
                 index + 1, bp, breakpoints_filter, valid_stops, valid_fast_stops
             )
 
-        stop_combinations = [
-            tuple(
+        stop_combinations = np.array(
+            [
                 [
                     2 if k in fast_charge_set else 1 if k in charge_set else 0
                     for k in range(self.num_stops)
                 ]
-            )
-            for num_charges in range(MAX_EXACT_STOPS + 1)
-            for charge_set in itertools.combinations(valid_stops, num_charges)
-            for num_fast_charges in range(
-                len(valid_fast_stops.intersection(set(charge_set))) + 1
-            )
-            for fast_charge_set in itertools.combinations(
-                valid_fast_stops.intersection(set(charge_set)), num_fast_charges
-            )
-        ]
-
-        while stop_combinations:
-            combination = stop_combinations.pop(0)
-            if not self.is_valid_pattern(combination):
+                for num_charges in range(MAX_EXACT_STOPS + 1)
+                for charge_set in itertools.combinations(valid_stops, num_charges)
+                for num_fast_charges in range(
+                    len(valid_fast_stops.intersection(set(charge_set))) + 1
+                )
+                for fast_charge_set in itertools.combinations(
+                    valid_fast_stops.intersection(set(charge_set)), num_fast_charges
+                )
+            ],
+            dtype=np.uint8,
+        ).reshape(-1, self.num_stops)
+
+        # every valid pattern removes the remaining patterns it dominates
+        remaining = np.ones(len(stop_combinations), dtype=bool)
+        valid = []
+        for index in range(len(stop_combinations)):
+            if not remaining[index]:
                 continue
-            self.valid_patterns += [combination]
-            dominated = []
-            for c in stop_combinations:
-                if all([x[0] <= x[1] for x in zip(combination, c)]):
-                    dominated.append(c)
-
-            for c in dominated:
-                stop_combinations.pop(stop_combinations.index(c))
+            remaining[index] = False
+            if not self.is_valid_pattern(stop_combinations[index].tolist()):
+                continue
+            valid.append(index)
+            remaining &= ~dominated_patterns(
+                stop_combinations, stop_combinations[index]
+            )
+        self.valid_patterns = stop_combinations[valid]
 
     def calculate_greedy_pattern(
         self, breakpoints_filter, start_pattern=[], zero_break=True
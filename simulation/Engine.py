@@ -5,7 +5,9 @@ from scipy.spatial import cKDTree
 from sortedcontainers import SortedDict
 from tqdm import tqdm
 
-from .agentUtils import soc_after_break
+import numpy as np
+
+from .agentUtils import compatible_patterns, soc_after_break
 from .utils import cell_to_point, point_to_cell, primary_strategy
 from .const import SEC_PER_DAY
 
@@ -18,8 +20,15 @@ class SimulationEngine:
         ERROR = 3
 
     def __init__(self, e_agents_relevant, cs_dict, inner_cells, radius, fail_radius):
+        """
+        cs_dict maps cells to their numbers of fast and slow ports, either as read by read_charging_stations or as numbers
+        """
         self.ear = e_agents_relevant
         self.cs_dict = cs_dict
+        # numbers of slow and fast ports per cell (indexed by speed as occupation_dict)
+        self.cs_ports = {
+            cell: (float(cs["slow"]), float(cs["fast"])) for cell, cs in cs_dict.items()
+        }
         self.radius = radius
         self.fail_radius = fail_radius
         self.comb_radius = radius // 100
@@ -36,7 +45,7 @@ class SimulationEngine:
         self.rel_breakpoints = dict()
 
         self.cs_indices_all = [cell for cell in self.cs_dict]
-        self.cs_indices_fast = [cell for cell,cs in self.cs_dict.items() if int(cs["fast"])]
+        self.cs_indices_fast = [cell for cell,ports in self.cs_ports.items() if int(ports[1])]
         self.cs_kdtree_all = cKDTree([cell_to_point(*cell) for cell in self.cs_indices_all])
         if self.cs_indices_fast:
             self.cs_kdtree_fast = cKDTree([cell_to_point(*cell) for cell in self.cs_indices_fast])
@@ -49,14 +58,10 @@ class SimulationEngine:
         """forget all strategies that cannot be satisfied anymore"""
         if not lp:
             lp = self.live_pattern_dict[agent]
-        strats_to_delete = []
-        for p in self.known_strategies_dict[agent]:
-            if any([i < p[index] for index, i in enumerate(lp)]):
-                strats_to_delete.append(p)
-        for strat in strats_to_delete:
-            del self.known_strategies_dict[agent][
-                self.known_strategies_dict[agent].index(strat)
-            ]
+        known_strategies = self.known_strategies_dict[agent]
+        self.known_strategies_dict[agent] = known_strategies[
+            compatible_patterns(known_strategies, lp)
+        ]
 
     def _search_cs_within_radius(self, x, y, fast):
         """
@@ -103,10 +108,10 @@ class SimulationEngine:
         if len(css) > 0:
             for key in css:
                 space_available_fast = (
-                    float(self.cs_dict[key]["fast"]) - self.occupation_dict[key][1]
+                    self.cs_ports[key][1] - self.occupation_dict[key][1]
                 ) > 0
                 space_available_slow = (
-                    float(self.cs_dict[key]["slow"]) - self.occupation_dict[key][0]
+                    self.cs_ports[key][0] - self.occupation_dict[key][0]
                 ) > 0
                 if (space_available_slow and not fast) or space_available_fast:
                     if fast or not space_available_slow:
@@ -136,10 +141,10 @@ class SimulationEngine:
                 return False, 0
             key = indexSet[i]
             space_available_fast = (
-                float(self.cs_dict[key]["fast"]) - self.occupation_dict[key][1]
+                self.cs_ports[key][1] - self.occupation_dict[key][1]
             ) > 0
             space_available_slow = (
-                float(self.cs_dict[key]["slow"]) - self.occupation_dict[key][0]
+                self.cs_ports[key][0] - self.occupation_dict[key][0]
             ) > 0
             if (space_available_slow and not fast) or space_available_fast:
                 if fast or not space_available_slow:
@@ -165,28 +170,25 @@ class SimulationEngine:
 
         for agent in self.ear.values():
             agent.compute_valid_patterns(self.rel_breakpoints, zero_break=zero_break)
-            if not agent.valid_patterns:
+            if not len(agent.valid_patterns):
                 gp = agent.calculate_greedy_pattern(
                     self.rel_breakpoints, zero_break=zero_break
                 )
-                if gp:
-                    agent.valid_patterns = [gp]
-                else:
-                    agent.valid_patterns = [
-                        agent.calculate_greedy_pattern(
-                            {
-                                opp["loc"]: "f"
-                                for opp in agent.charging_opps
-                                if point_to_cell(*opp["loc"]) in self.inner_cells
-                            },
-                            zero_break=zero_break,
-                        )
-                    ]
-                    if agent.valid_patterns == [False]:
+                if not gp:
+                    gp = agent.calculate_greedy_pattern(
+                        {
+                            opp["loc"]: "f"
+                            for opp in agent.charging_opps
+                            if point_to_cell(*opp["loc"]) in self.inner_cells
+                        },
+                        zero_break=zero_break,
+                    )
+                    if not gp:
                         raise AssertionError(
                             f"no valid pattern at all for agent {agent.name}"
                         )
                     self.failed_agents.add(agent.name)
+                agent.valid_patterns = np.array([gp], dtype=np.uint8)
 
     def _run_simulation(self):
         # collect breaks
@@ -212,8 +214,9 @@ class SimulationEngine:
             key: primary_strategy(agent.valid_patterns)
             for key, agent in self.ear.items()
         }
+        # strategies are only removed by selecting rows, so the matrices of the agents are shared until then
         self.known_strategies_dict = {
-            key: agent.valid_patterns[:] for key, agent in self.ear.items()
+            key: agent.valid_patterns for key, agent in self.ear.items()
         }
         for key in self.end_times:
             if not key in self.ending_stops_dict:
@@ -291,7 +294,7 @@ class SimulationEngine:
                         self._remove_outdated_strategies(
                             agent, lp=self.live_pattern_dict[agent] + [1]
                         )
-                        if self.known_strategies_dict[agent]:
+                        if len(self.known_strategies_dict[agent]):
                             self.primary_strategy_dict[agent] = primary_strategy(
                                 self.known_strategies_dict[agent]
                             )
@@ -301,13 +304,15 @@ class SimulationEngine:
                                 start_pattern=self.live_pattern_dict[agent] + [1],
                             )
                             if gp:
-                                self.known_strategies_dict[agent] = [gp]
+                                self.known_strategies_dict[agent] = np.array(
+                                    [gp], dtype=np.uint8
+                                )
                                 self.primary_strategy_dict[agent] = gp
 
                         # try finding slow charging station instead
                         if (
                             self.primary_strategy_dict[agent][index]
-                            and self.known_strategies_dict[agent]
+                            and len(self.known_strategies_dict[agent])
                         ):
                             key, speed = self._find_closest_available_cs_within_radius(
                                 *stop_info["loc"], False
@@ -329,9 +334,9 @@ class SimulationEngine:
                     self._remove_outdated_strategies(
                         agent, lp=self.live_pattern_dict[agent] + [0]
                     )
-                    if self.known_strategies_dict[
-                        agent
-                    ]:  # there is a valid known strategy left that does not charge right now
+                    if len(
+                        self.known_strategies_dict[agent]
+                    ):  # there is a valid known strategy left that does not charge right now
                         self.live_pattern_dict[agent].append(0)
                         self.primary_strategy_dict[agent] = primary_strategy(
                             self.known_strategies_dict[agent]
@@ -347,7 +352,9 @@ class SimulationEngine:
                         ):  # there is a valid (greedy) strategy left that does not charge right now
                             self.live_pattern_dict[agent].append(0)
                             self.primary_strategy_dict[agent] = gp
-                            self.known_strategies_dict[agent] = [gp]
+                            self.known_strategies_dict[agent] = np.array(
+                                [gp], dtype=np.uint8
+                            )
                             continue
 
                     # failed
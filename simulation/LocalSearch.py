@@ -0,0 +1,249 @@
+import copy
+import logging
+import random
+import time
+
+from concurrent.futures import ProcessPoolExecutor
+from scipy.spatial import cKDTree
+
+from .Engine import SimulationEngine
+from .utils import cell_to_point
+
+_LOGGER = logging.getLogger(__name__)
+
+# day and simulation settings of a worker process
+_WORKER = {}
+
+
+def to_charging_stations(layout):
+    """convert a layout {cell: (speed, ports)} to the charging station dict of the simulation engine"""
+    return {
+        cell: {
+            "cx": cell[0],
+            "cy": cell[1],
+            "fast": ports if speed == "f" else 0,
+            "slow": ports if speed == "s" else 0,
+        }
+        for cell, (speed, ports) in layout.items()
+    }
+
+
+def from_charging_stations(charging_stations, configs):
+    """
+    convert charging stations (see read_charging_stations) to a layout {cell: (speed, ports)}
+    every cell keeps the speed with more ports, whose number is rounded up to the next configuration
+    """
+    layout = dict()
+    for cell, cs in charging_stations.items():
+        fast, slow = int(float(cs["fast"])), int(float(cs["slow"]))
+        speed, ports = ("f", fast) if fast >= slow else ("s", slow)
+        if ports > 0:
+            layout[cell] = (
+                speed,
+                next((c for c in configs[speed] if c >= ports), configs[speed][-1]),
+            )
+    return layout
+
+
+def evaluate_layout(layout, e_agents_relevant, inner_cells, radius, fail_radius, warm_start):
+    """
+    simulate a layout on a copy of the agents
+    return number of successful agents, number of charging processes per cell and charging opportunities of the failed agents
+    """
+    if not layout:
+        return 0, {}, [opp for agent in e_agents_relevant.values() for opp in agent.charging_opps]
+    engine = SimulationEngine(
+        copy.deepcopy(e_agents_relevant),
+        to_charging_stations(layout),
+        inner_cells,
+        radius,
+        fail_radius,
+    )
+    engine.simulate(warm_start=warm_start)
+    usage = dict()
+    for _, _, cell, _ in engine.cp_list:
+        usage[cell] = usage.get(cell, 0) + 1
+    failed_opps = [
+        opp for key in engine.failed_agents for opp in engine.ear[key].charging_opps
+    ]
+    return engine.num_successful_agents, usage, failed_opps
+
+
+def _init_worker(e_agents_relevant, inner_cells, radius, fail_radius, warm_start):
+    """keep the day and the simulation settings in the worker process"""
+    _WORKER.update(
+        e_agents_relevant=e_agents_relevant,
+        inner_cells=inner_cells,
+        radius=radius,
+        fail_radius=fail_radius,
+        warm_start=warm_start,
+    )
+
+
+def _evaluate(layout):
+    return evaluate_layout(layout, **_WORKER)
+
+
+class LocalSearch:
+    """
+    improve a charging station layout by add, remove, move and resize moves that are scored by the simulation
+    a layout maps cells to (speed, ports) with speed "f" or "s", i.e. every cell has at most one charging station as in the optimization model
+    stations are only placed at candidate cells within the radius of a charging opportunity and respect the configurations, costs and budget
+    """
+
+    def __init__(
+        self,
+        e_agents_relevant,
+        inner_cells,
+        costs,
+        configs,
+        budget,
+        radius,
+        fail_radius,
+        warm_start=0,
+        processes=4,
+        moves_per_round=None,
+        seed=0,
+    ):
+        self.ear = e_agents_relevant
+        self.inner_cells = inner_cells
+        self.costs = costs
+        self.configs = {speed: sorted(c) for speed, c in configs.items()}
+        self.budget = budget
+        self.radius = radius
+        self.fail_radius = fail_radius
+        self.warm_start = warm_start
+        self.processes = processes
+        self.moves_per_round = moves_per_round or 2 * processes
+        self.rng = random.Random(seed)
+
+        # candidate cells and their demand (number of charging opportunities within the radius)
+        opp_tree = cKDTree([opp["loc"] for agent in self.ear.values() for opp in agent.charging_opps])
+        cells = sorted(self.inner_cells)
+        demand = [len(n) for n in opp_tree.query_ball_point([cell_to_point(*cell) for cell in cells], self.radius)]
+        self.demand = {cell: d for cell, d in zip(cells, demand) if d}
+        self.candidates = list(self.demand)
+        self.candidate_tree = cKDTree([cell_to_point(*cell) for cell in self.candidates])
+
+        self.num_evaluations = 0
+        self.history = []
+
+    def cost(self, layout):
+        return sum(self.costs[speed] * ports for speed, ports in layout.values())
+
+    def _score(self, layout, successful):
+        """lexicographic score: feasibility, successful agents, saved cost"""
+        return (self.cost(layout) <= self.budget, successful, -self.cost(layout))
+
+    def greedy_layout(self):
+        """place stations with the smallest slow configuration at the candidate cells with the highest demand until the budget is spent"""
+        layout = dict()
+        ports = self.configs["s"][0]
+        for cell in sorted(self.candidates, key=lambda c: -self.demand[c]):
+            if self.cost(layout) + self.costs["s"] * ports > self.budget:
+                break
+            layout[cell] = ("s", ports)
+        return layout
+
+    def _cells_near(self, opps):
+        """candidate cells within the radius of some of the given charging opportunities"""
+        if not opps:
+            return []
+        sample = self.rng.sample(opps, min(len(opps), 20))
+        return list({self.candidates[i] for n in self.candidate_tree.query_ball_point([opp["loc"] for opp in sample], self.radius) for i in n})
+
+    def _resized(self, speed, ports, step):
+        """next configuration of a speed in direction step or None if there is none"""
+        configs = self.configs[speed]
+        index = configs.index(ports) + step if ports in configs else 0
+        return configs[index] if 0 <= index < len(configs) else None
+
+    def _neighbors(self, layout, usage, failed_opps):
+        """
+        create random layouts that differ by one move from the layout, moves are guided by the simulation:
+        stations are added or moved near failed agents, removed or moved if they are used least and enlarged if they are used most
+        return list of (move, layout)
+        """
+        neighbors = dict()
+        stations = sorted(layout, key=lambda cell: usage.get(cell, 0))
+        near_failed = [cell for cell in self._cells_near(failed_opps) if cell not in layout]
+        free = near_failed or [cell for cell in self.candidates if cell not in layout]
+        over_budget = self.cost(layout) > self.budget
+        for _ in range(10 * self.moves_per_round):
+            if len(neighbors) >= self.moves_per_round:
+                break
+            move = self.rng.choice(["add", "remove", "move", "resize"] if stations else ["add"])
+            new = dict(layout)
+            if move == "add" and free:
+                speed = self.rng.choice(["f", "s"])
+                cell = self.rng.choice(free)
+                new[cell] = (speed, self.configs[speed][0])
+                description = (move, cell, speed)
+            elif move == "remove":
+                cell = self.rng.choice(stations[: max(1, len(stations) // 4)])
+                del new[cell]
+                description = (move, cell)
+            elif move == "move" and free:
+                cell = self.rng.choice(stations[: max(1, len(stations) // 4)])
+                target = self.rng.choice(free)
+                new[target] = new.pop(cell)
+                description = (move, cell, target)
+            elif move == "resize":
+                cell = self.rng.choice(stations)
+                speed, ports = layout[cell]
+                step = 1 if usage.get(cell, 0) >= ports and self.rng.random() < 0.75 else -1
+                if self.rng.random() < 0.25:
+                    # switch the speed with the closest configuration
+                    speed = "s" if speed == "f" else "f"
+                    ports = min(self.configs[speed], key=lambda c: abs(c - ports))
+                else:
+                    ports = self._resized(speed, ports, step)
+                    if ports is None:
+                        continue
+                new[cell] = (speed, ports)
+                description = (move, cell, speed, ports)
+            else:
+                continue
+            # infeasible layouts are only kept if they reduce the cost of an infeasible layout
+            if self.cost(new) > self.budget and not (over_budget and self.cost(new) < self.cost(layout)):
+                continue
+            neighbors[description] = new
+        return list(neighbors.items())
+
+    def run(self, layout=None, time_limit=60):
+        """
+        improve the layout (default: greedy_layout) until the time limit is reached, every round evaluates several moves in parallel processes and applies the best one if it improves the layout
+        return best layout and its number of successful agents
+        """
+        t_start = time.time()
+        layout = dict(layout) if layout is not None else self.greedy_layout()
+        with ProcessPoolExecutor(
+            self.processes,
+            initializer=_init_worker,
+            initargs=(self.ear, self.inner_cells, self.radius, self.fail_radius, self.warm_start),
+        ) as executor:
+            successful, usage, failed_opps = executor.submit(_evaluate, layout).result()
+            self.num_evaluations += 1
+            score = self._score(layout, successful)
+            _LOGGER.info(f"start layout: {successful} successful agents at cost {self.cost(layout)}")
+            while time.time() - t_start < time_limit:
+                neighbors = self._neighbors(layout, usage, failed_opps)
+                if not neighbors:
+                    break
+                results = list(executor.map(_evaluate, [new for _, new in neighbors]))
+                self.num_evaluations += len(neighbors)
+                best = max(
+                    range(len(neighbors)),
+                    key=lambda i: self._score(neighbors[i][1], results[i][0]),
+                )
+                new_score = self._score(neighbors[best][1], results[best][0])
+                if new_score > score:
+                    move, layout = neighbors[best]
+                    successful, usage, failed_opps = results[best]
+                    score = new_score
+                    self.history.append((time.time() - t_start, move, successful, self.cost(layout)))
+                    _LOGGER.info(f"{move}: {successful} successful agents at cost {self.cost(layout)}")
+        _LOGGER.info(
+            f"local search finished after {time.time() - t_start:.1f}s and {self.num_evaluations} evaluations with {successful} successful agents at cost {self.cost(layout)}"
+        )
+        return layout, successful
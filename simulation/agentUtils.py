@@ -1,5 +1,7 @@
 import math
 
+import numpy as np
+
 from .const import EFFCSPEED_SLOW, TOT_CAP
 
 
@@ -155,6 +157,17 @@ def add_valid_stop(index, bp, breakpoints_filter, valid_stops, valid_fast_stops)
             valid_fast_stops.add(index)
 
 
+def dominated_patterns(patterns, pattern):
+    """return mask of the patterns (rows of a uint8 matrix) that charge at least as much as the pattern at every stop"""
+    return (patterns >= pattern).all(axis=1)
+
+
+def compatible_patterns(patterns, live_pattern):
+    """return mask of the patterns (rows of a uint8 matrix) that do not charge more than the live pattern at any of its stops"""
+    live_pattern = np.asarray(live_pattern, dtype=np.uint8)[: patterns.shape[1]]
+    return (patterns[:, : len(live_pattern)] <= live_pattern).all(axis=1)
+
+
 def c_speed(soc, fast, cap=TOT_CAP):
     if cap==77:
         return c_speed_77(soc,fast)#
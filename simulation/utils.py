@@ -18,7 +18,9 @@ def cell_to_point(x, y):
 
 
 def primary_strategy(vps):
-    return sorted(vps, key=weigh_index_sum)[0]
+    """return the first pattern (row of a matrix) with the smallest weigh_index_sum"""
+    vps = np.asarray(vps)
+    return tuple(vps[np.argmin((vps > 0) @ np.arange(vps.shape[1]))].tolist())
 
 
 # prefer early breaks
@@ -34,8 +36,15 @@ def create_agents(
     multi=False,
     size=[0, 0],
 ):
-    rng = np.random.default_rng(seed)
+    agent_data = read_agent_data(agents_attributes_file, agents_schedules_file)
+    return sample_agents(agent_data, seed, e_quota, multi, size)
+
 
+def read_agent_data(agents_attributes_file, agents_schedules_file):
+    """
+    read the attributes and schedules of all drivers
+    return attributes per driver, outer drivers, drivers with and without wallbox and stops per driver
+    """
     attribute_dict = dict()
     attributes = csv.DictReader(open(agents_attributes_file, "r"))
 
@@ -60,6 +69,18 @@ def create_agents(
         else:
             schedule_dict[s["agent"]] = [s]
 
+    return attribute_dict, o_agents, wb_agents, nwb_agents, schedule_dict
+
+
+def sample_agents(agent_data, seed, e_quota, multi=False, size=[0, 0], copy_schedules=False):
+    """
+    sample the agents of a day from the drivers (see read_agent_data)
+    the agents modify their stops, which are copied if copy_schedules is set, so that the drivers can be sampled again
+    return dict of agents
+    """
+    attribute_dict, o_agents, wb_agents, nwb_agents, schedule_dict = agent_data
+    rng = np.random.default_rng(seed)
+
     num_agents = round(TOT_AGENTS * e_quota)
     num_outer_agents = round(O_QUOTA * num_agents)
     num_inner_agents = num_agents - num_outer_agents
@@ -82,7 +103,7 @@ def create_agents(
         agent_attributes = attribute_dict[agent]
         e_agents[agent_name] = Agent(
             agent_name,
-            schedule_dict[agent],
+            [dict(stop) for stop in schedule_dict[agent]] if copy_schedules else schedule_dict[agent],
             agent_attributes["wallbox"] == "True",
             rng.uniform(float(agent_attributes["lowerBound"]), 1),
             float(agent_attributes["lowerBound"]),
@@ -114,6 +135,24 @@ def read_charging_stations(locations_file):
     return charging_stations
 
 
+def write_charging_stations(locations_file, charging_stations):
+    """write charging stations (dicts with numbers of fast and slow ports per cell) in the format of read_charging_stations"""
+    with open(locations_file, "w", newline="") as file:
+        dw = csv.DictWriter(file, ["cx", "cy", "fast", "slow", "wkt"])
+        dw.writeheader()
+        for cell, cs in charging_stations.items():
+            point = cell_to_point(*cell)
+            dw.writerow(
+                {
+                    "cx": cell[0],
+                    "cy": cell[1],
+                    "fast": cs["fast"],
+                    "slow": cs["slow"],
+                    "wkt": f"POINT ({point[0]} {point[1]})",
+                }
+            )
+
+
 def generate_day(agents_attributes_file, agents_schedules_file, seed, quota):
     _LOGGER.info("creating agents")
     return create_agents(agents_attributes_file, agents_schedules_file, seed, quota)